@@ -1,51 +1,191 @@
+import time
+# Start of the import of the app, Whisper and torch are only imported by the model warm-up
+import_started = time.perf_counter()
+
 from email.mime import audio
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError, validator
 import inspect
-import whisper
 import datetime
 import os
 import asyncio
-import queue
-import uuid
-import shutil
+import numpy as np
+import json
+import urllib.parse
 from typing import List
-import warnings
 import logging
-from utils.operations import dir_size_adjust, dict_size_adjust
-from utils.sound import is_chunk_ready, bytes_to_wav, resample_audio
-from utils.logger import CustomFormatter
-
-# Save the original warning handler
-original_showwarning = warnings.showwarning
-
-# Custom warning handler to suppress the warning about FP16 not being supported on CPU
-def whisper_warning_handler(message, category, filename, lineno, file=None, line=None, logger = logging.getLogger(__name__)):
-    whisper_message = "FP16 is not supported on CPU; using FP32 instead"
-    if issubclass(category, UserWarning) and whisper_message in str(message):
-        logger.warning("Running on CPU. FP16 not supported, using FP32 instead.")
-    else:
-        warnings.showwarning = original_showwarning
-        warnings.showwarning(message, category, filename, lineno, file, line)
+from utils.quota import DiskQuota
+from utils.notify import TaskEvents, WebhookSender, TERMINAL_STATUSES
+from utils.scheduler import FairScheduler, QueueFull
+from utils.sound import is_chunk_ready, decode_audio, read_pcm_wav, probe_duration, pcm_to_float32, pcm_to_mono, float32_to_wav, PolyphaseResampler, SAMPLE_RATE, SUPPORTED_BIT_DEPTHS
+from utils.logger import setup_logging
+from utils.models import ModelRegistry
+from utils.workers import TranscriptionPool
+from utils.streaming import StreamingTranscriber
+from utils.vad import remove_silence
+from utils.chunking import plan_chunks, merge_results, run_chunks
+from utils.checkpoints import CheckpointStore
+from utils.batching import BatchScheduler
+from utils.prefetch import Prefetcher
+from utils.cache import AudioCache, ResultCache, content_keys
+from utils.tasks import TaskStore, SqliteTaskStore
+from utils.uploads import UploadGuard
+from utils.metrics import REGISTRY
+from utils.backends import create_backend
 
-# Logger setup
+# Logger setup, records are formatted and written on a background thread instead of the event loop
 log_level = os.getenv('LOG_LEVEL', 'INFO').upper()
 logger = logging.getLogger(__name__)
-logger.setLevel(log_level)
-ch = logging.StreamHandler()
-ch.setLevel(log_level)
-ch.setFormatter(CustomFormatter())
-logger.addHandler(ch)
+setup_logging(logger, level=log_level,
+              fmt=os.getenv('LOG_FORMAT', 'text'),
+              rate_limit=float(os.getenv('LOG_RATE_LIMIT', '10')))
 
 # Create FastAPI app
 app = FastAPI()
 
-# Queue for tasks
-task_queue = queue.Queue(maxsize=3)
+# Registry of loaded Whisper models, preloaded models stay resident until evicted by the memory limit
+default_model = os.getenv('WHISPER_MODEL', 'base')
+preload_models = [name.strip() for name in os.getenv('WHISPER_PRELOAD', default_model).split(',') if name.strip()]
+# Inference backend: PyTorch Whisper, Whisper with int8-quantized linear layers on CPU, or a stub for benchmarks
+backend_name = os.getenv('WHISPER_BACKEND', 'whisper')
+backend_options = {'stub': {'seconds_per_second': float(os.getenv('STUB_RTF', '0.05')),
+                            'overhead': float(os.getenv('STUB_OVERHEAD', '0.05'))}}
+backend = create_backend(backend_name, logger=logger, **backend_options.get(backend_name, {}))
+registry = ModelRegistry(loader=backend.load,
+                         default_model=default_model,
+                         memory_limit=int(os.getenv('MODEL_MEMORY_LIMIT_MB', '0')) * 2**20,
+                         logger=logger)
+
+# Pool of transcription workers, inference never runs on the event loop
+pool = TranscriptionPool(workers=int(os.getenv('TRANSCRIPTION_WORKERS', '1')),
+                         mode=os.getenv('WORKER_MODE', 'thread'),
+                         torch_threads=int(os.getenv('TORCH_THREADS', '0')) or None,
+                         logger=logger)
+
+# Audio longer than this is split at silence into chunks transcribed in parallel by all workers
+chunk_min_seconds = float(os.getenv('CHUNK_MIN_SECONDS', '120'))
+chunk_max_seconds = float(os.getenv('CHUNK_MAX_SECONDS', '300'))
+
+# Audio longer than this is transcribed in chunks even by a single worker, and every finished chunk is checkpointed,
+# so a task interrupted by a crash or restart resumes from its finished chunks instead of starting over
+checkpoint_min_seconds = float(os.getenv('CHECKPOINT_MIN_SECONDS', '600'))
+# Length of the checkpointed chunks, at most this much work is lost per worker by an interruption
+checkpoint_chunk_seconds = float(os.getenv('CHECKPOINT_CHUNK_SECONDS', '30'))
+checkpoints = CheckpointStore(path=os.getenv('CHECKPOINT_DB', os.path.join('cache', 'checkpoints.sqlite3')),
+                              ttl=float(os.getenv('TASK_TTL_SECONDS', '86400')),
+                              logger=logger) if os.getenv('CHECKPOINTS_ENABLED', '1') == '1' else None
+
+# Short clips queued within a small window are transcribed as one batch, a batch size of 1 disables batching
+batch_size = int(os.getenv('BATCH_SIZE', '1'))
+
+# Queued tasks are taken ahead of the workers and prepared for inference (silence removal, log-mel features, chunk planning)
+# on preprocessing threads meanwhile, a depth of 0 prepares every task right before its inference instead
+prefetch_depth = int(os.getenv('PREFETCH_DEPTH', str(pool.workers * batch_size)))
+preprocess_workers = int(os.getenv('PREPROCESS_WORKERS', '1'))
+
+# Fair-share admission control, every client (API key or IP address) has its own queue and a weighted share of the workers
+client_weights = dict((name, float(weight)) for name, weight in
+                      (item.rsplit('=', 1) for item in os.getenv('CLIENT_WEIGHTS', '').split(',') if item.strip()))
+scheduler = FairScheduler(workers=pool.workers * batch_size,
+                          max_queued=int(os.getenv('CLIENT_MAX_QUEUED', '10')),
+                          max_total=int(os.getenv('QUEUE_MAX', '100')),
+                          max_running=int(os.getenv('CLIENT_MAX_RUNNING', '0')),
+                          weights=client_weights,
+                          logger=logger)
+
+# Store of task status, the oldest tasks are evicted beyond the capacity and expire after the TTL.
+# The SQLite store survives restarts and is shared by all server processes of a node
+task_capacity = int(os.getenv('TASK_STORE_SIZE', '10000'))
+task_ttl = float(os.getenv('TASK_TTL_SECONDS', '86400'))
+# Seconds after which the unfinished tasks of a stopped server process are taken over by the others
+task_lease = float(os.getenv('TASK_LEASE_SECONDS', '30'))
+if os.getenv('TASK_BACKEND', 'sqlite') == 'memory':
+    tasks = TaskStore(capacity=task_capacity, ttl=task_ttl, logger=logger)
+else:
+    tasks = SqliteTaskStore(path=os.getenv('TASK_DB', os.path.join('cache', 'tasks.sqlite3')),
+                            capacity=task_capacity, ttl=task_ttl, lease=task_lease, logger=logger)
+
+# Whether silence is removed by voice activity detection before inference, unless a request says otherwise
+vad_default = os.getenv('VAD_ENABLED', '0') == '1'
+
+# Content-addressed cache of results and the tasks currently transcribing each cache key
+cache = ResultCache(cache_dir=os.getenv('RESULT_CACHE_DIR', os.path.join('cache', 'results')),
+                    memory_entries=int(os.getenv('RESULT_CACHE_SIZE', '256')),
+                    disk_entries=int(os.getenv('RESULT_CACHE_DISK_ENTRIES', '1000')),
+                    logger=logger)
+in_flight = {}
+
+# State changes of tasks are pushed to long-polling requests, event stream subscribers and callback URLs
+events = TaskEvents(logger=logger)
+webhooks = WebhookSender(max_attempts=int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '5')),
+                         timeout=float(os.getenv('WEBHOOK_TIMEOUT', '10')),
+                         logger=logger)
+
+# Whether uploads are kept in the uploads directory, transcription itself never reads them back
+save_uploads = os.getenv('SAVE_UPLOADS', '1') == '1'
+
+# Uploads larger than this or not starting like an audio file are rejected before their body is read,
+# audio longer than this is rejected before it is decoded (0 disables a limit)
+max_upload_bytes = int(os.getenv('MAX_UPLOAD_MB', '100')) * 2**20
+max_audio_seconds = float(os.getenv('MAX_AUDIO_SECONDS', '0'))
+# Bytes of an upload read back at a time from the temporary file the request body is spooled to
+upload_read_bytes = 2**20
+
+# Count and size limits of the saved uploads and runs, the oldest files are removed beyond them.
+# Uploads of unfinished tasks are kept until they finish, they are needed to recover the tasks after a restart
+upload_quota = DiskQuota("uploads", max_files=int(os.getenv('UPLOADS_MAX_FILES', '10')),
+                         max_bytes=int(os.getenv('UPLOADS_MAX_MB', '100')) * 2**20, pinned=tasks.unfinished_uploads, logger=logger)
+run_quota = DiskQuota("runs", max_files=int(os.getenv('RUNS_MAX_FILES', '10')),
+                      max_bytes=int(os.getenv('RUNS_MAX_MB', '100')) * 2**20, logger=logger)
+
+# Decoded audio of uploads is cached as float16 .npy files, so transcribing the same file again (e.g. with another model
+# or after a restart) skips decoding. The limits follow those of the saved uploads unless set separately
+audio_cache = AudioCache(cache_dir=os.getenv('AUDIO_CACHE_DIR', os.path.join('cache', 'audio')),
+                         max_files=int(os.getenv('AUDIO_CACHE_MAX_FILES', os.getenv('UPLOADS_MAX_FILES', '10'))),
+                         max_bytes=int(os.getenv('AUDIO_CACHE_MAX_MB', os.getenv('UPLOADS_MAX_MB', '100'))) * 2**20,
+                         enabled=os.getenv('AUDIO_CACHE_ENABLED', '1') == '1',
+                         logger=logger)
+
+# Strong references to fire-and-forget tasks, e.g. background upload persistence
+background_tasks = set()
+
+# Models are loaded after startup by default, so the server answers probes and accepts uploads while warming up
+background_warmup = os.getenv('WARMUP', 'background') == 'background'
+readiness = {'status': 'starting', 'error': None}
+startup_timings = {}
 
-# Dictionary to store task status
-tasks = {}
+# Metrics exposed on /metrics, recorded per thread without locks and summed when scraped
+uploads_total = REGISTRY.counter("stt_uploads_total", "Number of audio uploads.", ["source"])
+upload_bytes_total = REGISTRY.counter("stt_upload_bytes_total", "Bytes of audio received.", ["source"])
+cache_requests_total = REGISTRY.counter("stt_cache_requests_total", "Uploads answered from the result cache (hit), by an identical running task (attached) or transcribed (miss).", ["result"])
+rejections_total = REGISTRY.counter("stt_rejections_total", "Requests rejected, by reason.", ["reason"])
+tasks_total = REGISTRY.counter("stt_tasks_total", "Tasks that finished or failed.", ["status"])
+decode_seconds = REGISTRY.histogram("stt_decode_seconds", "Time taken to decode an upload to 16 kHz PCM.")
+inference_seconds = REGISTRY.histogram("stt_inference_seconds", "Time taken to transcribe a task, including batching and chunking.", ["model"])
+audio_seconds_total = REGISTRY.counter("stt_audio_seconds_total", "Seconds of audio transcribed.", ["model"])
+real_time_factor = REGISTRY.histogram("stt_real_time_factor", "Transcription time divided by the audio duration.", ["model"],
+                                      buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0))
+app.add_middleware(UploadGuard, paths=("/translate",), max_bytes=max_upload_bytes,
+                   sniff=os.getenv('UPLOAD_SNIFF', '1') == '1',
+                   on_reject=lambda reason: rejections_total.inc(reason=reason), logger=logger)
+
+REGISTRY.gauge("stt_ready", "Whether the models are loaded and the workers started.", lambda: int(readiness['status'] == 'ready'))
+REGISTRY.gauge("stt_startup_seconds", "Duration of the startup phases.",
+               lambda: {(phase,): seconds for phase, seconds in startup_timings.items()}, labels=["phase"])
+REGISTRY.gauge("stt_workers", "Number of transcription workers.", lambda: pool.workers)
+REGISTRY.gauge("stt_workers_busy", "Number of transcription workers running a task.", lambda: min(pool.active, pool.workers))
+REGISTRY.gauge("stt_queued_tasks", "Tasks waiting for a worker.", lambda: scheduler.stats()['queued'])
+REGISTRY.gauge("stt_tasks_in_flight", "Distinct uploads being transcribed.", lambda: len(in_flight))
+REGISTRY.gauge("stt_audio_cache_requests_total", "Uploads decoded by ffmpeg (miss) or read back from the audio cache instead (hit).",
+               lambda: {('hit',): audio_cache.hits, ('miss',): audio_cache.misses}, labels=["result"], kind="counter")
+REGISTRY.gauge("stt_prefetched_tasks", "Tasks taken off the queue and prepared or being prepared ahead of a worker.",
+               lambda: prefetcher.buffered() if prefetcher is not None else 0)
+REGISTRY.gauge("stt_result_cache_entries", "Entries of the result cache.",
+               lambda: {('memory',): cache.stats()['memory_entries'], ('disk',): cache.stats()['disk_entries']}, labels=["tier"])
+REGISTRY.gauge("stt_webhooks_total", "Callbacks delivered or given up after all attempts.",
+               lambda: {(result,): count for result, count in webhooks.stats().items() if result != 'queued'},
+               labels=["result"], kind="counter")
 
 # Json with audio settings
 class AudioSettings(BaseModel):
@@ -58,89 +198,709 @@ class AudioSettings(BaseModel):
     bit_depth: int = 16
     channels: int = 1
 
+    @validator('sample_rate')
+    def check_sample_rate(cls, value):
+        if not 1000 <= value <= 384000:
+            raise ValueError("sample rate must be between 1000 and 384000 Hz")
+        return value
+
+    @validator('bit_depth')
+    def check_bit_depth(cls, value):
+        if value not in SUPPORTED_BIT_DEPTHS:
+            raise ValueError(f"bit depth must be one of {', '.join(map(str, SUPPORTED_BIT_DEPTHS))}")
+        return value
+
+    @validator('channels')
+    def check_channels(cls, value):
+        if not 1 <= value <= 8:
+            raise ValueError("channels must be between 1 and 8")
+        return value
+
+    @property
+    def frame_size(self) -> int:
+        return self.bit_depth // 8 * self.channels
+
+# Audio format of WebSocket connections that do not send their own
+audio_defaults = AudioSettings(sample_rate=int(os.getenv("SAMPLE_RATE", "16000")),
+                               bit_depth=int(os.getenv("BIT_DEPTH", "16")),
+                               channels=int(os.getenv("CHANNELS", "1")))
+
+def parse_audio_settings(text, current):
+    """_summary_: Parses a JSON control message changing the audio format of a WebSocket connection.
+
+    Args:
+        text (str): JSON object with any of sample_rate, bit_depth and channels.
+        current (AudioSettings): Audio format the missing fields are taken from.
+
+    Raises:
+        ValueError: Raised when the message is not a JSON object or describes an unsupported format.
+
+    Returns:
+        AudioSettings: New audio format of the connection.
+    """
+    try:
+        fields = json.loads(text)
+        if not isinstance(fields, dict):
+            raise ValueError("control message must be a JSON object")
+        return AudioSettings(**{**current.dict(), **fields})
+    except ValidationError as e:
+        raise ValueError("; ".join(error['msg'] for error in e.errors()))
+    except json.JSONDecodeError:
+        raise ValueError("control message must be a JSON object")
+
+
+def translate_speech(audio, model_name=None, options=None, vad=False):
+    """_summary_: Translates speech from decoded audio to text. Runs on a transcription worker, never on the event loop.
+
+    Args:
+        audio (np.ndarray): 16 kHz mono float32 audio samples.
+        model_name (str, optional): Name of the Whisper model to use. Defaults to the registry default model.
+        options (dict, optional): Additional Whisper decoding options, e.g. initial_prompt. Defaults to None.
+        vad (bool, optional): Whether to remove silence before inference. Timestamps still refer to the original audio. Defaults to False.
+
+    Returns:
+        dict: Whisper transcription result.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    timestamps = None
+    if vad:
+        audio, timestamps = remove_silence(audio)
+        if len(audio) == 0:
+            return {'text': '', 'segments': [], 'language': None}
+    result = backend.transcribe(registry.get(model_name), audio, options)
+    return timestamps.remap(result) if timestamps else result
+
+def translate_batch(items, model_name=None):
+    """_summary_: Translates a batch of clips of at most 30 seconds in one batched pass of the backend. Runs on a transcription worker.
+
+    With Whisper, the clips are padded into one 30-second log-mel batch and decoded together. Unlike `translate_speech`,
+    there is no temperature fallback and every clip yields a single segment spanning the whole clip.
+
+    Args:
+        items (List[tuple]): 16 kHz mono float32 clips with silence already removed, and their features computed
+            by the preprocessing stage or None.
+        model_name (str, optional): Name of the Whisper model to use. Defaults to the registry default model.
+
+    Returns:
+        List[dict]: Whisper-like results, in the order of the clips.
+    """
+    clips, features = zip(*items)
+    return backend.transcribe_batch(registry.get(model_name), list(clips), list(features))
+
+async def run_batch(key, items):
+    """_summary_: Runs a batch collected by the batch scheduler on the transcription pool.
+
+    Args:
+        key (tuple): Model name shared by the whole batch.
+        items (List[tuple]): Clips of the batch and their features.
+
+    Returns:
+        List[dict]: Whisper-like results, in the order of the clips.
+    """
+    model_name, = key
+    return await pool.run(translate_batch, items, model_name)
+
+batcher = BatchScheduler(run_batch, window=float(os.getenv('BATCH_WINDOW_MS', '50')) / 1000,
+                         max_batch=batch_size, logger=logger) if batch_size > 1 else None
+
+def save_upload(file_path, data):
+    """_summary_: Saves an uploaded file to the uploads directory. Only keeps a copy, the audio is decoded from memory.
+
+    Args:
+        file_path (str): Path to save the file to.
+        data (bytes): Content of the uploaded file.
+    """
+    with open(file_path, "wb") as buffer:
+        buffer.write(data)
+    logger.info(f"Saved uploaded file to {file_path}")
+    upload_quota.add(file_path)
+
+def persist_upload(file_path, data):
+    """_summary_: Saves an uploaded file in the background if uploads are persisted, without delaying the request.
+
+    Args:
+        file_path (str): Path to save the file to.
+        data (bytes): Content of the uploaded file.
+    """
+    if not save_uploads:
+        return
+    run_in_background(save_upload, file_path, data)
+
+def run_in_background(fn, *args):
+    """_summary_: Runs a blocking function in a thread without waiting for it, logging its errors.
+
+    Args:
+        fn (Callable): Function to run.
+        *args: Arguments of the function.
+    """
+    async def run():
+        try:
+            await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            logger.error(f"[{fn.__name__}] {e}", exc_info=True)
+    running = asyncio.create_task(run())
+    background_tasks.add(running)
+    running.add_done_callback(background_tasks.discard)
+
+def save_run(name, text):
+    """_summary_: Saves the translation of an audio file to the runs directory.
 
-def translate_speech(file_path, task_id):
-    """_summary_: Translates speech from an audio file to text and stores the result in the tasks dictionary.
+    Args:
+        name (str): Name of the translated audio file.
+        text (str): Translated text.
+    """
+    file_name = name.split(".")[0] + ".txt"
+    save_path = os.path.join("runs", file_name)
+    with open(save_path, "w") as file:
+        file.write(text)
+    logger.info(f"Saved translation run to {save_path}")
+    run_quota.add(save_path)
+
+def task_event(status, result=None):
+    """_summary_: Builds the fields of a task event, with the text of finished and the error of failed tasks like /result.
+
+    Args:
+        status (str): Status of the task.
+        result (str, optional): Result of the task. Defaults to None.
+
+    Returns:
+        dict: Status and text or error of the task.
+    """
+    if status == 'finished':
+        return {'status': status, 'text': result}
+    if status == 'failed':
+        return {'status': status, 'error': result}
+    return {'status': status}
+
+def update_task(task_id, **fields):
+    """_summary_: Updates a task in the task store, ignoring tasks that were already removed.
+
+    Status changes are published to waiting requests and event stream subscribers, and the callback URL of a task
+    is called once it finished or failed.
 
     Args:
-        file_path (str): Path to the audio file.
         task_id (str): Unique ID of the task.
     """
+    if not tasks.update(task_id, **fields) or 'status' not in fields:
+        return
+    event = task_event(fields['status'], fields.get('result'))
+    events.publish(task_id, **event)
+    if fields['status'] in TERMINAL_STATUSES:
+        # The callback URL may have to be read from the database
+        run_in_background(send_callback, task_id, event)
+
+def send_callback(task_id, event):
+    """_summary_: Queues the call of the callback URL of a task, if it has one.
+
+    Args:
+        task_id (str): Unique ID of the task.
+        event (dict): Status and result of the task.
+    """
+    callback = (tasks.get(task_id) or {}).get('callback')
+    if callback:
+        webhooks.send(callback, {'task_id': task_id, **event})
+
+async def attachable_task(key):
+    """_summary_: Returns the task transcribing an identical upload, None if there is none or it was removed.
+
+    Args:
+        key (str): Result cache key of the upload.
+    """
+    task_id = in_flight.get(key)
+    if task_id is None or await asyncio.to_thread(tasks.__contains__, task_id):
+        return task_id
+    return None
+
+def prepare_job(job):
+    """_summary_: Prepares the audio of a job for inference. Runs on a preprocessing thread, ahead of the job's turn on the workers.
+
+    Clips of at most 30 seconds are batched with other short clips when batching is enabled, their silence is removed
+    and their features are computed here if the model is resident. Audio longer than `chunk_min_seconds` (with more
+    than one worker) is split at silence into one chunk per worker, audio longer than `checkpoint_min_seconds` into
+    chunks of `checkpoint_chunk_seconds` whatever the number of workers. The workers remove the silence of chunks
+    themselves. A transcription of the same audio and options that was interrupted resumes with its recorded chunks.
+
+    Args:
+        job (dict): Decoded audio and options of the task.
+
+    Returns:
+        dict: Plan of the transcription: the mode ('batch', 'single' or 'chunks') and the audio, silence map,
+            features or chunks and their checkpointed results it needs.
+    """
+    audio = job['audio']
+    duration = len(audio) / SAMPLE_RATE
+    batched = batcher is not None and duration <= 30
+    checkpointed = checkpoints is not None and job['cache_key'] is not None and duration > checkpoint_min_seconds
+    if not batched and ((pool.workers > 1 and duration > chunk_min_seconds) or checkpointed):
+        chunks = checkpoints.plan(job['cache_key']) if checkpointed else None
+        if not chunks or chunks[-1]['end'] != len(audio):
+            if chunks:
+                checkpoints.clear(job['cache_key'])
+            if checkpointed:
+                chunks = checkpoints.start(job['cache_key'], plan_chunks(audio, checkpoint_chunk_seconds))
+            else:
+                chunks = plan_chunks(audio, min(chunk_max_seconds, max(30, duration / pool.workers)))
+        completed = checkpoints.completed(job['cache_key']) if checkpointed else {}
+        return {'mode': 'chunks', 'chunks': chunks, 'completed': completed, 'checkpointed': checkpointed}
+
+    # Cached audio is float16, chunks are converted by the workers one at a time
+    audio = np.asarray(audio, dtype=np.float32)
+    timestamps = None
+    if job['vad']:
+        audio, timestamps = remove_silence(audio)
+    plan = {'mode': 'single', 'audio': audio, 'timestamps': timestamps}
+    if batched:
+        model = registry.peek(job['model'])
+        plan.update(mode='batch', features=backend.prepare(model, audio) if model is not None and len(audio) else None)
+    return plan
+
+async def transcribe_job(job, plan):
+    """_summary_: Transcribes the audio of a job prepared by `prepare_job` on the transcription pool. Runs in an asyncio event loop.
+
+    Chunks are transcribed on the worker of the task and in parallel on the workers no other task waits for, and their
+    results are stitched back into a single result with timestamps of the original audio. Checkpointed chunks are
+    committed as they finish, chunks finished before an interruption are not transcribed again.
+
+    Args:
+        job (dict): Decoded audio and options of the task.
+        plan (dict): Plan returned by `prepare_job`.
+
+    Returns:
+        dict: Whisper transcription result.
+    """
+    if plan['mode'] == 'chunks':
+        audio, chunks, completed = job['audio'], plan['chunks'], plan['completed']
+        resumed = f", resuming after {len(completed)} finished chunks" if completed else ""
+        logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio of task {job['task_id']} in {len(chunks)} chunks{resumed}")
+
+        async def transcribe_chunk(index):
+            chunk = chunks[index]
+            result = await pool.run(translate_speech, audio[chunk['start']:chunk['end']], job['model'], None, job['vad'])
+            if plan['checkpointed']:
+                await asyncio.to_thread(checkpoints.save, job['cache_key'], index, result)
+            return result
+
+        results = {**completed, **await run_chunks(transcribe_chunk, [index for index in range(len(chunks)) if index not in completed],
+                                                   worker_slots)}
+        return merge_results([results[index] for index in range(len(chunks))], chunks)
+
+    audio, timestamps = plan['audio'], plan['timestamps']
+    if len(audio) == 0:
+        return {'text': '', 'segments': [], 'language': None}
+    if plan['mode'] == 'batch':
+        result = await batcher.submit((job['model'],), (audio, plan['features']))
+    else:
+        result = await pool.run(translate_speech, audio, job['model'])
+    return timestamps.remap(result) if timestamps else result
+
+async def process_task(job, prepared=None):
+    """_summary_: Runs a single task on the transcription pool and stores the result in the tasks dictionary. Runs in an asyncio event loop.
+
+    Args:
+        job (dict): Task ID, decoded audio, file name and model name of the task.
+        prepared (asyncio.Future, optional): Finished preparation of the task by the preprocessing stage. Defaults to
+            preparing the task now.
+    """
+    task_id = job['task_id']
+    update_task(task_id, status='running')
+    status = 'failed'
     try:
-        with warnings.catch_warnings(record=True) as w:
-            warnings.simplefilter("always")
-            warnings.showwarning = whisper_warning_handler
-            model = whisper.load_model("base")
-            result = model.transcribe(file_path)
-            warnings.showwarning = original_showwarning
-            
-        tasks[task_id]['status'] = 'finished'
-        tasks[task_id]['result'] = result['text']
-        file_name = os.path.normpath(file_path).split(os.sep)[-1].split(".")[0] + ".txt"
-        save_path = os.path.join("runs", file_name)
-        with open(save_path, "w") as file:
-            file.write(result['text'])
-        logger.info(f"Saved translation run to {save_path}")
-        dir_size_adjust("runs", logger=logger)
-        
-    except FileNotFoundError:
-        logger.error(f"[{inspect.currentframe().f_code.co_name}] File not found: {file_path}", exc_info=True)
-        tasks[task_id]['status'] = 'failed'
-        tasks[task_id]['result'] = 'File not found'
+        plan = prepared.result() if prepared is not None else await asyncio.to_thread(prepare_job, job)
+        start = time.perf_counter()
+        result = await transcribe_job(job, plan)
+        elapsed = time.perf_counter() - start
+        model_name = job['model'] or registry.default_model
+        duration = len(job['audio']) / SAMPLE_RATE
+        inference_seconds.observe(elapsed, model=model_name)
+        audio_seconds_total.inc(duration, model=model_name)
+        if duration:
+            real_time_factor.observe(elapsed / duration, model=model_name)
+        update_task(task_id, status='finished', result=result['text'])
+        status = 'finished'
+        await asyncio.to_thread(cache.put, job['cache_key'], result)
+        if plan['mode'] == 'chunks' and plan['checkpointed']:
+            await asyncio.to_thread(checkpoints.clear, job['cache_key'])
+        run_in_background(save_run, job['name'], result['text'])
     except IOError as e:
         logger.error(f"[{inspect.currentframe().f_code.co_name}] IO error occured: {e}", exc_info=True)
-        tasks[task_id]['status'] = 'failed'
-        tasks[task_id]['result'] = f'IO error occurred: {e}'
+        update_task(task_id, status='failed', result=f'IO error occurred: {e}')
     except Exception as e:
         logger.error(f"[{inspect.currentframe().f_code.co_name}] An unexpected error occured: {e}", exc_info=True)
-        tasks[task_id]['status'] = 'failed'
-        tasks[task_id]['result'] = f'An unexpected error occurred: {e}'
+        update_task(task_id, status='failed', result=f'An unexpected error occurred: {e}')
+    finally:
+        tasks_total.inc(status=status)
+        if in_flight.get(job['cache_key']) == task_id:
+            del in_flight[job['cache_key']]
 
-async def whisper_translate(file_path) -> str:
-    """_summary_: Translates speech from an audio file to text and stores the result in the tasks dictionary. Runs in an asyncio event loop.
+def new_task(status='pending', result=None, callback=None) -> str:
+    """_summary_: Adds a new task to the task store.
 
     Args:
-        file_path (str): Path to the audio file.
+        status (str, optional): Initial status of the task. Defaults to 'pending'.
+        result (str, optional): Initial result of the task. Defaults to None.
+        callback (str, optional): URL the result is POSTed to once the task finished or failed. Defaults to None.
+
+    Returns:
+        str: Unique ID of the task.
+    """
+    task_id = tasks.add(status=status, result=result, callback=callback)
+    events.publish(task_id, **task_event(status, result))
+    return task_id
+
+def whisper_translate(audio, name, task_id, model_name=None, vad=False, cache_key=None, client='anonymous', reserved=True):
+    """_summary_: Queues the translation of decoded audio for a pending task.
+
+    Args:
+        audio (np.ndarray): 16 kHz mono float32 audio samples.
+        name (str): Name of the audio file, used for the saved run.
+        task_id (str): Unique ID of the pending task.
+        model_name (str, optional): Name of the Whisper model to use. Defaults to the registry default model.
+        vad (bool, optional): Whether to remove silence before inference. Defaults to False.
+        cache_key (str, optional): Key the result is cached under. Defaults to None.
+        client (str, optional): Client the task is queued for. Defaults to 'anonymous'.
+        reserved (bool, optional): Whether the task fills a queue slot reserved for the client, otherwise it bypasses the limits. Defaults to True.
+    """
+    logger.info(f"Starting Whisper translation for {name}")
+    job = {'task_id': task_id, 'audio': audio, 'name': name, 'model': model_name, 'vad': vad, 'cache_key': cache_key}
+    scheduler.put(client, job, reserved=reserved, duration=len(audio) / SAMPLE_RATE)
+
+def client_id(connection):
+    """_summary_: Identifies the client of a request for fair scheduling, by its API key or else its IP address.
+
+    Args:
+        connection (Request | WebSocket): HTTP request or WebSocket connection.
+
+    Returns:
+        str: Identifier of the client.
+    """
+    api_key = connection.headers.get('x-api-key')
+    if api_key:
+        return api_key
+    return connection.client.host if connection.client else 'anonymous'
+
+async def read_upload(file: UploadFile) -> bytes:
+    """_summary_: Reads an uploaded file back chunk by chunk, checking its size and the duration of WAV files on the way.
+
+    The request body is spooled to a temporary file while it arrives, reads of it run off the event loop. Oversized
+    files are rejected before they are read, and WAV files that are too long after their first chunk.
+
+    Args:
+        file (UploadFile): Uploaded file.
 
     Raises:
-        HTTPException 500: Raised when an unexpected error occurs.
+        HTTPException 413: Raised when the file is larger than `max_upload_bytes` or the audio longer than `max_audio_seconds`.
+
+    Returns:
+        bytes: Content of the file.
+    """
+    chunks, size = [], 0
+    while True:
+        if max_upload_bytes and max(size, file.size or 0) > max_upload_bytes:
+            rejections_total.inc(reason='too_large')
+            raise HTTPException(status_code=413, detail=f"Upload larger than {max_upload_bytes} bytes")
+        chunk = await file.read(upload_read_bytes)
+        if not chunk:
+            return b"".join(chunks)
+        if not chunks:
+            duration = probe_duration(chunk, file.size)
+            if max_audio_seconds and duration is not None and duration > max_audio_seconds:
+                rejections_total.inc(reason='too_long')
+                raise HTTPException(status_code=413, detail=f"Audio longer than {max_audio_seconds:g} seconds")
+        chunks.append(chunk)
+        size += len(chunk)
+
+def read_audio(data, audio_key):
+    """_summary_: Reads 16 kHz PCM WAV files in place, reads other files back from the audio cache if they were decoded
+    before, and decodes them with ffmpeg otherwise. Runs off the event loop.
+
+    Args:
+        data (bytes): Content of the uploaded file.
+        audio_key (str): Hash of the content from `content_keys`.
+
+    Raises:
+        RuntimeError: Raised when the audio cannot be decoded.
+
+    Returns:
+        tuple: 16 kHz mono samples, float32 when decoded and memory-mapped float16 when cached, and whether they were
+            decoded by ffmpeg.
+    """
+    start = time.perf_counter()
+    audio = read_pcm_wav(data)
+    if audio is not None:
+        decode_seconds.observe(time.perf_counter() - start)
+        return audio, False
+    audio = audio_cache.get(audio_key)
+    if audio is not None:
+        return audio, False
+    start = time.perf_counter()
+    audio = decode_audio(data)
+    decode_seconds.observe(time.perf_counter() - start)
+    return audio, True
+
+async def decode_upload(data, audio_key):
+    """_summary_: Decodes an uploaded file or reads its audio back from the audio cache. Runs in an asyncio event loop.
+
+    Only audio decoded by ffmpeg is cached, WAV files read in place are as cheap to read again. The cache is written
+    in the background, the request does not wait for it.
+
+    Args:
+        data (bytes): Content of the uploaded file.
+        audio_key (str): Hash of the content from `content_keys`.
+
+    Raises:
+        RuntimeError: Raised when the audio cannot be decoded.
+
+    Returns:
+        np.ndarray: 16 kHz mono samples.
+    """
+    audio, decoded = await asyncio.to_thread(read_audio, data, audio_key)
+    if decoded:
+        run_in_background(audio_cache.put, audio_key, audio)
+    return audio
+
+async def load_upload(file_path):
+    """_summary_: Reads a saved upload and decodes it, or reads its audio back from the audio cache. Runs in an asyncio event loop.
+
+    Args:
+        file_path (str): Path to the saved upload.
+
+    Returns:
+        np.ndarray: 16 kHz mono samples.
+    """
+    def read():
+        with open(file_path, "rb") as file:
+            data = file.read()
+        return data, content_keys(data)[0]
+
+    data, audio_key = await asyncio.to_thread(read)
+    return await decode_upload(data, audio_key)
+
+async def submit_upload(data, filename, model_name=None, vad=None, callback=None, client='anonymous') -> str:
+    """_summary_: Creates a task for an uploaded audio file. Runs in an asyncio event loop.
+
+    Uploads identical to a previous one (same content, model and options) finish immediately from the result cache,
+    and uploads identical to a task still in progress are attached to that task instead of being transcribed again,
+    unless they come with their own callback URL.
+    Anything else is decoded in memory (16 kHz PCM WAV directly, other formats through an ffmpeg pipe), unless the
+    same file was decoded before, and queued. Keeping a copy of the upload is optional and happens in the background.
+
+    Args:
+        data (bytes): Content of the uploaded file.
+        filename (str): Name the upload is saved under.
+        model_name (str, optional): Name of the Whisper model to use. Defaults to the registry default model.
+        vad (bool, optional): Whether to remove silence before inference. Defaults to the server setting.
+        callback (str, optional): URL the result is POSTed to once the task finished or failed. Defaults to None.
+        client (str, optional): Client the task is queued for. Defaults to 'anonymous'.
+
+    Raises:
+        HTTPException 400: Raised when the audio cannot be decoded.
+        HTTPException 413: Raised when the audio is longer than `max_audio_seconds`.
+        HTTPException 429: Raised when the client's or the server's queue limit is reached, with a Retry-After header.
 
     Returns:
         str: Unique ID of the task.
     """
-    logger.info(f"Starting Whisper translation for {file_path}")
-    task_id = str(uuid.uuid4())
-    tasks[task_id] = {'timestamp': datetime.datetime.now().timestamp(), 'status': 'pending', 'result': None}
-    
-    await asyncio.to_thread(task_queue.put, (task_id, file_path))
-    size_adjusted = dict_size_adjust(tasks, logger=logger)
-    if not size_adjusted:
-        logger.error(f"[{inspect.currentframe().f_code.co_name}] Failed to adjust tasks dictionary size", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error, failed to adjust tasks dictionary size")
+    # WAV files carry their duration in the header, other formats are checked once decoded
+    duration = probe_duration(data)
+    if max_audio_seconds and duration is not None and duration > max_audio_seconds:
+        rejections_total.inc(reason='too_long')
+        raise HTTPException(status_code=413, detail=f"Audio longer than {max_audio_seconds:g} seconds")
+    model_name = model_name or registry.default_model
+    vad = vad_default if vad is None else vad
+    audio_key, key = await asyncio.to_thread(content_keys, data, model=model_name, vad=vad, backend=backend.name,
+                                             quantization=backend.quantization)
+    attached = None if callback else await attachable_task(key)
+    if attached:
+        logger.info(f"Attaching {filename} to identical task {attached}")
+        cache_requests_total.inc(result='attached')
+        return attached
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        logger.info(f"Answered {filename} from the result cache")
+        cache_requests_total.inc(result='hit')
+        task_id = new_task(callback=callback)
+        update_task(task_id, status='finished', result=cached['text'])
+        return task_id
+    attached = None if callback else await attachable_task(key)
+    if attached:
+        cache_requests_total.inc(result='attached')
+        return attached
+    try:
+        scheduler.reserve(client)
+    except QueueFull as e:
+        rejections_total.inc(reason=e.reason)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    # Claim the key before the next await, so identical concurrent uploads attach to this task
+    task_id = new_task(callback=callback)
+    in_flight.setdefault(key, task_id)
+    cache_requests_total.inc(result='miss')
+
+    def abandon(detail):
+        # Give back the reservation, so that a failed upload does not count towards the queue limit
+        scheduler.cancel(client)
+        if in_flight.get(key) == task_id:
+            del in_flight[key]
+        update_task(task_id, status='failed', result=detail)
+
+    try:
+        audio = await decode_upload(data, audio_key)
+    except RuntimeError as e:
+        logger.error(f"[{inspect.currentframe().f_code.co_name}] Failed to decode {filename}: {e}")
+        audio, status_code, reason, detail = None, 400, 'undecodable', "Unsupported or corrupted audio file"
+    except Exception as e:
+        logger.error(f"[{inspect.currentframe().f_code.co_name}] Failed to decode {filename}: {e}", exc_info=True)
+        audio, status_code, reason, detail = None, 500, 'decode_error', f"An unexpected error occurred: {e}"
+    except asyncio.CancelledError:
+        abandon("Upload was cancelled")
+        raise
+    else:
+        status_code, reason, detail = 413, 'too_long', f"Audio longer than {max_audio_seconds:g} seconds"
+    if audio is None or (max_audio_seconds and len(audio) / SAMPLE_RATE > max_audio_seconds):
+        rejections_total.inc(reason=reason)
+        abandon(detail)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+    file_path = os.path.join("uploads", filename)
+    persist_upload(file_path, data)
+    # Enough to queue the task again if the server stops before it finishes
+    update_task(task_id, name=filename, model=model_name, vad=vad, cache_key=key, upload=file_path if save_uploads else None)
+    whisper_translate(audio, filename, task_id, model_name, vad, cache_key=key, client=client)
     return task_id
 
-async def task_processor():
-    """_summary_: Task processor for translating speech from an audio file to text as soon as it enters the task queue. Runs in an asyncio event loop.
+async def recover_tasks():
+    """_summary_: Queues tasks left pending or running by a stopped server process again. Runs in an asyncio event loop.
+
+    Tasks are decoded again from their saved upload, or read from the audio cache, tasks without one are marked as failed.
+    """
+    for task in await asyncio.to_thread(tasks.claim_orphans):
+        task_id, upload = task['id'], task.get('upload')
+        try:
+            if not upload or not os.path.exists(upload):
+                raise IOError("upload was not saved")
+            audio = await load_upload(upload)
+        except (IOError, RuntimeError) as e:
+            logger.warning(f"Could not recover task {task_id}: {e}")
+            update_task(task_id, status='failed', result='Task was interrupted by a server restart')
+            continue
+        logger.info(f"Recovered task {task_id} of {task['name']}")
+        in_flight[task['cache_key']] = task_id
+        whisper_translate(audio, task['name'], task_id, task['model'], bool(task['vad']), cache_key=task['cache_key'],
+                          client='recovered', reserved=False)
+
+async def recovery_loop():
+    """_summary_: Recovers orphaned tasks at startup and again every lease period. Runs in an asyncio event loop.
+
+    The tasks of the previous run of a restarted server process can only be taken over once its lease expired.
     """
     while True:
         try:
-            task_id, file_path = await asyncio.to_thread(task_queue.get)
-            tasks[task_id]['status'] = 'running'
-            translate_speech(file_path, task_id)
+            await recover_tasks()
         except Exception as e:
-            logger.error(f"[{inspect.currentframe().f_code.co_name}] Error in task processing", exc_info=True)
-            tasks[task_id]['status'] = 'failed'
-            tasks[task_id]['result'] = str(e)
+            logger.error(f"[recover_tasks] {e}", exc_info=True)
+        await asyncio.sleep(task_lease)
+
+prefetcher = Prefetcher(scheduler.next, prepare_job, depth=prefetch_depth, workers=preprocess_workers,
+                        logger=logger) if prefetch_depth > 0 else None
+
+# Free worker slots, taken by every dispatched task and borrowed by the chunks of long tasks while nobody waits for them
+worker_slots = asyncio.Semaphore(pool.workers * batch_size)
+
+async def task_processor():
+    """_summary_: Task processor dispatching tasks to the transcription pool as soon as a worker is free. Runs in an asyncio event loop.
+
+    At most one task per worker (one batch per worker with batching) runs at a time, further chunks of long tasks take
+    the slots of the workers in between. Besides those, up to `prefetch_depth`
+    tasks are taken off the queues ahead and prepared on the preprocessing threads, so the queue limits keep applying
+    to the other waiting tasks and the scheduler picks the client of every task shortly before its turn.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        if prefetcher is not None:
+            dispatched = await prefetcher.get()
+            await worker_slots.acquire()
+        else:
+            await worker_slots.acquire()
+            dispatched = await scheduler.next()
+        if dispatched is None:
+            break
+        client, job, *prepared = dispatched
+        started = loop.time()
+
+        def finished(_, client=client, started=started, duration=len(job['audio']) / SAMPLE_RATE):
+            worker_slots.release()
+            scheduler.done(client, loop.time() - started, duration)
 
-# Start the task processor in an asyncio event loop
-asyncio.create_task(task_processor())
+        running = asyncio.create_task(process_task(job, *prepared))
+        running.add_done_callback(finished)
+
+async def warm_up():
+    """_summary_: Imports the inference libraries and loads the configured models once, then starts the transcription
+    workers and the task processor. Runs in an asyncio event loop.
+
+    Process workers are forked after the models are loaded and share their weights copy-on-write. Uploads accepted
+    in the meantime wait in the queue.
+    """
+    try:
+        start = time.perf_counter()
+        await asyncio.to_thread(backend.available_models)
+        startup_timings['libraries'] = round(time.perf_counter() - start, 3)
+        start = time.perf_counter()
+        await asyncio.to_thread(registry.preload, preload_models)
+        startup_timings['models'] = round(time.perf_counter() - start, 3)
+        await asyncio.to_thread(pool.start)
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}", exc_info=True)
+        readiness.update(status='failed', error=str(e))
+        return
+    app.state.task_processor = asyncio.create_task(task_processor())
+    readiness['status'] = 'ready'
+    logger.info(f"Ready after importing the app in {startup_timings['import']:.2f}s, the inference libraries in "
+                f"{startup_timings['libraries']:.2f}s and loading models in {startup_timings['models']:.2f}s")
+
+@app.on_event("startup")
+async def startup():
+    """_summary_: Warms up the models and workers, in the background unless WARMUP=blocking, and queues unfinished
+    tasks of stopped server processes again.
+    """
+    startup_timings['import'] = round(time.perf_counter() - import_started, 3)
+    for quota in (upload_quota, run_quota, audio_cache):
+        await asyncio.to_thread(quota.rebuild)
+    if checkpoints is not None:
+        await asyncio.to_thread(checkpoints.expire)
+    app.state.warmup = asyncio.create_task(warm_up())
+    if not background_warmup:
+        await app.state.warmup
+    app.state.recovery = asyncio.create_task(recovery_loop())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """_summary_: Stops the task processor and the transcription workers and commits pending task writes.
+    """
+    app.state.recovery.cancel()
+    app.state.warmup.cancel()
+    if hasattr(app.state, 'task_processor'):
+        app.state.task_processor.cancel()
+    scheduler.close()
+    if prefetcher is not None:
+        prefetcher.close()
+    await asyncio.to_thread(pool.shutdown)
+    await asyncio.to_thread(tasks.close)
+    await asyncio.to_thread(webhooks.close)
 
 @app.post("/translate")
-async def translate(file: UploadFile = File(...)):
+async def translate(request: Request,
+                    file: UploadFile = File(...),
+                    model: str = Query(None, description="Whisper model to use, defaults to the server default model", example="base"),
+                    vad: bool = Query(None, description="Whether to skip silence before inference, defaults to the server setting", example=True),
+                    callback_url: str = Query(None, description="URL the result is POSTed to once the task finished or failed", example="https://example.com/hook")):
     """_summary_: Endpoint for uploading an audio file and translating it to text.
 
     HTTP Request Args:
         file (file): Audio file to be translated.
+        model (str, optional): Whisper model size to use, e.g. tiny, base, small.
+        vad (bool, optional): Whether to skip silence before inference, segment timestamps still refer to the original audio.
+        callback_url (str, optional): HTTP(S) URL receiving the task ID and the text or error as JSON once the task is done.
         
     HTTP status codes cheatsheet:
         202: Task accepted.
@@ -152,22 +912,22 @@ async def translate(file: UploadFile = File(...)):
     Returns:
         JSON: JSON object containing the task ID and the status code.
     """
-    if task_queue.full():
-        raise HTTPException(status_code=429, detail="Queue limit reached")
+    if model and model not in await asyncio.to_thread(backend.available_models):
+        rejections_total.inc(reason='unknown_model')
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+    if callback_url:
+        parsed = urllib.parse.urlparse(callback_url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            rejections_total.inc(reason='invalid_callback')
+            raise HTTPException(status_code=400, detail="Callback URL must be an absolute http(s) URL")
     
     timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M")
     filename = f"upload-{timestamp}-{file.filename}"
-    file_path = os.path.join("uploads", filename)
 
-    # Save the uploaded file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        buffer.flush()
-        os.fsync(buffer.fileno())
-        
-    logger.info(f"Saved uploaded file to {file_path}")
-    dir_size_adjust("uploads", logger=logger)
-    task_id = await whisper_translate(file_path)
+    data = await read_upload(file)
+    uploads_total.inc(source='http')
+    upload_bytes_total.inc(len(data), source='http')
+    task_id = await submit_upload(data, filename, model, vad, callback_url, client_id(request))
 
     return JSONResponse(content={"task_id": task_id}, status_code=202)
 
@@ -187,26 +947,41 @@ async def status(task_id: str):
     Returns:
         JSON: JSON object containing the status of the task.
     """
-    task = tasks.get(task_id)
+    task = await asyncio.to_thread(tasks.get, task_id)
     if task:
         return JSONResponse(content={"status": task['status']})
     raise HTTPException(status_code=404, detail="Invalid task ID")
 
 @app.get("/result/{task_id}")
-async def result(task_id: str):
-    """_summary_: Endpoint for getting the result of a task.
+async def result(task_id: str,
+                 wait: float = Query(0, ge=0, le=120, description="Seconds to wait for the task to finish before answering", example=30)):
+    """_summary_: Endpoint for getting the result of a task. With `wait`, it is a long poll answering as soon as the task is done.
 
     Args:
         task_id (str): Unique ID of the task.
+        wait (float, optional): Seconds to wait for an unfinished task. Defaults to 0.
 
     Returns:
         JSON: JSON object containing the result of the task.
         int: HTTP status code (optional, 404 if task ID is invalid)
     """
-    task = tasks.get(task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Invalid task ID")
-    
+    task = None
+    deadline = asyncio.get_running_loop().time() + wait
+    while True:
+        # Watch the task before reading it in a thread, so that it cannot finish unnoticed in between
+        waiter = events.watch(task_id)
+        try:
+            task = await asyncio.to_thread(tasks.get, task_id) or task
+            if not task:
+                raise HTTPException(status_code=404, detail="Invalid task ID")
+            remaining = deadline - asyncio.get_running_loop().time()
+            if task['status'] in TERMINAL_STATUSES or remaining <= 0:
+                break
+            # Tasks run by other server processes are not published here, the store is checked again every few seconds
+            await events.wait(task_id, min(remaining, 5), waiter)
+        finally:
+            events.unwatch(task_id, waiter)
+
     if task['status'] == 'finished':
         return JSONResponse(content={"text": task['result']}, status_code=200)
     elif task['status'] == 'failed':
@@ -215,40 +990,129 @@ async def result(task_id: str):
         raise HTTPException(status_code=400, detail="Task has not finished yet")
     
     
+@app.get("/events")
+async def task_events(request: Request,
+                      task_id: List[str] = Query(None, description="Tasks to follow, all tasks when omitted", example=["3fa85f64-5717-4562-b3fc-2c963f66afa6"])):
+    """_summary_: Endpoint streaming task state changes as Server-Sent Events.
+
+    Every event is a JSON object with the task ID, the new status, and the text of finished or the error of failed tasks.
+    When following given tasks, their current state is sent first and the stream ends once all of them are done.
+
+    Args:
+        task_id (List[str], optional): Unique IDs of the tasks to follow. Defaults to all tasks.
+
+    Returns:
+        StreamingResponse: text/event-stream of task events.
+    """
+    followed = set(task_id or [])
+    subscriber = events.subscribe()
+
+    async def stream():
+        try:
+            done = set()
+            for followed_id in followed:
+                task = await asyncio.to_thread(tasks.get, followed_id)
+                if task is None or task['status'] in TERMINAL_STATUSES:
+                    done.add(followed_id)
+                if task is not None:
+                    yield f"data: {json.dumps({'task_id': followed_id, **task_event(task['status'], task['result'])})}\n\n"
+            while not followed or done < followed:
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), 15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if followed and event['task_id'] not in followed:
+                    continue
+                if event['status'] in TERMINAL_STATUSES:
+                    done.add(event['task_id'])
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/models")
+async def models():
+    """_summary_: Endpoint for inspecting the model registry.
+
+    Returns:
+        JSON: JSON object containing load time, hit/miss counts and resident memory per model.
+    """
+    return JSONResponse(content=registry.stats())
+
+
+@app.get("/workers")
+async def workers():
+    """_summary_: Endpoint for inspecting the transcription workers.
+
+    Returns:
+        JSON: JSON object containing the pool configuration and RSS, PSS and unique memory (USS) of the server and every worker process.
+    """
+    return JSONResponse(content=await asyncio.to_thread(pool.stats))
+
+
+@app.get("/healthz")
+async def healthz():
+    """_summary_: Liveness probe, answers as soon as the server runs, also while the models are loading.
+
+    Returns:
+        JSON: JSON object containing the status "ok".
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """_summary_: Readiness probe, answers 200 once the models are loaded and the workers started, 503 before or if warm-up failed.
+
+    Returns:
+        JSON: JSON object containing the status (starting, ready or failed), the error of a failed warm-up and the startup timings in seconds.
+    """
+    return JSONResponse(content={**readiness, 'timings': startup_timings},
+                        status_code=200 if readiness['status'] == 'ready' else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """_summary_: Endpoint for scraping the server metrics in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: Counters and histograms of uploads, decoding, queueing, inference, cache and model loads,
+        and gauges of the workers and queues.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/tasks")
 async def get_tasks(fields: List[str] = Query(None, description="List of fields to be returned", example=["status", "result"])
                   , limit: int = Query(10, description="Maximum number of tasks to be returned", example=10)
-                  , size: int = Query(0, description="Whether to return the size of the tasks dictionary", example=0)):
-    """_summary_: Endpoint for getting all tasks. Logs requests to the server console.
+                  , size: int = Query(0, description="Whether to return the size of the tasks dictionary", example=0)
+                  , cursor: int = Query(0, description="Cursor of the page to be returned, from the X-Next-Cursor header", example=0)
+                  , status: str = Query(None, description="Only return tasks with this status", example="finished")
+                  , since: float = Query(None, description="Only return tasks created at or after this UNIX timestamp", example=1700000000)):
+    """_summary_: Endpoint for paging through tasks, oldest first. Logs requests to the server console.
 
     Returns:
-        JSON: JSON object containing all tasks.
+        JSON: JSON object containing up to `limit` tasks, with the cursor of the next page in the X-Next-Cursor header.
     """
     if size==1:
-        return {"size": len(tasks)}
-    if fields:
-        output = {}
-        for i in range(limit):
-            try:
-                output[list(tasks.keys())[i]] = {field: tasks[list(tasks.keys())[i]][field] for field in fields}
-            except IndexError:
-                break
-        return JSONResponse(content=output)
-    else:
-        output = {}
-        for i in range(limit):
-            try:
-                output[list(tasks.keys())[i]] = tasks[list(tasks.keys())[i]]
-            except IndexError:
-                break
-        return JSONResponse(content=output)
+        return {"size": await asyncio.to_thread(len, tasks)}
+    output, next_cursor = await asyncio.to_thread(tasks.page, cursor=cursor, limit=limit, fields=fields, status=status, since=since)
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    return JSONResponse(content=output, headers=headers)
     
 
-async def ws_translate(audio_chunk, file_name=""):
-    """_summary_: Translates speech from an audio file to text and stores the result in the tasks dictionary.
+async def ws_translate(audio_chunk, settings, client='anonymous', file_name=""):
+    """_summary_: Translates speech from raw PCM audio to text and stores the result in the tasks dictionary.
 
     Args:
-        audio_chunk (bytes): Audio file to be translated.
+        audio_chunk (bytes): Raw PCM audio to be translated.
+        settings (AudioSettings): Audio format of the connection.
+        client (str, optional): Client the task is queued for. Defaults to 'anonymous'.
         file_name (str, optional): Name of the file. Defaults to "".
 
     Raises:
@@ -257,13 +1121,6 @@ async def ws_translate(audio_chunk, file_name=""):
     Returns:
         str: Unique ID of the task.
     """
-    if task_queue.full():
-        raise HTTPException(status_code=429, detail="Queue limit reached")
-    
-    sample_rate = int(os.getenv("SAMPLE_RATE", "16000"))
-    bit_depth = int(os.getenv("BIT_DEPTH", "16"))
-    channels = int(os.getenv("CHANNELS", "1"))
-    
     timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H_%M")
     if file_name != "":
         filename = f"upload-{timestamp}-{file_name}"
@@ -271,19 +1128,22 @@ async def ws_translate(audio_chunk, file_name=""):
             filename += ".wav"
     else:
         filename = f"upload-{timestamp}.wav"
-    file_path = os.path.join("uploads", filename)
     
-    bytes_to_wav(audio_chunk, file_path, sample_rate=sample_rate, num_channels=channels, bit_depth=bit_depth)
-    logger.info(f"Saved uploaded file to {file_path}")
-    dir_size_adjust("uploads", logger=logger)
+    uploads_total.inc(source='websocket')
+    upload_bytes_total.inc(len(audio_chunk), source='websocket')
+    # Downmixed and resampled in-process, the 16 kHz WAV then takes the fast path without ffmpeg
+    size = len(audio_chunk) - len(audio_chunk) % settings.frame_size
+    audio = await asyncio.to_thread(pcm_to_float32, audio_chunk[:size], settings.sample_rate, settings.bit_depth, settings.channels)
     
-    task_id = await whisper_translate(file_path)
+    task_id = await submit_upload(await asyncio.to_thread(float32_to_wav, audio), filename, client=client)
     return task_id
     
 
 @app.post("/ws/audio_settings")
 async def set_audio_settings(audio_settings: AudioSettings):
-    """_summary_: Sets the sample rate for the WebSocket endpoint.
+    """_summary_: Sets the default audio format of WebSocket connections opened afterwards.
+
+    Connections can negotiate their own format with a JSON control message instead, which does not affect other clients.
 
     Args:
         audio_settings (AudioSettings): JSON object containing the audio settings.
@@ -294,14 +1154,13 @@ async def set_audio_settings(audio_settings: AudioSettings):
     Returns:
         JSON: JSON object containing the sample rate.
     """
+    global audio_defaults
     try:
         sample_rate = audio_settings.sample_rate
         bit_depth = audio_settings.bit_depth
         channels = audio_settings.channels
         
-        os.environ["SAMPLE_RATE"] = str(sample_rate)
-        os.environ["BIT_DEPTH"] = str(bit_depth)
-        os.environ["CHANNELS"] = str(channels)
+        audio_defaults = audio_settings
         
         logger.info(f"Audio settings --- Sample rate: {sample_rate} Hz, Bit depth: {bit_depth} bits, Channels: {channels}")
         return {"sample_rate": sample_rate, "bit_depth": bit_depth, "channels": channels}
@@ -314,19 +1173,36 @@ async def set_audio_settings(audio_settings: AudioSettings):
 async def websocket_test(websocket: WebSocket):
     """_summary_: Endpoint for testing the WebSocket connection. Logs requests to the server console.
 
+    Every binary message is raw PCM audio translated as a task, answered with the task ID. A text message with a JSON
+    object such as {"sample_rate": 44100, "bit_depth": 16, "channels": 2} sets the audio format of the following
+    messages, answered with the new format or an error.
+
     Args:
         websocket (WebSocket): WebSocket connection.
     """
     await websocket.accept()
     logger.info("WebSocket connection accepted")
     is_connected = True
+    settings = audio_defaults
 
     try:
         while True:
-            audio_chunk = await websocket.receive_bytes()
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(message.get('code', 1000))
+            if message.get('text') is not None:
+                try:
+                    settings = parse_audio_settings(message['text'], settings)
+                except ValueError as e:
+                    await websocket.send_json({'error': str(e)})
+                    continue
+                await websocket.send_json(settings.dict())
+                continue
+
+            audio_chunk = message.get('bytes') or b''
             logger.info(f"Received audio chunk: {len(audio_chunk)} bytes")
             
-            task_id = await ws_translate(audio_chunk)
+            task_id = await ws_translate(audio_chunk, settings, client_id(websocket))
             
             logger.info(f"Audio chunk processed: Task ID {task_id}")
             res = await websocket.send_text(task_id)
@@ -340,4 +1216,111 @@ async def websocket_test(websocket: WebSocket):
         if is_connected:
             await websocket.close()
             is_connected = False
-            logger.info("Closing WebSocket connection by user request")
\ No newline at end of file
+            logger.info("Closing WebSocket connection by user request")
+
+
+@app.websocket("/ws/stream")
+async def websocket_stream(websocket: WebSocket, model: str = Query(None)):
+    """_summary_: Endpoint for streaming transcription. Logs requests to the server console.
+
+    The client sends raw PCM audio as binary messages, in chunks of any size, and the text message "end" when the
+    stream is over. The audio format defaults to the one set with /ws/audio_settings, a text message with a JSON object
+    such as {"sample_rate": 48000, "bit_depth": 16, "channels": 2} sets it for the following audio of this connection. The server keeps a rolling buffer of the audio, decodes it
+    again every few seconds and answers over the same socket with JSON messages:
+        {"type": "partial", "text": ...}: Current hypothesis of the audio after the last final segment, may still change.
+        {"type": "final", "start": ..., "end": ..., "text": ...}: Stabilized segment with timestamps in seconds from the start of the stream.
+        {"type": "end"}: Sent after the last final segment, once the client sent "end".
+        {"type": "error", "detail": ...}: Sent when a control message is invalid, the stream goes on in the previous format.
+
+    Args:
+        websocket (WebSocket): WebSocket connection.
+        model (str, optional): Whisper model to use. Defaults to the server default model.
+    """
+    await websocket.accept()
+    logger.info("Streaming WebSocket connection accepted")
+    if model and model not in await asyncio.to_thread(backend.available_models):
+        rejections_total.inc(reason='unknown_model')
+        await websocket.close(code=1008, reason=f"Unknown model: {model}")
+        return
+    if readiness['status'] != 'ready':
+        # Streaming decodes on the workers directly, which only run once the models are loaded
+        await websocket.close(code=1013, reason="Server is starting, try again later")
+        return
+
+    uploads_total.inc(source='stream')
+    settings = audio_defaults
+    stream = StreamingTranscriber(step=float(os.getenv("STREAM_STEP_SECONDS", "2")))
+    pcm = bytearray()
+    decoding = None
+
+    def new_resampler():
+        # Resampling state carries over between messages, so the audio has no seams at message boundaries
+        return PolyphaseResampler(settings.sample_rate) if settings.sample_rate != SAMPLE_RATE else None
+
+    resampler = new_resampler()
+
+    def convert(data, final):
+        samples = pcm_to_mono(data, settings.bit_depth, settings.channels)
+        if resampler is None:
+            return samples
+        samples = resampler.process(samples)
+        return np.concatenate([samples, resampler.flush()]) if final else samples
+
+    async def flush_pcm(final=False):
+        # Convert whole frames only, the rest waits for the next message
+        size = len(pcm) - len(pcm) % settings.frame_size
+        data = bytes(pcm[:size])
+        del pcm[:size]
+        if size or final:
+            stream.append(await asyncio.to_thread(convert, data, final))
+
+    async def decode(final=False):
+        audio = stream.snapshot()
+        result = await pool.run(translate_speech, audio, model, {'initial_prompt': stream.prompt() or None})
+        finals, partial = stream.update(result, final=final)
+        for segment in finals:
+            await websocket.send_json({'type': 'final', **segment})
+        if not final:
+            await websocket.send_json({'type': 'partial', 'text': partial})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message.get('bytes'):
+                pcm.extend(message['bytes'])
+                upload_bytes_total.inc(len(message['bytes']), source='stream')
+                # Decoding runs in the background, audio keeps being received in the meantime
+                if is_chunk_ready(pcm, sample_rate=settings.sample_rate, bit_depth=settings.bit_depth, channels=settings.channels, seconds=1):
+                    await flush_pcm()
+                if (decoding is None or decoding.done()) and stream.ready():
+                    decoding = asyncio.create_task(decode())
+            elif message.get('text') is not None and message['text'].strip() != 'end':
+                try:
+                    new_settings = parse_audio_settings(message['text'], settings)
+                except ValueError as e:
+                    await websocket.send_json({'type': 'error', 'detail': str(e)})
+                    continue
+                # Audio received so far is converted in the format it was sent in
+                await flush_pcm(final=True)
+                pcm.clear()
+                settings = new_settings
+                resampler = new_resampler()
+            elif (message.get('text') or '').strip() == 'end':
+                await flush_pcm(final=True)
+                if decoding is not None:
+                    await decoding
+                await decode(final=True)
+                await websocket.send_json({'type': 'end'})
+                await websocket.close()
+                break
+    except WebSocketDisconnect:
+        logger.info("Streaming WebSocket disconnected")
+    except Exception as e:
+        logger.error(f"[{inspect.currentframe().f_code.co_name}] Unexpected error in streaming WebSocket endpoint", exc_info=True)
+        raise e
+    finally:
+        if decoding is not None and not decoding.done():
+            decoding.cancel()
+        logger.info(f"Streaming WebSocket closed after {stream.offset + len(stream.buffer) / stream.sample_rate:.1f}s of audio")
@@ -0,0 +1,175 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+parser = argparse.ArgumentParser(description="Benchmark the REST and websocket endpoints in-process with synthetic audio.")
+parser.add_argument("--lengths", type=str, default="1,5,30", help="Comma separated audio lengths in seconds.")
+parser.add_argument("--requests", type=int, default=20, help="Number of requests per audio length and endpoint.")
+parser.add_argument("--concurrency", type=int, default=4, help="Number of requests in flight at a time.")
+parser.add_argument("--endpoints", type=str, default="rest,websocket", help="Comma separated endpoints to drive: rest, websocket.")
+parser.add_argument("--workers", type=int, default=1, help="Number of transcription workers.")
+parser.add_argument("--batch_size", type=int, default=1, help="Maximum batch size of short clips, 1 disables batching.")
+parser.add_argument("--backend", type=str, default="stub", choices=["stub", "whisper"], help="Inference backend, stub needs no model weights.")
+parser.add_argument("--model", type=str, default="base", help="Model to load.")
+parser.add_argument("--stub_rtf", type=float, default=0.05, help="Simulated compute seconds per second of audio of the stub model.")
+parser.add_argument("--stub_overhead", type=float, default=0.05, help="Simulated compute seconds per call of the stub model.")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic audio.")
+parser.add_argument("--output", type=str, default=None, help="Path of the JSON report, defaults to benchmarks/<timestamp>.json.")
+
+SAMPLE_RATE = 16000
+
+
+def synthetic_audio(seconds, seed):
+    """_summary_: Generates reproducible speech-like audio: tone bursts with pauses over low noise.
+
+    Args:
+        seconds (float): Length of the audio.
+        seed (int): Seed of the random generator, the same seed gives the same audio.
+
+    Returns:
+        np.ndarray: 16 kHz mono int16 samples.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    tone = np.sin(2 * np.pi * rng.uniform(120, 300) * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    audio = 0.3 * tone + 0.01 * rng.standard_normal(n)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def percentiles(values):
+    """_summary_: Summarizes a list of seconds by its mean and 50th, 95th and 99th percentile."""
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': round(float(np.mean(values)), 4), 'p50': round(float(p50), 4), 'p95': round(float(p95), 4),
+            'p99': round(float(p99), 4), 'max': round(float(np.max(values)), 4)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    # The app reads its configuration on import
+    os.environ.update({
+        'WHISPER_BACKEND': args.backend,
+        'WHISPER_MODEL': args.model,
+        'STUB_RTF': str(args.stub_rtf),
+        'STUB_OVERHEAD': str(args.stub_overhead),
+        'TRANSCRIPTION_WORKERS': str(args.workers),
+        'BATCH_SIZE': str(args.batch_size),
+        'TASK_BACKEND': 'memory',
+        'SAVE_UPLOADS': '0',
+        'RESULT_CACHE_SIZE': '0',
+        'RESULT_CACHE_DISK_ENTRIES': '0',
+        'AUDIO_CACHE_ENABLED': '0',
+        'CLIENT_MAX_QUEUED': str(args.requests * 2),
+        'QUEUE_MAX': str(args.requests * 2),
+        'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+    })
+    from fastapi.testclient import TestClient
+    import app
+    from utils.sound import float32_to_wav
+
+    # Time at which every task is taken off the queue, to measure queue wait
+    started = {}
+    process_task = app.process_task
+
+    async def traced(job, *args):
+        started[job['task_id']] = time.perf_counter()
+        return await process_task(job, *args)
+    app.process_task = traced
+
+    lengths = [float(length) for length in args.lengths.split(",")]
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",")]
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec="seconds"),
+        'commit': git_commit(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'config': vars(args),
+        'results': [],
+    }
+
+    with TestClient(app.app) as client:
+        # Models are loaded in the background, measure only once the server is ready
+        deadline = time.perf_counter() + 600
+        while client.get("/readyz").status_code != 200:
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"Server did not become ready: {client.get('/readyz').json()}")
+            time.sleep(0.1)
+
+        def rest_request(pcm):
+            response = client.post("/translate", files={'file': ("benchmark.wav", float32_to_wav(pcm.astype(np.float32) / 32768))})
+            return response
+
+        def websocket_request(pcm):
+            with client.websocket_connect("/ws/test") as websocket:
+                websocket.send_bytes(pcm.tobytes())
+                return websocket.receive_text()
+
+        def run_one(endpoint, pcm):
+            start = time.perf_counter()
+            if endpoint == "rest":
+                response = rest_request(pcm)
+                if response.status_code != 202:
+                    return {'error': response.status_code}
+                task_id = response.json()['task_id']
+            else:
+                task_id = websocket_request(pcm)
+            accepted = time.perf_counter()
+            result = client.get(f"/result/{task_id}", params={'wait': 120})
+            end = time.perf_counter()
+            if result.status_code != 200:
+                return {'error': result.status_code}
+            return {'latency': end - start, 'queue_wait': started.get(task_id, end) - accepted}
+
+        for endpoint in endpoints:
+            for length in lengths:
+                clips = [synthetic_audio(length, args.seed * 100003 + i) for i in range(args.requests)]
+                wall_start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                    outcomes = list(executor.map(lambda pcm: run_one(endpoint, pcm), clips))
+                wall = time.perf_counter() - wall_start
+                succeeded = [outcome for outcome in outcomes if 'error' not in outcome]
+                errors = {}
+                for outcome in outcomes:
+                    if 'error' in outcome:
+                        errors[str(outcome['error'])] = errors.get(str(outcome['error']), 0) + 1
+                result = {
+                    'endpoint': endpoint,
+                    'audio_seconds': length,
+                    'requests': len(outcomes),
+                    'errors': errors,
+                    'wall_seconds': round(wall, 4),
+                    'throughput_rps': round(len(succeeded) / wall, 4),
+                    'audio_seconds_per_second': round(len(succeeded) * length / wall, 4),
+                    'latency': percentiles([outcome['latency'] for outcome in succeeded]),
+                    'queue_wait': percentiles([outcome['queue_wait'] for outcome in succeeded]),
+                }
+                report['results'].append(result)
+                latency = result['latency'] or {}
+                wait = result['queue_wait'] or {}
+                print(f"{endpoint:>9} {length:6.1f}s  {result['throughput_rps']:8.2f} req/s  "
+                      f"latency p50 {latency.get('p50', 0):.3f} p95 {latency.get('p95', 0):.3f} p99 {latency.get('p99', 0):.3f}  "
+                      f"queue wait p50 {wait.get('p50', 0):.3f} p95 {wait.get('p95', 0):.3f}  errors {sum(errors.values())}")
+
+    output = args.output or os.path.join("benchmarks", datetime.datetime.now().strftime("%Y_%m_%d_%H_%M_%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Saved benchmark report to {output}")
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
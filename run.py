@@ -11,6 +11,9 @@ parser.add_argument("--port", type=int, default=8000, help="Port to run the app
 parser.add_argument("--debug", action="store_true", help="Run the app in debug mode.")
 parser.add_argument("--noreload", action="store_false", help="Reload the app when the code changes.")
 parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to run the app on. If you do not know what to put here, do not include this option.")
+parser.add_argument("--workers", type=int, default=1, help="Number of concurrent transcription workers.")
+parser.add_argument("--production", action="store_true", help="Skip the dependency installation and auto-reload on startup, also enabled by PRODUCTION=1.")
+parser.add_argument("--worker_mode", type=str, default="thread", choices=["thread", "process"], help="Run transcription workers as threads or as forked processes.")
 
 # List of environment variables used
 env_vars = []
@@ -31,10 +34,13 @@ os.environ["CHANNELS"] = "1"
 env_vars.append("CHANNELS")
 
 
-def main():
+def main(production=False):
     os_type = platform.system()
     print(f"Running the app on {os_type}...")
-    if platform.system() == "Windows":
+    if production:
+        # Dependencies are installed when the image is built, installing them again only delays startup
+        print("Production mode, skipping the setup.")
+    elif platform.system() == "Windows":
         subprocess.run(["python", "setup.py", "--suppress_output"], shell=True)
     else:
         subprocess.run("python3 setup.py", shell=True)
@@ -78,8 +84,16 @@ if __name__ == '__main__':
             print("Custom host set, hope you know what you are doing.")
             command += f" --host {args.host}"
         os.environ["HOST"] = args.host
-    if args.noreload:
+    production = args.production or os.getenv("PRODUCTION") == "1"
+    if args.noreload and not production:
         command += " --reload"
+    if args.workers < 1:
+        print("Number of workers must be at least 1.")
+    else:
+        os.environ["TRANSCRIPTION_WORKERS"] = str(args.workers)
+        env_vars.append("TRANSCRIPTION_WORKERS")
+    os.environ["WORKER_MODE"] = args.worker_mode
+    env_vars.append("WORKER_MODE")
     if args.debug:
         os.environ["LOG_LEVEL"] = "DEBUG"
         env_vars.append("LOG_LEVEL")
@@ -87,4 +101,4 @@ if __name__ == '__main__':
         os.environ["LOG_LEVEL"] = "INFO"
         env_vars.append("LOG_LEVEL")
         
-    main()
\ No newline at end of file
+    main(production)
\ No newline at end of file
@@ -2,7 +2,6 @@ import os
 import websockets
 import asyncio
 import requests
-import time
 
 BASE_URL = "http://127.0.0.1:" + os.environ.get("PORT", "8000")
 
@@ -37,19 +36,16 @@ async def test_websocket():
                 print(f"Received response: {wav_response}")
                 task_id = wav_response
                 
+                # Long poll, the server answers as soon as the task is done
                 while True:
-                    response = requests.get(f"{BASE_URL}/status/{task_id}")
-                    print(response.json())
-                    if response.json()["status"] == "finished":
-                        break
-                    elif response.json()["status"] == "failed":
-                        get_response = requests.get(f"{BASE_URL}/result/{task_id}")
+                    get_response = requests.get(f"{BASE_URL}/result/{task_id}", params={"wait": 60})
+                    print(get_response.json())
+                    if "error" in get_response.json():
                         print(f"Failed to translate file. Error: {get_response.json()['error']}")
                         return
-                    time.sleep(1)
+                    if "text" in get_response.json():
+                        break
                 print("Translation completed.")
-                get_response = requests.get(f"{BASE_URL}/result/{task_id}")
-                print(get_response.json())
                 text = get_response.json()["text"]
                 print("Text: " + text)
             except websockets.exceptions.ConnectionClosed as e:
@@ -0,0 +1,281 @@
+import importlib
+import io
+import json
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+# The app reads its configuration on import, every test of this module shares one server
+ENVIRONMENT = {
+    'WHISPER_BACKEND': 'stub',
+    'STUB_RTF': '0',
+    'STUB_OVERHEAD': '0',
+    'TASK_BACKEND': 'sqlite',
+    'TASK_DB': 'tasks.sqlite3',
+    'RESULT_CACHE_DIR': 'results',
+    'RESULT_CACHE_DISK_ENTRIES': '0',
+    'AUDIO_CACHE_DIR': 'audio',
+    'CHECKPOINT_DB': 'checkpoints.sqlite3',
+    'CHECKPOINT_MIN_SECONDS': '60',
+    'CLIENT_MAX_QUEUED': '2',
+    'LOG_LEVEL': 'WARNING',
+}
+
+
+def wav(seconds, frequency=200.0, rate=16000):
+    """_summary_: Encodes a tone with pauses as mono 16-bit WAV, a different frequency gives a different file."""
+    t = np.arange(int(seconds * rate)) / rate
+    pcm = np.sin(2 * np.pi * frequency * t) * (np.sin(2 * np.pi * 0.5 * t) > 0) * 8000
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(rate)
+        file.writeframes(pcm.astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    from fastapi.testclient import TestClient
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("server"))
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in ENVIRONMENT.items():
+            patch.setenv(name, value)
+        app = importlib.import_module("app")
+        with TestClient(app.app) as client:
+            deadline = time.monotonic() + 60
+            while client.get("/readyz").status_code != 200:
+                assert time.monotonic() < deadline, "server did not become ready"
+                time.sleep(0.05)
+            yield app, client
+    os.chdir(cwd)
+
+
+def result(client, task_id):
+    return client.get(f"/result/{task_id}", params={'wait': 30})
+
+
+def eventually(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def blocked(server, monkeypatch):
+    """_summary_: Holds every transcription on the workers until the returned event is set."""
+    app, _ = server
+    release = threading.Event()
+    transcribe = app.backend.transcribe
+
+    def wait_and_transcribe(model, audio, options=None):
+        release.wait(10)
+        return transcribe(model, audio, options)
+
+    monkeypatch.setattr(app.backend, "transcribe", wait_and_transcribe)
+    yield release
+    release.set()
+
+
+def test_stream_ignores_empty_frames(server):
+    app, client = server
+    with client.websocket_connect("/ws/stream") as websocket:
+        # Servers deliver binary frames with a None text
+        websocket.send({'type': 'websocket.receive', 'bytes': b"", 'text': None})
+        websocket.send_text("end")
+        while (message := websocket.receive_json())['type'] != 'end':
+            assert message['type'] in ('partial', 'final')
+
+def test_identical_uploads_attach_then_hit_the_cache(server, blocked):
+    app, client = server
+    data = wav(1, 310)
+    first = client.post("/translate", files={'file': ("a.wav", data)}).json()['task_id']
+    second = client.post("/translate", files={'file': ("b.wav", data)}).json()['task_id']
+    assert second == first
+    blocked.set()
+    assert result(client, first).status_code == 200
+    eventually(lambda: not app.in_flight)
+
+    third = client.post("/translate", files={'file': ("c.wav", data)}).json()['task_id']
+    assert third != first
+    assert client.get(f"/status/{third}").json()['status'] == 'finished'
+    assert result(client, third).json() == result(client, first).json()
+
+def test_tasks_are_paged_with_cursors(server):
+    app, client = server
+    since = time.time()
+    created = [client.post("/translate", files={'file': (f"{i}.wav", wav(1, 400 + i))}).json()['task_id'] for i in range(3)]
+    for task_id in created:
+        assert result(client, task_id).status_code == 200
+
+    seen, cursor = {}, 0
+    while cursor is not None:
+        response = client.get("/tasks", params={'limit': 2, 'cursor': cursor, 'since': since, 'fields': ["status"]})
+        assert len(response.json()) <= 2
+        seen.update(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    assert list(seen) == created
+    assert all(task == {'status': 'finished'} for task in seen.values())
+
+def test_unfinished_tasks_of_a_stopped_server_are_recovered(server):
+    from utils.tasks import SqliteTaskStore
+    app, client = server
+    data = wav(1, 520)
+    os.makedirs("uploads", exist_ok=True)
+    with open(os.path.join("uploads", "orphan.wav"), 'wb') as file:
+        file.write(data)
+    _, key = app.content_keys(data, model=app.registry.default_model, vad=False, backend="stub", quantization=None)
+    stopped = SqliteTaskStore(path=app.tasks.path)
+    orphan = stopped.add(status='running', name="orphan.wav", model=app.registry.default_model, vad=False,
+                         cache_key=key, upload=os.path.join("uploads", "orphan.wav"))
+    stopped.close()
+
+    client.portal.call(app.recover_tasks)
+    assert result(client, orphan).status_code == 200
+    assert client.get(f"/status/{orphan}").json()['status'] == 'finished'
+
+def test_completion_is_pushed_to_events_and_callbacks(server, blocked, monkeypatch):
+    app, client = server
+    delivered = []
+    monkeypatch.setattr(app.webhooks, "send", lambda url, payload: delivered.append((url, payload)))
+    task_id = client.post("/translate", params={'callback_url': "https://example.com/hook"},
+                          files={'file': ("hook.wav", wav(1, 610))}).json()['task_id']
+    # The test client returns once the stream ended, which it does when the followed task is done
+    threading.Timer(0.2, blocked.set).start()
+    response = client.get("/events", params={'task_id': [task_id]})
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert events[0]['status'] in ('pending', 'running')
+    assert events[-1]['status'] == 'finished' and events[-1]['task_id'] == task_id
+
+    eventually(lambda: delivered)
+    assert delivered == [("https://example.com/hook", events[-1])]
+    assert result(client, task_id).json() == {'text': events[-1]['text']}
+
+def test_decode_errors_give_the_reservation_back(server, monkeypatch):
+    app, client = server
+
+    def fail(data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(app, "read_pcm_wav", fail)
+    # More failed uploads than the client may queue
+    for i in range(3):
+        response = client.post("/translate", files={'file': (f"broken{i}.wav", wav(1, 700 + i))})
+        assert response.status_code == 500
+    assert not app.in_flight
+    monkeypatch.undo()
+
+    task_id = client.post("/translate", files={'file': ("fine.wav", wav(1, 700))}).json()['task_id']
+    assert result(client, task_id).status_code == 200
+
+def test_uploads_are_checked_while_read_back(server, monkeypatch):
+    from starlette.datastructures import UploadFile
+    app, client = server
+    read = []
+    original = UploadFile.read
+
+    async def counted(self, size=-1):
+        read.append(size)
+        return await original(self, size)
+
+    monkeypatch.setattr(UploadFile, "read", counted)
+    monkeypatch.setattr(app, "upload_read_bytes", 4096)
+    monkeypatch.setattr(app, "max_audio_seconds", 2)
+    response = client.post("/translate", files={'file': ("long.wav", wav(3, 800))})
+    assert response.status_code == 413 and "longer" in response.json()['detail']
+    # Rejected from the header in the first chunk
+    assert read == [4096]
+
+    monkeypatch.setattr(app, "max_upload_bytes", 10000)
+    response = client.post("/translate", files={'file': ("large.wav", wav(1, 800))})
+    assert response.status_code == 413 and "larger" in response.json()['detail']
+
+def test_tasks_are_prepared_ahead_of_a_busy_worker(server, blocked, monkeypatch):
+    app, client = server
+    prepared = []
+    prepare = app.prefetcher.prepare
+
+    def record(job):
+        prepared.append((job['task_id'], threading.current_thread().name))
+        return prepare(job)
+
+    monkeypatch.setattr(app.prefetcher, "prepare", record)
+    post = lambda i: client.post("/translate", headers={'x-api-key': "prefetch"},
+                                 files={'file': (f"{i}.wav", wav(1, 900 + i))}).json()['task_id']
+    running = post(0)
+    eventually(lambda: client.get(f"/status/{running}").json()['status'] == 'running')
+    waiting = [post(1), post(2)]
+    # One task waits for the worker and one in the prefetch buffer, both prepared already
+    eventually(lambda: len(prepared) == 3 and app.prefetcher.buffered() == 1)
+    assert [task_id for task_id, _ in prepared] == [running] + waiting
+    assert all(thread.startswith("preprocess") for _, thread in prepared)
+    assert all(client.get(f"/status/{task_id}").json()['status'] == 'pending' for task_id in waiting)
+
+    blocked.set()
+    for task_id in [running] + waiting:
+        assert result(client, task_id).status_code == 200
+    assert app.prefetcher.buffered() == 0
+
+def test_long_uploads_resume_from_their_checkpointed_chunks(server, monkeypatch):
+    app, client = server
+    calls = []
+    transcribe = app.backend.transcribe
+
+    def flaky(model, audio, options=None):
+        calls.append(len(audio))
+        if len(calls) == 2:
+            raise RuntimeError("worker died")
+        return transcribe(model, audio, options)
+
+    monkeypatch.setattr(app.backend, "transcribe", flaky)
+    data = wav(100, 1000)
+    _, key = app.content_keys(data, model=app.registry.default_model, vad=False, backend="stub", quantization=None)
+    failed = client.post("/translate", files={'file': ("long.wav", data)}).json()['task_id']
+    assert result(client, failed).status_code == 400
+    chunks = app.checkpoints.plan(key)
+    # Windows of about 30 seconds, independent of the number of workers
+    assert len(chunks) == 4
+    assert all(chunk['own_end'] - chunk['own_start'] <= 35 * 16000 for chunk in chunks)
+    # No chunk runs anymore once the task failed, its single worker is free
+    assert len(calls) == 2 and app.pool.active == 0
+    assert list(app.checkpoints.completed(key)) == [0]
+
+    resumed = client.post("/translate", files={'file': ("long.wav", data)}).json()['task_id']
+    assert result(client, resumed).status_code == 200
+    assert len(calls) == 2 + len(chunks) - 1
+    # Cleared once the result is cached, after the task is reported finished
+    eventually(lambda: app.checkpoints.plan(key) is None)
+
+def test_uploads_of_unfinished_tasks_outlive_the_quota(server, blocked):
+    app, client = server
+    created = [client.post("/translate", headers={'x-api-key': f"pinned{i}"},
+                           files={'file': (f"pinned{i}.wav", wav(1, 1100 + i))}).json()['task_id']
+               for i in range(app.upload_quota.max_files + 2)]
+    pinned = lambda: sorted(name for name in os.listdir("uploads") if "pinned" in name)
+    eventually(lambda: len(pinned()) == len(created))
+
+    blocked.set()
+    for task_id in created:
+        assert result(client, task_id).status_code == 200
+    # Removed by the next saved upload once finished
+    client.post("/translate", files={'file': ("unpinned.wav", wav(1, 1200))})
+    eventually(lambda: app.upload_quota.stats()['files'] <= app.upload_quota.max_files)
+
+def test_only_audio_decoded_by_ffmpeg_is_cached(server):
+    app, client = server
+    cached = lambda data: os.path.exists(os.path.join("audio", app.content_keys(data)[0] + ".npy"))
+    # Read in place, as cheap as reading it back from the cache
+    direct = wav(1, 1300)
+    assert result(client, client.post("/translate", files={'file': ("direct.wav", direct)}).json()['task_id']).status_code == 200
+    assert not cached(direct)
+
+    resampled = wav(1, 1300, rate=8000)
+    assert result(client, client.post("/translate", files={'file': ("resampled.wav", resampled)}).json()['task_id']).status_code == 200
+    eventually(lambda: cached(resampled))
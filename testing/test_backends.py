@@ -0,0 +1,51 @@
+import sys
+
+import numpy as np
+import pytest
+from utils.backends import create_backend, StubBackend
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("onnx")
+
+def test_stub_backend():
+    backend = create_backend("stub", seconds_per_second=0, overhead=0)
+    assert isinstance(backend, StubBackend)
+    model = backend.load("base")
+    clips = [np.zeros(16000, dtype=np.float32), np.ones(8000, dtype=np.float32)]
+    assert backend.transcribe_batch(model, clips) == [backend.transcribe(model, clip) for clip in clips]
+
+def test_stub_models_do_not_need_whisper(monkeypatch):
+    # A None entry makes importing the module fail
+    monkeypatch.setitem(sys.modules, "whisper", None)
+    assert "base" in StubBackend().available_models()
+
+def test_quantization_is_part_of_the_backend():
+    assert create_backend("stub").quantization is None
+    assert create_backend("int8").quantization == "int8"
+
+def test_quantized_linear_layers():
+    torch = pytest.importorskip("torch")
+    whisper_model = pytest.importorskip("whisper.model")
+    from utils.backends import quantize_linear_layers
+    from utils.models import model_memory
+
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(whisper_model.Linear(256, 256), torch.nn.GELU(), whisper_model.Linear(256, 64)).eval()
+    x = torch.randn(8, 256)
+    expected = model(x)
+    memory = model_memory(model)
+    quantized = quantize_linear_layers(model)
+    assert not any(isinstance(module, torch.nn.Linear) for module in quantized.modules())
+    assert model_memory(quantized) < memory / 2
+    assert torch.allclose(quantized(x), expected, atol=0.05)
+
+def test_whisper_features_match_batch_input():
+    pytest.importorskip("whisper")
+    from types import SimpleNamespace
+    from utils.backends import WhisperBackend
+
+    model = SimpleNamespace(dims=SimpleNamespace(n_mels=80))
+    mel = WhisperBackend(device="cpu").prepare(model, np.zeros(16000, dtype=np.float32))
+    assert tuple(mel.shape) == (80, 3000)
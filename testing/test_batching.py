@@ -0,0 +1,42 @@
+import asyncio
+from utils.batching import BatchScheduler
+
+
+def test_requests_within_window_share_a_batch():
+    batches = []
+
+    async def run_batch(key, items):
+        batches.append((key, list(items)))
+        return [item * 10 for item in items]
+
+    async def main():
+        scheduler = BatchScheduler(run_batch, window=0.05, max_batch=8)
+        return await asyncio.gather(*(scheduler.submit("base", i) for i in range(3)),
+                                    scheduler.submit("small", 7))
+
+    assert asyncio.run(main()) == [0, 10, 20, 70]
+    assert sorted(batches) == [("base", [0, 1, 2]), ("small", [7])]
+
+def test_full_batch_runs_without_waiting():
+    batches = []
+
+    async def run_batch(key, items):
+        batches.append(list(items))
+        return items
+
+    async def main():
+        scheduler = BatchScheduler(run_batch, window=10, max_batch=2)
+        return await asyncio.wait_for(asyncio.gather(*(scheduler.submit(None, i) for i in range(4))), timeout=1)
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+    assert batches == [[0, 1], [2, 3]]
+
+def test_batch_failure_reaches_every_caller():
+    async def run_batch(key, items):
+        raise RuntimeError("inference failed")
+
+    async def main():
+        scheduler = BatchScheduler(run_batch, window=0.01)
+        return await asyncio.gather(scheduler.submit(None, 1), scheduler.submit(None, 2), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(main())] == ["inference failed"] * 2
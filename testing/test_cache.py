@@ -0,0 +1,50 @@
+import numpy as np
+from utils.cache import AudioCache, ResultCache, content_key, content_keys
+
+
+def test_key_depends_on_content_and_options():
+    key = content_key(b"audio", model="base", vad=False)
+    assert key == content_key(b"audio", vad=False, model="base")
+    assert key != content_key(b"audio", model="small", vad=False)
+    assert key != content_key(b"other", model="base", vad=False)
+
+def test_results_survive_a_restart(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path), memory_entries=1, disk_entries=10)
+    cache.put("a", {'text': "first"})
+    cache.put("b", {'text': "second"})
+    assert cache.get("a") == {'text': "first"}
+    assert ResultCache(cache_dir=str(tmp_path)).get("b") == {'text': "second"}
+    assert cache.get("missing") is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_oldest_entries_are_evicted(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path), memory_entries=1, disk_entries=2)
+    for key in "abc":
+        cache.put(key, {'text': key})
+    assert cache.get("a") is None
+    assert cache.get("c") == {'text': "c"}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b.json", "c.json"]
+
+def test_audio_key_ignores_options():
+    audio_key, key = content_keys(b"audio", model="base", vad=False)
+    assert key == content_key(b"audio", model="base", vad=False)
+    assert audio_key == content_keys(b"audio", model="small", vad=True)[0]
+    assert audio_key != content_keys(b"other")[0]
+
+def test_decoded_audio_is_memory_mapped_float16(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path))
+    audio = np.linspace(-1, 1, 16000, dtype=np.float32)
+    assert cache.get("a") is None
+    cache.put("a", audio)
+    cached = cache.get("a")
+    assert isinstance(cached, np.memmap) and cached.dtype == np.float16
+    assert np.allclose(cached, audio, atol=1e-3)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+def test_least_recently_used_audio_is_evicted(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path), max_files=2)
+    cache.put("a", np.zeros(100, dtype=np.float32))
+    cache.put("b", np.zeros(100, dtype=np.float32))
+    assert cache.get("a") is not None
+    cache.put("c", np.zeros(100, dtype=np.float32))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.npy", "c.npy"]
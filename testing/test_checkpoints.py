@@ -0,0 +1,30 @@
+import sqlite3
+from utils.checkpoints import CheckpointStore
+
+CHUNKS = [{'start': 0, 'end': 100, 'own_start': 0, 'own_end': 90}, {'start': 80, 'end': 200, 'own_start': 90, 'own_end': 200}]
+
+
+def test_resumed_transcription_keeps_plan_and_results(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    store = CheckpointStore(path=path)
+    assert store.start("key", CHUNKS) == CHUNKS
+    store.save("key", 1, {'text': "second", 'segments': []})
+
+    # Another process picks the transcription up after a restart
+    resumed = CheckpointStore(path=path)
+    assert resumed.start("key", [{'start': 0, 'end': 200, 'own_start': 0, 'own_end': 200}]) == CHUNKS
+    assert resumed.completed("key") == {1: {'text': "second", 'segments': []}}
+    resumed.clear("key")
+    assert resumed.plan("key") is None and resumed.completed("key") == {}
+
+def test_abandoned_checkpoints_expire(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    store = CheckpointStore(path=path, ttl=60)
+    store.start("old", CHUNKS)
+    store.save("old", 0, {'text': "first"})
+    store.start("new", CHUNKS)
+    with sqlite3.connect(path) as connection:
+        connection.execute("UPDATE plans SET timestamp = 0 WHERE key = 'old'")
+    assert store.expire() == 1
+    assert store.plan("old") is None and store.completed("old") == {}
+    assert store.plan("new") == CHUNKS
@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+import pytest
+from utils.chunking import plan_chunks, merge_results, run_chunks
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture
+def audio():
+    # Speech-like noise with a pause of 0.5 s every 10 s
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(95 * SAMPLE_RATE) * 0.1).astype(np.float32)
+    for second in range(10, 95, 10):
+        audio[int((second - 0.25) * SAMPLE_RATE):int((second + 0.25) * SAMPLE_RATE)] = 0
+    return audio
+
+def test_chunks_cut_at_silence(audio):
+    chunks = plan_chunks(audio, chunk_seconds=30, search_seconds=5, overlap_seconds=1)
+    assert chunks[0]['own_start'] == 0
+    assert chunks[-1]['own_end'] == len(audio)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous['own_end'] == chunk['own_start']
+        # Every cut falls into a pause
+        assert np.all(audio[chunk['own_start']:chunk['own_start'] + 160] == 0)
+        assert chunk['start'] == chunk['own_start'] - SAMPLE_RATE
+
+def test_short_audio_single_chunk():
+    chunks = plan_chunks(np.zeros(10 * SAMPLE_RATE, dtype=np.float32), chunk_seconds=30)
+    assert chunks == [{'start': 0, 'end': 10 * SAMPLE_RATE, 'own_start': 0, 'own_end': 10 * SAMPLE_RATE}]
+
+def test_merge_results_shifts_and_deduplicates():
+    chunks = [{'start': 0, 'end': 31 * SAMPLE_RATE, 'own_start': 0, 'own_end': 30 * SAMPLE_RATE},
+              {'start': 29 * SAMPLE_RATE, 'end': 50 * SAMPLE_RATE, 'own_start': 30 * SAMPLE_RATE, 'own_end': 50 * SAMPLE_RATE}]
+    results = [
+        {'language': 'en', 'segments': [{'start': 0.0, 'end': 28.0, 'text': ' One.'},
+                                        {'start': 28.5, 'end': 31.0, 'text': ' Two'}]},
+        {'language': 'en', 'segments': [{'start': 0.0, 'end': 2.0, 'text': ' Two'},
+                                        {'start': 2.0, 'end': 10.0, 'text': ' three.'}]},
+    ]
+    merged = merge_results(results, chunks)
+    assert merged['text'] == " One. Two three."
+    assert [(segment['start'], segment['end']) for segment in merged['segments']] == [(0.0, 28.0), (28.5, 31.0), (31.0, 39.0)]
+    assert merged['language'] == 'en'
+
+def test_chunks_borrow_only_free_workers():
+    async def main():
+        slots = asyncio.Semaphore(3)
+        await slots.acquire()
+        running, peak, order = set(), [0], []
+
+        async def run(index):
+            running.add(index)
+            peak[0] = max(peak[0], len(running))
+            await asyncio.sleep(0.01)
+            running.discard(index)
+            order.append(index)
+            return index * 10
+
+        # The task and two free workers
+        results = await run_chunks(run, list(range(6)), slots)
+        assert peak[0] == 3 and slots._value == 2
+
+        # A task waiting for a worker takes turns with the chunks for the borrowed slots given back
+        slots, order[:] = asyncio.Semaphore(2), []
+        await slots.acquire()
+        chunks = asyncio.ensure_future(run_chunks(run, list(range(6)), slots))
+        await asyncio.sleep(0)
+        await slots.acquire()
+        assert len(order) <= 2
+        slots.release()
+        await chunks
+        return results
+
+    assert asyncio.run(main()) == {index: index * 10 for index in range(6)}
+
+def test_failed_chunk_stops_the_task_after_its_chunks_in_flight():
+    async def main():
+        slots = asyncio.Semaphore(2)
+        await slots.acquire()
+        started, finished = [], []
+
+        async def run(index):
+            started.append(index)
+            await asyncio.sleep(0.01 if index == 0 else 0.05)
+            if index == 0:
+                raise RuntimeError("worker died")
+            finished.append(index)
+
+        with pytest.raises(RuntimeError):
+            await run_chunks(run, list(range(5)), slots)
+        # The chunk in flight next to the failed one finished, none was started after the failure
+        assert started == [0, 1] and finished == [1]
+        assert slots._value == 1
+
+    asyncio.run(main())
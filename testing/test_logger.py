@@ -0,0 +1,51 @@
+import json
+import logging
+import time
+from utils.logger import CustomFormatter, JsonFormatter, RateLimitFilter, BackgroundHandler
+
+
+def make_record(msg="hello %s", args=("world",), level=logging.INFO, lineno=1):
+    return logging.LogRecord("test", level, "app.py", lineno, msg, args, None, func="upload")
+
+def test_formatter_uses_record_function():
+    line = CustomFormatter(color=False).format(make_record())
+    assert line.startswith("INFO: [upload] ") and line.endswith(" - hello world")
+
+def test_formatter_does_not_change_record():
+    record = make_record()
+    CustomFormatter().format(record)
+    assert record.levelname == "INFO"
+
+def test_json_formatter():
+    record = make_record()
+    record.task_id = "abc"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == "hello world"
+    assert entry['function'] == "upload"
+    assert entry['level'] == "INFO"
+    assert entry['task_id'] == "abc"
+
+def test_rate_limit_per_call_site():
+    limiter = RateLimitFilter(rate=0.001, burst=2)
+    assert [limiter.filter(make_record()) for _ in range(4)] == [True, True, False, False]
+    assert limiter.filter(make_record(lineno=2))
+    assert limiter.filter(make_record(level=logging.ERROR))
+    limiter.rate = 1000
+    time.sleep(0.01)
+    record = make_record()
+    assert limiter.filter(record)
+    assert record.getMessage() == "hello world (2 similar messages suppressed)"
+
+def test_background_handler_writes_on_listener_thread():
+    written = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            written.append((record.getMessage(), record.funcName))
+    handler = BackgroundHandler([Collect()])
+    handler.listener.start()
+    args = ["before"]
+    handler.handle(make_record("value %s", (args,)))
+    args[0] = "after"
+    handler.listener.stop()
+    assert written == [("value ['before']", "upload")]
@@ -0,0 +1,52 @@
+import threading
+import pytest
+from utils.metrics import MetricsRegistry
+from utils.scheduler import FairScheduler, QueueFull
+
+
+def test_counter_sums_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests.", ["source"])
+
+    def work():
+        for _ in range(1000):
+            counter.inc(source="http")
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(5, source="websocket")
+    assert counter.value(source="http") == 4000
+    assert 'requests_total{source="websocket"} 5' in registry.render()
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value)
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum 4.05' in lines
+    assert 'latency_seconds_count 4' in lines
+
+def test_gauge_and_label_escaping():
+    registry = MetricsRegistry()
+    registry.gauge("queued", "Queued tasks.", lambda: {('a "b"',): 2}, labels=["client"])
+    text = registry.render()
+    assert "# TYPE queued gauge" in text
+    assert 'queued{client="a \\"b\\""} 2' in text
+
+def test_registering_twice_returns_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("loads_total", "Loads.") is registry.counter("loads_total", "Loads.")
+
+def test_queue_full_reason():
+    scheduler = FairScheduler(max_queued=1, max_total=1)
+    scheduler.reserve("a")
+    for client, reason in (("a", "client_queue"), ("b", "server_queue")):
+        with pytest.raises(QueueFull) as error:
+            scheduler.reserve(client)
+        assert error.value.reason == reason
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from utils.models import ModelRegistry
+
+
+class FakeTensor:
+    def __init__(self, size):
+        self.size = size
+
+    def numel(self):
+        return self.size
+
+    def element_size(self):
+        return 1
+
+
+class FakeModel:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+    def parameters(self):
+        return [FakeTensor(self.size)]
+
+    def buffers(self):
+        return []
+
+
+SIZES = {"tiny": 10, "base": 20, "small": 40}
+
+@pytest.fixture
+def loads():
+    return []
+
+@pytest.fixture
+def registry(loads):
+    def loader(name):
+        loads.append(name)
+        return FakeModel(name, SIZES[name])
+    return ModelRegistry(loader=loader, default_model="base", memory_limit=60)
+
+def test_model_loaded_once(registry, loads):
+    first = registry.get()
+    second = registry.get("base")
+    assert first is second
+    assert loads == ["base"]
+    stats = registry.stats()["models"]["base"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["memory"] == 20
+
+def test_least_recently_used_model_evicted(registry, loads):
+    registry.get("tiny")
+    registry.get("base")
+    registry.get("tiny")
+    registry.get("small")
+    stats = registry.stats()
+    assert stats["resident"] == ["tiny", "small"]
+    assert stats["resident_memory"] == 50
+    assert stats["models"]["base"]["evictions"] == 1
+
+def test_concurrent_requests_share_one_load(registry, loads):
+    threads = [threading.Thread(target=registry.get, args=("small",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ["small"]
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from utils.notify import TaskEvents, WebhookSender
+
+
+def test_waiters_wake_up_on_completion():
+    async def main():
+        events = TaskEvents()
+        subscriber = events.subscribe()
+        waiting = asyncio.create_task(events.wait("a", timeout=5))
+        await asyncio.sleep(0)
+        events.publish("a", "running")
+        events.publish("a", "finished", text="hello")
+        assert await waiting == "finished"
+        assert await events.wait("b", timeout=0.01) is None
+        return [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+
+    assert asyncio.run(main()) == [{'task_id': "a", 'status': "running"},
+                                   {'task_id': "a", 'status': "finished", 'text': "hello"}]
+
+def test_watched_tasks_finishing_before_the_wait_are_not_missed():
+    async def main():
+        events = TaskEvents()
+        waiter = events.watch("a")
+        # The task finishes while its status is read, before the wait starts
+        events.publish("a", "finished")
+        status = await events.wait("a", timeout=5, waiter=waiter)
+        return status, events._waiters
+
+    assert asyncio.run(main()) == ("finished", {})
+
+def test_slow_subscribers_drop_oldest_events():
+    async def main():
+        events = TaskEvents(queue_size=2)
+        subscriber = events.subscribe()
+        for i in range(3):
+            events.publish(str(i), "pending")
+        return [subscriber.get_nowait()['task_id'] for _ in range(subscriber.qsize())]
+
+    assert asyncio.run(main()) == ["1", "2"]
+
+def test_failed_callbacks_are_retried():
+    received, failures = [], [2]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if failures[0]:
+                failures[0] -= 1
+                self.send_response(503)
+            else:
+                received.append(json.loads(body))
+                self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sender = WebhookSender(max_attempts=3, backoff=0.01)
+    sender.send(f"http://127.0.0.1:{server.server_port}/hook", {'task_id': "a", 'status': "finished"})
+    deadline = time.monotonic() + 5
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+    sender.close()
+    server.shutdown()
+    assert received == [{'task_id': "a", 'status': "finished"}]
+    assert sender.stats() == {'delivered': 1, 'failed': 0, 'queued': 0}
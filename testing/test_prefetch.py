@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+from utils.prefetch import Prefetcher
+
+
+def test_tasks_are_prepared_ahead_in_order():
+    prepared = []
+
+    def prepare(job):
+        time.sleep(0.1)
+        prepared.append(job)
+        return job * 10
+
+    async def main():
+        queue = asyncio.Queue()
+        for i in range(4):
+            queue.put_nowait(("client", i))
+        queue.put_nowait(None)
+        prefetcher = Prefetcher(queue.get, prepare, depth=2, workers=2)
+        results = []
+        while (dispatched := await prefetcher.get()) is not None:
+            client, job, future = dispatched
+            # Later tasks are prepared while this one is consumed
+            await asyncio.sleep(0.1)
+            results.append((job, future.result()))
+        prefetcher.close()
+        return results
+
+    start = time.perf_counter()
+    assert asyncio.run(main()) == [(0, 0), (1, 10), (2, 20), (3, 30)]
+    assert sorted(prepared) == [0, 1, 2, 3]
+    # Preparing and consuming one after the other would take 0.8s
+    assert time.perf_counter() - start < 0.7
+
+def test_depth_bounds_tasks_taken():
+    taken = []
+    release = threading.Event()
+
+    async def source():
+        taken.append(len(taken))
+        return "client", taken[-1]
+
+    async def main():
+        prefetcher = Prefetcher(source, lambda job: release.wait(1), depth=3)
+        consumer = asyncio.create_task(prefetcher.get())
+        await asyncio.sleep(0.05)
+        buffered = prefetcher.buffered()
+        release.set()
+        await consumer
+        prefetcher.close()
+        return buffered
+
+    assert asyncio.run(main()) == 3
+    assert len(taken) <= 4
+
+def test_preparation_failure_reaches_consumer():
+    def prepare(job):
+        raise ValueError("undecodable")
+
+    async def main():
+        queue = asyncio.Queue()
+        queue.put_nowait(("client", 1))
+        prefetcher = Prefetcher(queue.get, prepare)
+        client, job, future = await prefetcher.get()
+        prefetcher.close()
+        return future
+
+    future = asyncio.run(main())
+    assert isinstance(future.exception(), ValueError)
@@ -0,0 +1,48 @@
+import os
+from utils.quota import DiskQuota
+
+
+def write(path, size, mtime):
+    with open(path, "wb") as file:
+        file.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+def test_rebuild_removes_oldest_files_beyond_count(tmp_path):
+    for i in range(5):
+        write(tmp_path / f"{i}.wav", 10, 1000 + i)
+    quota = DiskQuota(str(tmp_path), max_files=3, max_bytes=0)
+    removed = quota.rebuild()
+    assert sorted(os.path.basename(path) for path in removed) == ["0.wav", "1.wav"]
+    assert quota.stats() == {'files': 3, 'bytes': 30}
+
+def test_added_files_are_kept_within_size(tmp_path):
+    quota = DiskQuota(str(tmp_path), max_files=0, max_bytes=100)
+    quota.rebuild()
+    for i in range(4):
+        write(tmp_path / f"{i}.wav", 40, 1000 + i)
+        quota.add(str(tmp_path / f"{i}.wav"))
+    assert sorted(os.listdir(tmp_path)) == ["2.wav", "3.wav"]
+    # Rewriting a tracked file replaces its size instead of adding to it
+    write(tmp_path / "3.wav", 50, 2000)
+    quota.add(str(tmp_path / "3.wav"))
+    assert quota.stats() == {'files': 2, 'bytes': 90}
+
+def test_file_just_written_is_never_removed(tmp_path):
+    quota = DiskQuota(str(tmp_path), max_files=0, max_bytes=10)
+    write(tmp_path / "big.wav", 50, 1000)
+    assert quota.add(str(tmp_path / "big.wav")) == []
+    assert os.path.exists(tmp_path / "big.wav")
+
+def test_pinned_files_are_kept_beyond_the_limits(tmp_path):
+    pinned = {str(tmp_path / "a.wav"), str(tmp_path / "b.wav")}
+    quota = DiskQuota(str(tmp_path), max_files=1, max_bytes=0, pinned=lambda: pinned)
+    for mtime, name in enumerate(["a.wav", "b.wav", "c.wav"]):
+        write(tmp_path / name, 10, 1000 + mtime)
+    # The newest file is removed as the older ones are pinned
+    assert quota.rebuild() == [str(tmp_path / "c.wav")]
+    assert sorted(os.listdir(tmp_path)) == ["a.wav", "b.wav"]
+
+    # Unpinned once their tasks finished
+    pinned.clear()
+    write(tmp_path / "d.wav", 10, 2000)
+    assert quota.add(str(tmp_path / "d.wav")) == [str(tmp_path / "a.wav"), str(tmp_path / "b.wav")]
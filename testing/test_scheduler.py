@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from utils.scheduler import FairScheduler, QueueFull
+
+
+def fill(scheduler, client, count):
+    for i in range(count):
+        scheduler.reserve(client)
+        scheduler.put(client, f"{client}{i}")
+
+def drain(scheduler, count):
+    async def main():
+        order = []
+        for _ in range(count):
+            client, job = await scheduler.next()
+            order.append(job)
+            scheduler.done(client, 1.0)
+        return order
+    return asyncio.run(main())
+
+def test_clients_take_turns():
+    scheduler = FairScheduler(max_queued=10)
+    fill(scheduler, "batch", 6)
+    fill(scheduler, "single", 2)
+    assert drain(scheduler, 8) == ["batch0", "single0", "batch1", "single1", "batch2", "batch3", "batch4", "batch5"]
+
+def test_weights_share_workers():
+    scheduler = FairScheduler(weights={"gold": 3})
+    fill(scheduler, "gold", 6)
+    fill(scheduler, "free", 2)
+    assert drain(scheduler, 8)[:4] == ["gold0", "gold1", "free0", "gold2"]
+
+def test_limits_reject_with_retry_after():
+    scheduler = FairScheduler(workers=2, max_queued=2, max_total=3)
+    fill(scheduler, "a", 2)
+    with pytest.raises(QueueFull) as rejected:
+        scheduler.reserve("a")
+    assert rejected.value.retry_after == 1
+    scheduler.seconds_per_task = 10.0
+    fill(scheduler, "b", 1)
+    with pytest.raises(QueueFull) as rejected:
+        scheduler.reserve("c")
+    assert rejected.value.retry_after == 5
+    # Two active clients, each gets half of the workers
+    with pytest.raises(QueueFull) as rejected:
+        scheduler.reserve("a")
+    assert rejected.value.retry_after == 10
+    scheduler.put("recovered", "r0", reserved=False)
+    assert scheduler.stats()['queued'] == 4
+
+def test_running_limit_per_client():
+    scheduler = FairScheduler(max_running=1)
+    fill(scheduler, "a", 2)
+    fill(scheduler, "b", 1)
+
+    async def main():
+        first = await scheduler.next()
+        second = await scheduler.next()
+        waiting = asyncio.create_task(scheduler.next())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        scheduler.done(*first[:1], 1.0)
+        return first[1], second[1], (await waiting)[1]
+
+    assert asyncio.run(main()) == ("a0", "b0", "a1")
+
+def test_retry_after_uses_queued_audio():
+    scheduler = FairScheduler(max_total=1)
+
+    async def main():
+        scheduler.put("a", "short", reserved=False, duration=10)
+        client, _ = await scheduler.next()
+        scheduler.done(client, 2.0, duration=10)
+        scheduler.put("a", "long", reserved=False, duration=600)
+        with pytest.raises(QueueFull) as error:
+            scheduler.reserve("b")
+        return error.value.retry_after
+
+    assert asyncio.run(main()) == 120
@@ -0,0 +1,90 @@
+import io
+import shutil
+import wave
+import numpy as np
+import pytest
+from utils.sound import read_pcm_wav, load_audio, parse_wav_header, bytes_to_wav, pcm_to_mono, pcm_to_float32, resample, PolyphaseResampler
+
+
+def make_wav(samples, sample_rate=16000, channels=1):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.astype('<i2').tobytes())
+    return buffer.getvalue()
+
+@pytest.fixture
+def samples():
+    return (np.sin(np.arange(16000) / 10) * 20000).astype(np.int16)
+
+def test_parse_wav_header(samples):
+    info = parse_wav_header(make_wav(samples))
+    assert info['format'] == 1
+    assert info['channels'] == 1
+    assert info['sample_rate'] == 16000
+    assert info['bit_depth'] == 16
+    assert info['data_size'] == 32000
+
+def test_fast_path_from_bytes(samples):
+    audio = read_pcm_wav(make_wav(samples))
+    assert audio.dtype == np.float32
+    np.testing.assert_allclose(audio, samples / 32768, atol=1e-6)
+
+def test_fast_path_from_file(samples, tmp_path):
+    path = tmp_path / "audio.wav"
+    path.write_bytes(make_wav(samples))
+    np.testing.assert_allclose(read_pcm_wav(str(path)), samples / 32768, atol=1e-6)
+
+def test_fast_path_accepts_near_sample_rate(samples):
+    assert read_pcm_wav(make_wav(samples, sample_rate=16050)) is not None
+
+def test_fast_path_rejects_other_formats(samples):
+    assert read_pcm_wav(make_wav(samples, sample_rate=44100)) is None
+    assert read_pcm_wav(make_wav(np.repeat(samples, 2), channels=2)) is None
+    assert read_pcm_wav(b"ID3" + bytes(100)) is None
+
+def test_websocket_wav_takes_fast_path(samples):
+    buffer = io.BytesIO()
+    bytes_to_wav(samples.tobytes(), buffer)
+    np.testing.assert_allclose(read_pcm_wav(buffer.getvalue()), samples / 32768, atol=1e-6)
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_load_audio_falls_back_to_ffmpeg(samples):
+    audio = load_audio(make_wav(np.repeat(samples, 2), sample_rate=32000))
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - 16000) <= 16
+
+def test_pcm_to_mono_bit_depths_and_downmix():
+    assert pcm_to_mono(bytes([0, 128, 255]), bit_depth=8).tolist() == [-1.0, 0.0, 127 / 128]
+    values = [-2**23, -1, 0, 2**23 - 1]
+    data = b"".join(value.to_bytes(3, "little", signed=True) for value in values)
+    assert (pcm_to_mono(data, bit_depth=24) * 2**23).tolist() == values
+    stereo = np.array([[1000, 3000], [-100, 100]], dtype='<i2').tobytes()
+    assert (pcm_to_mono(stereo, bit_depth=16, channels=2) * 32768).tolist() == [2000, 0]
+
+@pytest.mark.parametrize("sample_rate", [8000, 22050, 44100, 48000])
+def test_resample_keeps_a_tone(sample_rate):
+    tone = np.sin(2 * np.pi * 440 * np.arange(2 * sample_rate) / sample_rate).astype(np.float32)
+    resampled = resample(tone, sample_rate)
+    assert len(resampled) == 32000
+    expected = np.sin(2 * np.pi * 440 * np.arange(32000) / 16000)
+    assert np.abs(resampled[100:-100] - expected[100:-100]).max() < 1e-3
+
+def test_resample_removes_frequencies_above_nyquist():
+    tone = np.sin(2 * np.pi * 12000 * np.arange(48000) / 48000).astype(np.float32)
+    assert np.abs(resample(tone, 48000)[100:-100]).max() < 1e-3
+
+def test_streaming_resampler_matches_one_shot():
+    audio = np.random.default_rng(0).standard_normal(44100).astype(np.float32)
+    resampler = PolyphaseResampler(44100)
+    pieces = [resampler.process(audio[start:start + 1234]) for start in range(0, len(audio), 1234)]
+    streamed = np.concatenate(pieces + [resampler.flush()])
+    np.testing.assert_allclose(streamed, resample(audio, 44100), atol=1e-6)
+
+def test_pcm_to_float32_without_ffmpeg(samples, monkeypatch):
+    monkeypatch.setattr("subprocess.Popen", None)
+    stereo = np.repeat(samples, 2).astype('<i2').tobytes()
+    audio = pcm_to_float32(stereo, sample_rate=8000, channels=2)
+    assert len(audio) == 32000
@@ -0,0 +1,68 @@
+import numpy as np
+from utils.streaming import StreamingTranscriber
+
+
+def result(*segments):
+    return {'segments': [{'start': start, 'end': end, 'text': text} for start, end, text in segments]}
+
+def feed(stream, seconds):
+    stream.append(np.zeros(int(seconds * stream.sample_rate), dtype=np.float32))
+
+def test_ready_after_step():
+    stream = StreamingTranscriber(step=2.0)
+    feed(stream, 1.5)
+    assert not stream.ready()
+    feed(stream, 0.5)
+    assert stream.ready()
+    stream.snapshot()
+    assert not stream.ready()
+
+def test_segment_final_once_two_decodes_agree():
+    stream = StreamingTranscriber(step=2.0, margin=1.0)
+    feed(stream, 4)
+    stream.snapshot()
+    finals, partial = stream.update(result((0, 2, " Hello there."), (2, 4, " How are")))
+    assert finals == []
+    assert partial == "Hello there. How are"
+
+    feed(stream, 2)
+    stream.snapshot()
+    finals, partial = stream.update(result((0, 2, " Hello there"), (2, 5, " How are you?"), (5, 6, " I")))
+    assert finals == [{'start': 0, 'end': 2, 'text': "Hello there"}]
+    assert partial == "How are you? I"
+    # The final segment is cut off the buffer, the next window starts right after it
+    assert stream.offset == 2.0
+    assert len(stream.buffer) == 4 * stream.sample_rate
+
+def test_final_segments_have_absolute_timestamps():
+    stream = StreamingTranscriber(step=2.0, margin=0.5)
+    feed(stream, 6)
+    stream.snapshot()
+    stream.update(result((0, 3, "one"), (3, 6, "two")))
+    stream.snapshot()
+    stream.update(result((0, 3, "one"), (3, 6, "two")))
+    feed(stream, 2)
+    stream.snapshot()
+    finals, partial = stream.update(result((0, 3, "two"), (3, 5, "three")), final=True)
+    assert [segment['start'] for segment in finals] == [3.0, 6.0]
+    assert partial == ""
+    assert [segment['text'] for segment in stream.committed] == ["one", "two", "three"]
+
+def test_long_window_finalized_without_agreement():
+    stream = StreamingTranscriber(step=2.0, margin=1.0, max_window=10.0)
+    feed(stream, 12)
+    stream.snapshot()
+    finals, _ = stream.update(result((0, 5, "first"), (5, 9, "second"), (9, 12, "third")))
+    assert [segment['text'] for segment in finals] == ["first", "second"]
+
+def test_long_window_of_a_single_segment_is_finalized():
+    stream = StreamingTranscriber(step=2.0, margin=1.0, max_window=10.0)
+    for _ in range(3):
+        feed(stream, 12)
+        stream.snapshot()
+        # A decoder returning the whole window as one segment
+        finals, partial = stream.update(result((0, len(stream.buffer) / stream.sample_rate, "everything")))
+        assert [segment['text'] for segment in finals] == ["everything"]
+        assert partial == ""
+        assert len(stream.buffer) == 0
+    assert stream.offset == 36.0
@@ -0,0 +1,16 @@
+import numpy as np
+from utils.stub import StubModel
+
+
+def test_stub_is_deterministic():
+    model = StubModel("base", seconds_per_second=0, overhead=0)
+    audio = np.random.default_rng(0).standard_normal(16000).astype(np.float32)
+    first = model.transcribe(audio)
+    assert first == model.transcribe(audio.copy())
+    assert first['text'] != model.transcribe(audio[:8000])['text']
+    assert first['segments'][0]['end'] == 1.0
+
+def test_stub_batch_matches_single():
+    model = StubModel(seconds_per_second=0, overhead=0)
+    clips = [np.zeros(8000, dtype=np.float32), np.ones(16000, dtype=np.float32)]
+    assert model.transcribe_batch(clips) == [model.transcribe(clip) for clip in clips]
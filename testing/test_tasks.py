@@ -0,0 +1,119 @@
+import threading
+import time
+from utils.tasks import TaskStore, SqliteTaskStore
+
+
+def test_oldest_tasks_are_evicted_beyond_capacity():
+    store = TaskStore(capacity=3)
+    ids = [store.add(status='pending') for _ in range(5)]
+    assert len(store) == 3
+    assert ids[0] not in store and ids[1] not in store
+    assert store.get(ids[4])['status'] == 'pending'
+
+def test_update_and_copies():
+    store = TaskStore()
+    task_id = store.add(status='pending', result=None)
+    assert store.update(task_id, status='finished', result="text")
+    task = store.get(task_id)
+    task['status'] = 'changed'
+    assert store.get(task_id)['status'] == 'finished'
+    assert not store.update("missing", status='finished')
+
+def test_tasks_expire_after_ttl():
+    store = TaskStore(ttl=60)
+    task_id = store.add(status='pending')
+    store._tasks[task_id]['timestamp'] -= 120
+    assert store.get(task_id) is None
+    store.add(status='pending')
+    assert len(store) == 1
+
+def test_cursor_pages_through_all_tasks():
+    store = TaskStore(capacity=2000)
+    ids = [store.add(status=str(i)) for i in range(3000)]
+    seen, cursor = [], 0
+    while cursor is not None:
+        page, cursor = store.page(cursor=cursor, limit=250, fields=['status'])
+        seen.extend(page)
+    assert seen == ids[1000:]
+    assert store.page(limit=1)[0] == {ids[1000]: {'timestamp': store.get(ids[1000])['timestamp'], 'status': '1000'}}
+
+def test_concurrent_adds():
+    store = TaskStore(capacity=100)
+    threads = [threading.Thread(target=lambda: [store.add(status='pending') for _ in range(500)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store) == 100
+    assert len(store.page(limit=1000)[0]) == 100
+
+def test_sqlite_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "tasks.sqlite3")
+    store = SqliteTaskStore(path=path, flush_interval=10)
+    task_id = store.add(status='pending', result=None)
+    store.update(task_id, status='finished', result="text")
+    # Buffered writes are visible before they are committed
+    assert store.get(task_id)['result'] == "text"
+    store.close()
+    reopened = SqliteTaskStore(path=path)
+    assert reopened.get(task_id) == {'timestamp': store.get(task_id)['timestamp'], 'status': 'finished', 'result': "text",
+                                     'name': None, 'model': None, 'vad': None, 'cache_key': None, 'upload': None,
+                                     'callback': None}
+    assert not reopened.update("missing", status='failed')
+    reopened.close()
+
+def test_sqlite_store_pages_with_filters_and_evicts(tmp_path):
+    store = SqliteTaskStore(path=str(tmp_path / "tasks.sqlite3"), capacity=5)
+    ids = [store.add(status='finished' if i % 2 else 'failed') for i in range(8)]
+    assert len(store) == 5
+    page, cursor = store.page(limit=2, fields=['status'], status='finished')
+    assert list(page) == [ids[3], ids[5]] and page[ids[3]] == {'status': 'finished'}
+    page, cursor = store.page(cursor=cursor, limit=2, status='finished')
+    assert list(page) == [ids[7]] and cursor is None
+    store.close()
+
+def test_unfinished_tasks_of_stopped_processes_are_claimed_once(tmp_path):
+    path = str(tmp_path / "tasks.sqlite3")
+    store = SqliteTaskStore(path=path)
+    running = store.add(status='running', name="a.wav")
+    store.add(status='finished')
+    store.flush()
+    assert store.claim_orphans() == []
+    # A live instance keeps its tasks, a cleanly stopped one gives them up
+    assert SqliteTaskStore(path=path).claim_orphans() == []
+    store.close()
+
+    first, second = SqliteTaskStore(path=path), SqliteTaskStore(path=path)
+    claimed = first.claim_orphans()
+    assert [(task['id'], task['status'], task['name']) for task in claimed] == [(running, 'pending', "a.wav")]
+    assert second.claim_orphans() == []
+    for opened in (first, second):
+        opened.close()
+
+def test_tasks_of_a_crashed_run_are_claimed_under_the_same_pid(tmp_path):
+    path = str(tmp_path / "tasks.sqlite3")
+    crashed = SqliteTaskStore(path=path, lease=0.3)
+    pending = crashed.add(status='pending')
+    crashed.flush()
+    # Stop renewing the lease without giving it up, like a killed process
+    crashed._closed = True
+    crashed._writer.join()
+
+    # The restarted server has the same PID, e.g. PID 1 in a container
+    restarted = SqliteTaskStore(path=path, lease=0.3)
+    assert restarted.claim_orphans() == []
+    time.sleep(0.4)
+    assert [task['id'] for task in restarted.claim_orphans()] == [pending]
+    restarted.close()
+
+def test_uploads_of_unfinished_tasks(tmp_path):
+    store = SqliteTaskStore(path=str(tmp_path / "tasks.sqlite3"))
+    running = store.add(status='running', upload="uploads/a.wav")
+    finished = store.add(status='pending', upload="uploads/b.wav")
+    store.add(status='pending')
+    store.update(finished, status='finished')
+    assert store.unfinished_uploads() == {"uploads/a.wav"}
+    store.update(running, status='failed')
+    assert store.unfinished_uploads() == set()
+    store.close()
+    assert TaskStore().unfinished_uploads() == set()
@@ -0,0 +1,73 @@
+import asyncio
+import numpy as np
+from utils.sound import float32_to_wav, probe_duration, sniff_audio_format
+from utils.uploads import UploadGuard, file_prefix
+
+BOUNDARY = b"xyz"
+
+
+def multipart(content):
+    return (b"--xyz\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.wav\"\r\n\r\n"
+            + content + b"\r\n--xyz--\r\n")
+
+def call(guard, body, chunk=1024, content_length=True):
+    headers = [(b"content-type", b"multipart/form-data; boundary=xyz")]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {'type': 'http', 'method': 'POST', 'path': '/translate', 'headers': headers}
+    chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)]
+    messages = [{'type': 'http.request', 'body': part, 'more_body': i < len(chunks) - 1} for i, part in enumerate(chunks)]
+    sent, seen = [], []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    async def endpoint(scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] != 'http.request':
+                return
+            seen.append(message['body'])
+            if not message['more_body']:
+                break
+        await send({'type': 'http.response.start', 'status': 202, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b""})
+
+    guard.app = endpoint
+    asyncio.run(guard(scope, receive, send))
+    return sent[0]['status'], b"".join(seen)
+
+def test_sniff_and_probe_wav():
+    wav = float32_to_wav(np.zeros(24000, dtype=np.float32))
+    assert sniff_audio_format(wav) == "wav"
+    assert probe_duration(wav) == 1.5
+    assert sniff_audio_format(b"fLaC\x00\x00\x00\x22") == "flac"
+    assert sniff_audio_format(b"\x00\x00\x00\x20ftypM4A ") == "mp4"
+    assert sniff_audio_format(b"<html>") is None
+    assert probe_duration(b"fLaC\x00\x00\x00\x22") is None
+
+def test_file_prefix():
+    body = multipart(b"RIFF1234WAVEfmt ")
+    assert file_prefix(body, BOUNDARY) == b"RIFF1234WAVEfmt "
+    assert file_prefix(body[:60], BOUNDARY) is None
+    assert file_prefix(multipart(b"abc"), BOUNDARY) == b"abc"
+
+def test_guard_passes_audio_through():
+    body = multipart(float32_to_wav(np.zeros(16000, dtype=np.float32)))
+    assert call(UploadGuard(None, max_bytes=10**6), body) == (202, body)
+
+def test_guard_rejects_before_reading():
+    rejected = []
+    guard = UploadGuard(None, max_bytes=1000, on_reject=rejected.append)
+    assert call(guard, multipart(b"\x00" * 2000))[0] == 413
+    assert call(guard, multipart(b"<html>" + b"\x00" * 100))[0] == 415
+    assert rejected == ['too_large', 'unsupported_format']
+
+def test_guard_counts_bodies_without_length():
+    wav = float32_to_wav(np.zeros(16000, dtype=np.float32))
+    status, seen = call(UploadGuard(None, max_bytes=10000), multipart(wav), content_length=False)
+    assert status == 413
+    assert len(seen) <= 10000
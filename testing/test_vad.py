@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from utils.vad import detect_speech, remove_silence
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+def silence(seconds):
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 1e-4).astype(np.float32)
+
+@pytest.fixture
+def audio():
+    # 2 s silence, 1 s speech, 3 s silence, 1.5 s speech, 1 s silence
+    return np.concatenate([silence(2), tone(1), silence(3), tone(1.5), silence(1)])
+
+def test_detect_speech_regions(audio):
+    regions = detect_speech(audio, padding=0)
+    assert len(regions) == 2
+    (start1, end1), (start2, end2) = [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in regions]
+    assert start1 == pytest.approx(2.0, abs=0.05) and end1 == pytest.approx(3.0, abs=0.05)
+    assert start2 == pytest.approx(6.0, abs=0.05) and end2 == pytest.approx(7.5, abs=0.05)
+
+def test_audio_without_pauses_is_kept():
+    regions = detect_speech(tone(5))
+    assert regions == [(0, 5 * SAMPLE_RATE)]
+
+def test_silence_only():
+    compressed, timestamps = remove_silence(silence(3))
+    assert len(compressed) == 0
+
+def test_remove_silence_maps_timestamps_back(audio):
+    compressed, timestamps = remove_silence(audio, padding=0, gap=0.1)
+    assert len(compressed) / SAMPLE_RATE == pytest.approx(2.6, abs=0.1)
+    # The second region starts after the first one and the gap in the compressed audio
+    second = len(compressed) / SAMPLE_RATE - 1.5
+    assert timestamps.to_original(0.5) == pytest.approx(2.5, abs=0.05)
+    assert timestamps.to_original(second + 0.5) == pytest.approx(6.5, abs=0.05)
+    result = timestamps.remap({'segments': [{'start': 0.0, 'end': 1.0}, {'start': second, 'end': second + 1.5}]})
+    assert [round(segment['start']) for segment in result['segments']] == [2, 6]
@@ -0,0 +1,16 @@
+import asyncio
+import gc
+import platform
+import pytest
+from utils.workers import TranscriptionPool
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="process workers require fork")
+def test_only_process_workers_keep_the_frozen_heap():
+    pool = TranscriptionPool(workers=1, mode="process")
+    pool.start()
+    try:
+        assert gc.get_freeze_count() == 0
+        assert asyncio.run(pool.run(gc.get_freeze_count)) > 0
+    finally:
+        pool.shutdown()
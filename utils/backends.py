@@ -0,0 +1,200 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.sound import SAMPLE_RATE
+from utils.stub import StubModel
+
+
+class InferenceBackend:
+    """_summary_: Loads models and runs inference with them behind a common transcribe contract.
+
+    Models are loaded by `load` and kept by the model registry, `transcribe` and `transcribe_batch` run on
+    transcription workers and return Whisper-like results: a dict with 'text', 'segments' and 'language'.
+    `prepare` computes the input features of a clip ahead of `transcribe_batch`, on a preprocessing thread.
+    """
+
+    name = "base"
+    # Quantization of the model weights, part of the result cache key with the name
+    quantization = None
+
+    def __init__(self, logger: logging.Logger = logging.getLogger(__name__)):
+        self.logger = logger
+
+    def load(self, model_name: str):
+        """_summary_: Loads a model by name."""
+        raise NotImplementedError
+
+    def available_models(self) -> List[str]:
+        """_summary_: Returns the names of the models that can be loaded. Imports Whisper and torch on the first call."""
+        import whisper
+        return whisper.available_models()
+
+    def transcribe(self, model, audio: np.ndarray, options: Optional[Dict] = None) -> Dict:
+        """_summary_: Transcribes 16 kHz mono float32 audio.
+
+        Args:
+            model (Any): Model returned by `load`.
+            audio (np.ndarray): Audio samples.
+            options (dict, optional): Decoding options, e.g. initial_prompt. Defaults to None.
+
+        Returns:
+            dict: Whisper-like transcription result.
+        """
+        raise NotImplementedError
+
+    def prepare(self, model, clip: np.ndarray):
+        """_summary_: Computes the input features of a clip of at most 30 seconds for `transcribe_batch`. Defaults to none.
+
+        Returns:
+            Any: Features passed back to `transcribe_batch`, None when the backend computes them itself.
+        """
+        return None
+
+    def transcribe_batch(self, model, clips: List[np.ndarray], features: Optional[List] = None) -> List[Dict]:
+        """_summary_: Transcribes clips of at most 30 seconds together. Defaults to one `transcribe` call per clip.
+
+        Args:
+            model (Any): Model returned by `load`.
+            clips (List[np.ndarray]): Audio samples of the clips.
+            features (List, optional): Features of the clips computed by `prepare`, None where not computed. Defaults to None.
+
+        Returns:
+            List[dict]: Whisper-like results, in the order of the clips.
+        """
+        return [self.transcribe(model, clip) for clip in clips]
+
+
+class WhisperBackend(InferenceBackend):
+    """_summary_: PyTorch Whisper, FP16 on GPU and FP32 on CPU."""
+
+    name = "whisper"
+
+    def __init__(self, device: Optional[str] = None, logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            device (str, optional): Torch device of the models. Defaults to CUDA when available, else CPU.
+        """
+        super().__init__(logger)
+        self.device = device
+
+    def load(self, model_name: str):
+        import whisper
+        return whisper.load_model(model_name, device=self.device)
+
+    def transcribe(self, model, audio: np.ndarray, options: Optional[Dict] = None) -> Dict:
+        # FP16 is not supported on CPU, request FP32 explicitly instead of letting Whisper warn on every call
+        return model.transcribe(audio, fp16=model.device.type != "cpu", **(options or {}))
+
+    def prepare(self, model, clip: np.ndarray):
+        """_summary_: Computes the log-mel spectrogram of a clip padded to 30 seconds, on the CPU."""
+        import whisper
+        return whisper.log_mel_spectrogram(whisper.pad_or_trim(clip), model.dims.n_mels)
+
+    def transcribe_batch(self, model, clips: List[np.ndarray], features: Optional[List] = None) -> List[Dict]:
+        """_summary_: Decodes the clips padded into one 30-second log-mel batch in one batched encoder and decoder pass.
+
+        Unlike `transcribe`, there is no temperature fallback and every clip yields a single segment spanning the whole clip.
+        """
+        import torch
+        import whisper
+        features = features or [None] * len(clips)
+        mel = torch.stack([mel if mel is not None else self.prepare(model, clip) for clip, mel in zip(clips, features)])
+        decoded = whisper.decode(model, mel.to(model.device), whisper.DecodingOptions(fp16=model.device.type != "cpu"))
+        results = []
+        for clip, decoding in zip(clips, decoded):
+            segment = {'id': 0, 'start': 0.0, 'end': round(len(clip) / SAMPLE_RATE, 3), 'text': decoding.text}
+            results.append({'text': decoding.text, 'segments': [segment], 'language': decoding.language})
+        return results
+
+
+def quantize_linear_layers(model):
+    """_summary_: Replaces the linear layers of a CPU model with dynamically int8-quantized ones, in place.
+
+    Weights are stored as int8 and activations are quantized on the fly, which speeds up the matrix multiplications
+    that dominate Whisper on CPU and shrinks the linear weights to a quarter of their size.
+
+    Args:
+        model (torch.nn.Module): Model in FP32 on the CPU.
+
+    Returns:
+        torch.nn.Module: The quantized model.
+    """
+    import torch
+    for module in model.modules():
+        # Whisper subclasses nn.Linear only to cast weights to the input dtype, which dynamic quantization does not
+        # recognize, the plain class computes the same in FP32
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+class QuantizedWhisperBackend(WhisperBackend):
+    """_summary_: PyTorch Whisper on the CPU with dynamically int8-quantized linear layers."""
+
+    name = "int8"
+    quantization = "int8"
+
+    def __init__(self, logger: logging.Logger = logging.getLogger(__name__)):
+        super().__init__(device="cpu", logger=logger)
+
+    def load(self, model_name: str):
+        model = quantize_linear_layers(super().load(model_name).eval())
+        self.logger.info(f"Quantized the linear layers of model '{model_name}' to int8")
+        return model
+
+
+# Model names of Whisper accepted by the stub
+STUB_MODELS = ("tiny.en", "tiny", "base.en", "base", "small.en", "small", "medium.en", "medium",
+               "large-v1", "large-v2", "large-v3", "large", "large-v3-turbo", "turbo")
+
+
+class StubBackend(InferenceBackend):
+    """_summary_: Deterministic stub simulating inference cost without model weights, for benchmarks and tests."""
+
+    name = "stub"
+
+    def __init__(self, seconds_per_second: float = 0.05, overhead: float = 0.05, logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            seconds_per_second (float, optional): Simulated compute time per second of audio. Defaults to 0.05.
+            overhead (float, optional): Simulated compute time per call in seconds. Defaults to 0.05.
+        """
+        super().__init__(logger)
+        self.seconds_per_second = seconds_per_second
+        self.overhead = overhead
+
+    def available_models(self) -> List[str]:
+        """_summary_: Returns the names of the Whisper models, without importing Whisper."""
+        return list(STUB_MODELS)
+
+    def load(self, model_name: str):
+        return StubModel(model_name, seconds_per_second=self.seconds_per_second, overhead=self.overhead)
+
+    def transcribe(self, model, audio: np.ndarray, options: Optional[Dict] = None) -> Dict:
+        return model.transcribe(audio, **(options or {}))
+
+    def transcribe_batch(self, model, clips: List[np.ndarray], features: Optional[List] = None) -> List[Dict]:
+        return model.transcribe_batch(clips)
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend, QuantizedWhisperBackend, StubBackend)}
+
+
+def create_backend(name: str, logger: logging.Logger = logging.getLogger(__name__), **options) -> InferenceBackend:
+    """_summary_: Creates an inference backend by name.
+
+    Args:
+        name (str): One of "whisper", "int8" and "stub".
+        **options: Options of the backend, e.g. the simulated cost of the stub.
+
+    Raises:
+        ValueError: Raised when the backend is unknown.
+
+    Returns:
+        InferenceBackend: The backend.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unsupported inference backend: {name}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](logger=logger, **options)
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from utils.metrics import REGISTRY
+
+batch_size = REGISTRY.histogram("stt_batch_size", "Number of requests per batch.", buckets=(1, 2, 4, 8, 16, 32, 64))
+
+
+class BatchScheduler:
+    """_summary_: Collects short transcription requests arriving within a small time window into batches.
+
+    Requests are grouped by key (e.g. model name and options that must be equal within a batch). The first request
+    of a group opens a window of `window` seconds, and the group is sent to `run_batch` as one batch once the window
+    closes or `max_batch` requests are collected, whichever comes first. Each caller gets its own result back.
+    """
+
+    def __init__(self,
+                 run_batch: Callable[[object, List], Awaitable[List]],
+                 window: float = 0.05,
+                 max_batch: int = 8,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            run_batch (Callable[[object, List], Awaitable[List]]): Coroutine function called with the group key and the list of
+                items of a batch, returning the list of results in the same order.
+            window (float, optional): Seconds to wait for more requests after the first one of a batch. Defaults to 0.05.
+            max_batch (int, optional): Maximum number of requests in a batch. Defaults to 8.
+        """
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.logger = logger
+        self._pending: Dict[object, List] = {}
+        self._timers: Dict[object, asyncio.TimerHandle] = {}
+        self._running = set()
+
+    async def submit(self, key, item):
+        """_summary_: Adds a request to the current batch of its group and waits for its result.
+
+        Args:
+            key (Hashable): Group of the request, only requests with equal keys are batched together.
+            item (Any): Request passed to `run_batch`.
+
+        Returns:
+            Any: Result of the request.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, future))
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer: Optional[asyncio.TimerHandle] = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            running = asyncio.create_task(self._run(key, batch))
+            self._running.add(running)
+            running.add_done_callback(self._running.discard)
+
+    async def _run(self, key, batch):
+        items = [item for item, _ in batch]
+        batch_size.observe(len(items))
+        try:
+            results = await self.run_batch(key, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.logger.debug(f"Ran a batch of {len(batch)} request(s)")
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
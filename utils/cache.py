@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from utils.quota import DiskQuota
+
+
+def content_key(data: bytes, **options) -> str:
+    """_summary_: Computes the cache key of an audio file and the options it is transcribed with.
+
+    Args:
+        data (bytes): Content of the audio file.
+        **options: Model name and decoding options affecting the result.
+
+    Returns:
+        str: Hex SHA-256 digest of the content and the options.
+    """
+    return content_keys(data, **options)[1]
+
+
+def content_keys(data: bytes, **options) -> Tuple[str, str]:
+    """_summary_: Computes the key of an audio file alone and the cache key of the file with its options, hashing the file once.
+
+    Args:
+        data (bytes): Content of the audio file.
+        **options: Model name and decoding options affecting the result.
+
+    Returns:
+        tuple: Hex SHA-256 digest of the content, and the key `content_key` returns.
+    """
+    digest = hashlib.sha256(data)
+    audio_key = digest.hexdigest()
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    return audio_key, digest.hexdigest()
+
+
+def _json_default(value):
+    # numpy scalars end up in Whisper results
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class ResultCache:
+    """_summary_: Content-addressed cache of transcription results.
+
+    An in-memory LRU of `memory_entries` results sits in front of an on-disk store of at most `disk_entries` JSON
+    files in `cache_dir`, evicted oldest first. All methods are thread-safe, disk access should happen off the event loop.
+    """
+
+    def __init__(self,
+                 cache_dir: str = os.path.join("cache", "results"),
+                 memory_entries: int = 256,
+                 disk_entries: int = 1000,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            cache_dir (str, optional): Directory of the on-disk store. Defaults to "cache/results".
+            memory_entries (int, optional): Number of results kept in memory. Defaults to 256.
+            disk_entries (int, optional): Number of results kept on disk, 0 disables the disk store. Defaults to 1000.
+        """
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_entries:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Index the store once, oldest first
+            entries = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".json")]
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries:
+                self._disk[entry.name[:-5]] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """_summary_: Looks up a result, first in memory, then on disk.
+
+        Args:
+            key (str): Cache key from `content_key`.
+
+        Returns:
+            dict: Cached result, None on a miss.
+        """
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return result
+            on_disk = key in self._disk
+        if on_disk:
+            try:
+                with open(self._path(key)) as file:
+                    result = json.load(file)
+            except (OSError, ValueError):
+                self.logger.warning(f"Dropping unreadable cache entry {key}")
+                with self._lock:
+                    self._disk.pop(key, None)
+            else:
+                with self._lock:
+                    self._disk.move_to_end(key)
+                    self._remember(key, result)
+                    self.hits += 1
+                return result
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, result: Dict):
+        """_summary_: Stores a result in memory and on disk.
+
+        Args:
+            key (str): Cache key from `content_key`.
+            result (dict): Transcription result, stored on disk as JSON.
+        """
+        with self._lock:
+            self._remember(key, result)
+        if not self.disk_entries:
+            return
+        path = self._path(key)
+        try:
+            with open(path + ".tmp", "w") as file:
+                json.dump(result, file, default=_json_default)
+            os.replace(path + ".tmp", path)
+        except (OSError, TypeError, ValueError) as e:
+            # A result that cannot be stored is only a missed cache entry, never a failed task
+            self.logger.warning(f"Failed to store cache entry {key}: {e}")
+            return
+        with self._lock:
+            self._disk[key] = None
+            self._disk.move_to_end(key)
+            evicted = []
+            while len(self._disk) > self.disk_entries:
+                evicted.append(self._disk.popitem(last=False)[0])
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key: str, result: Dict):
+        # Caller holds self._lock
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """_summary_: Returns hit/miss counts and the number of cached results."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'memory_entries': len(self._memory), 'disk_entries': len(self._disk)}
+
+
+class AudioCache:
+    """_summary_: On-disk cache of decoded audio, keyed by the hash of the uploaded file.
+
+    Audio is stored as 16 kHz float16 `.npy` files, half the size of float32 and precise well beyond what changes a
+    transcription, and read back memory-mapped, so tasks and workers reading the same file share the page cache
+    instead of each holding a decoded copy. The directory is kept within a file count and size limit by a `DiskQuota`,
+    removing the least recently used entries first. All methods are thread-safe, they should be called off the event loop.
+    """
+
+    def __init__(self,
+                 cache_dir: str = os.path.join("cache", "audio"),
+                 max_files: int = 10,
+                 max_bytes: int = 100000000,
+                 enabled: bool = True,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            cache_dir (str, optional): Directory of the cache. Defaults to "cache/audio".
+            max_files (int, optional): Number of decoded files to keep, 0 for no limit. Defaults to 10.
+            max_bytes (int, optional): Maximum size of the cache in bytes, 0 for no limit. Defaults to 100000000.
+            enabled (bool, optional): Whether audio is cached at all. Defaults to True.
+        """
+        self.enabled = enabled
+        self.logger = logger
+        self.quota = DiskQuota(cache_dir, max_files=max_files, max_bytes=max_bytes, logger=logger)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.quota.dir_path, key + ".npy")
+
+    def rebuild(self):
+        """_summary_: Indexes the cache directory on startup and enforces its limits."""
+        if self.enabled:
+            self.quota.rebuild()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """_summary_: Looks up decoded audio.
+
+        Args:
+            key (str): Hash of the uploaded file from `content_keys`.
+
+        Returns:
+            np.ndarray: Read-only memory-mapped float16 samples, None on a miss.
+        """
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            audio = np.load(path, mmap_mode="r")
+        except FileNotFoundError:
+            audio = None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Dropping unreadable decoded audio {key}: {e}")
+            audio = None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if audio is not None:
+            self.quota.touch(path)
+        return audio
+
+    def put(self, key: str, audio: np.ndarray):
+        """_summary_: Stores decoded audio, unless it alone exceeds the size limit.
+
+        Args:
+            key (str): Hash of the uploaded file from `content_keys`.
+            audio (np.ndarray): 16 kHz mono float32 samples.
+        """
+        if not self.enabled or not audio.size or (self.quota.max_bytes and audio.size * 2 > self.quota.max_bytes):
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.quota.dir_path, exist_ok=True)
+            with open(path + ".tmp", "wb") as file:
+                np.save(file, audio.astype(np.float16))
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            # Audio that cannot be stored is only decoded again next time
+            self.logger.warning(f"Failed to store decoded audio {key}: {e}")
+            return
+        self.quota.add(path)
+
+    def stats(self) -> Dict:
+        """_summary_: Returns hit/miss counts and the number and size of the cached files."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, **self.quota.stats()}
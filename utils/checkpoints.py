@@ -0,0 +1,122 @@
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+
+def _json_default(value):
+    # numpy scalars end up in Whisper results
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class CheckpointStore:
+    """_summary_: Checkpoints of long transcriptions in an embedded SQLite database, shared by all server processes of a node.
+
+    A long file is transcribed as a fixed plan of chunks, and the result of every chunk is committed as soon as it
+    finishes. A transcription of the same file and options that is interrupted by a crash or restart and started
+    again, by the same or another process, reuses the stored plan and only transcribes the chunks without a result.
+    Checkpoints are keyed by the result cache key and cleared once the whole result is stored. All methods are
+    thread-safe and touch the disk, they should be called off the event loop.
+    """
+
+    def __init__(self,
+                 path: str = os.path.join("cache", "checkpoints.sqlite3"),
+                 ttl: float = 0,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            path (str, optional): Path of the database file. Defaults to "cache/checkpoints.sqlite3".
+            ttl (float, optional): Seconds after which checkpoints of an abandoned transcription are removed by `expire`,
+                0 keeps them. Defaults to 0.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.logger = logger
+        self._local = threading.local()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, chunks TEXT NOT NULL, timestamp REAL NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS chunks (key TEXT NOT NULL, idx INTEGER NOT NULL, result TEXT NOT NULL, "
+                               "PRIMARY KEY (key, idx))")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, every thread gets its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def start(self, key: str, chunks: List[Dict]) -> List[Dict]:
+        """_summary_: Records the chunk plan of a transcription, unless one was recorded before.
+
+        Args:
+            key (str): Cache key of the transcription.
+            chunks (List[dict]): Chunks from `plan_chunks`.
+
+        Returns:
+            List[dict]: The recorded plan, the earlier one if the transcription is resumed.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR IGNORE INTO plans (key, chunks, timestamp) VALUES (?, ?, ?)",
+                               (key, json.dumps(chunks, default=_json_default), datetime.datetime.now().timestamp()))
+            row = connection.execute("SELECT chunks FROM plans WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0])
+
+    def plan(self, key: str) -> Optional[List[Dict]]:
+        """_summary_: Returns the recorded chunk plan of a transcription, None if there is none."""
+        row = self._connection().execute("SELECT chunks FROM plans WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key: str, index: int, result: Dict):
+        """_summary_: Commits the result of a finished chunk.
+
+        Args:
+            key (str): Cache key of the transcription.
+            index (int): Position of the chunk in the plan.
+            result (dict): Transcription result of the chunk.
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO chunks (key, idx, result) VALUES (?, ?, ?)",
+                               (key, index, json.dumps(result, default=_json_default)))
+
+    def completed(self, key: str) -> Dict[int, Dict]:
+        """_summary_: Returns the results of the finished chunks of a transcription by position in the plan."""
+        rows = self._connection().execute("SELECT idx, result FROM chunks WHERE key = ?", (key,)).fetchall()
+        return {index: json.loads(result) for index, result in rows}
+
+    def clear(self, key: str):
+        """_summary_: Removes the plan and chunk results of a transcription."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            connection.execute("DELETE FROM plans WHERE key = ?", (key,))
+
+    def expire(self) -> int:
+        """_summary_: Removes the checkpoints of transcriptions started more than `ttl` seconds ago, and chunk results
+        saved after their transcription was cleared by a concurrent identical one.
+
+        Returns:
+            int: Number of transcriptions removed.
+        """
+        if not self.ttl:
+            return 0
+        cutoff = datetime.datetime.now().timestamp() - self.ttl
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM chunks WHERE key IN (SELECT key FROM plans WHERE timestamp < ?)", (cutoff,))
+            removed = connection.execute("DELETE FROM plans WHERE timestamp < ?", (cutoff,)).rowcount
+            connection.execute("DELETE FROM chunks WHERE key NOT IN (SELECT key FROM plans)")
+        if removed:
+            self.logger.info(f"Removed the checkpoints of {removed} abandoned transcriptions")
+        return removed
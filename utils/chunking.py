@@ -0,0 +1,149 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List
+import numpy as np
+from utils.sound import SAMPLE_RATE
+from utils.vad import frame_energy
+
+
+def plan_chunks(audio: np.ndarray,
+                chunk_seconds: float,
+                sample_rate: int = SAMPLE_RATE,
+                search_seconds: float = 5.0,
+                overlap_seconds: float = 1.0,
+                frame_ms: int = 30) -> List[Dict]:
+    """_summary_: Splits long audio into chunks cut at the quietest point near every `chunk_seconds`.
+
+    Every chunk owns the audio between two cuts and extends `overlap_seconds` into its neighbours, so that a word
+    spoken across a cut is heard whole by at least one chunk. Segments are later attributed to the chunk owning them.
+
+    Args:
+        audio (np.ndarray): float32 samples.
+        chunk_seconds (float): Target length of a chunk in seconds.
+        sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+        search_seconds (float, optional): How far around the target the quietest point is searched. Defaults to 5.0.
+        overlap_seconds (float, optional): Seconds of audio shared with each neighbouring chunk. Defaults to 1.0.
+        frame_ms (int, optional): Resolution of the search in milliseconds. Defaults to 30.
+
+    Returns:
+        List[dict]: Chunks with the 'start'/'end' sample range to transcribe and the 'own_start'/'own_end' range they own.
+    """
+    frame = sample_rate * frame_ms // 1000
+    energy = frame_energy(audio, sample_rate, frame_ms)
+    chunk_frames = max(int(chunk_seconds * sample_rate) // frame, 1)
+    search_frames = int(search_seconds * sample_rate) // frame
+
+    cuts = [0]
+    while len(energy) - cuts[-1] > chunk_frames + search_frames:
+        target = cuts[-1] + chunk_frames
+        low, high = target - search_frames, target + search_frames + 1
+        cuts.append(low + int(np.argmin(energy[low:high])))
+    cut_samples = [cut * frame for cut in cuts] + [len(audio)]
+
+    overlap = int(overlap_seconds * sample_rate)
+    chunks = []
+    for own_start, own_end in zip(cut_samples[:-1], cut_samples[1:]):
+        chunks.append({'start': max(own_start - overlap, 0), 'end': min(own_end + overlap, len(audio)),
+                       'own_start': own_start, 'own_end': own_end})
+    return chunks
+
+
+async def run_chunks(run: Callable[[int], Awaitable], indices: List[int], slots: asyncio.Semaphore) -> Dict[int, Any]:
+    """_summary_: Runs the chunks of a task on the worker of the task, and on further workers while nobody waits for them.
+
+    The task holds one slot of `slots` for its whole run. Every further chunk in flight borrows a slot, which is given
+    back once the chunk finished, so that a task waiting for a worker gets the next free one. A long upload thus only
+    occupies the workers other tasks do not need. After a chunk failed no chunk is started anymore, and the chunks in
+    flight are awaited before the error is raised, so that the workers of a failed task are free again.
+
+    Args:
+        run (Callable[[int], Awaitable]): Coroutine function running the chunk at an index.
+        indices (List[int]): Indices of the chunks to run, started in this order.
+        slots (asyncio.Semaphore): Free worker slots, shared with the dispatcher of the tasks.
+
+    Returns:
+        Dict[int, Any]: Results of the chunks by index.
+    """
+    pending = deque(indices)
+    # Chunks in flight with their index and whether they run on a borrowed slot
+    running: Dict[asyncio.Future, tuple] = {}
+    results, error, borrowing = {}, None, None
+
+    def start(borrowed):
+        index = pending.popleft()
+        running[asyncio.ensure_future(run(index))] = (index, borrowed)
+
+    try:
+        while True:
+            if error is None and pending:
+                if all(borrowed for _, borrowed in running.values()):
+                    start(False)
+                if pending and borrowing is None:
+                    borrowing = asyncio.ensure_future(slots.acquire())
+            if not running:
+                break
+            done, _ = await asyncio.wait(set(running) | ({borrowing} if borrowing else set()),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if borrowing in done:
+                borrowing = None
+                if error is None and pending:
+                    start(True)
+                else:
+                    slots.release()
+            for future in done & set(running):
+                index, borrowed = running.pop(future)
+                if borrowed:
+                    slots.release()
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    error = error or e
+    finally:
+        if borrowing is not None:
+            if borrowing.cancel():
+                # Let the semaphore hand a slot it was about to give to this task to the next one
+                await asyncio.wait([borrowing])
+            elif not borrowing.exception():
+                slots.release()
+        for future, (_, borrowed) in running.items():
+            future.cancel()
+            if borrowed:
+                slots.release()
+    if error is not None:
+        raise error
+    return results
+
+
+def merge_results(results: List[Dict], chunks: List[Dict], sample_rate: int = SAMPLE_RATE) -> Dict:
+    """_summary_: Stitches the transcriptions of chunks into a single result for the whole audio.
+
+    Segment timestamps are shifted by the chunk start. A segment is kept only by the chunk owning its midpoint and
+    only if it mostly does not overlap the previous kept segment, which drops the duplicates transcribed twice in
+    the overlap between neighbouring chunks.
+
+    Args:
+        results (List[dict]): Whisper results of the chunks, in order.
+        chunks (List[dict]): Chunks as returned by `plan_chunks`.
+        sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+
+    Returns:
+        dict: Whisper-like result with text, segments and language.
+    """
+    segments = []
+    for result, chunk in zip(results, chunks):
+        offset = chunk['start'] / sample_rate
+        own_start, own_end = chunk['own_start'] / sample_rate, chunk['own_end'] / sample_rate
+        for segment in result.get('segments', []):
+            start, end = segment['start'] + offset, segment['end'] + offset
+            if not own_start <= (start + end) / 2 < own_end:
+                continue
+            # A segment straddling the cut may be owned by both chunks, keep the first one
+            if segments and min(end, segments[-1]['end']) - start > (end - start) / 2:
+                continue
+            segment = dict(segment, id=len(segments), start=round(start, 3), end=round(end, 3))
+            for word in segment.get('words', []):
+                word['start'] = round(word['start'] + offset, 3)
+                word['end'] = round(word['end'] + offset, 3)
+            segments.append(segment)
+    language = next((result.get('language') for result in results if result.get('language')), None)
+    return {'text': "".join(segment['text'] for segment in segments), 'segments': segments, 'language': language}
@@ -1,5 +1,13 @@
+import atexit
+import datetime
+import json
 import logging
-import inspect
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Tuple
 
 class CustomFormatter(logging.Formatter):
     """Logging Formatter to add colors to the levelname and include function name"""
@@ -19,20 +27,145 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: red
     }
 
+    def __init__(self, color: bool = True):
+        super().__init__("%(levelname)s: [%(funcName)s] %(asctime)s - %(message)s")
+        self.color = color
+
+    def format(self, record):
+        # The calling function is already on the record, walking the stack here would cost more than the request itself
+        levelname = record.levelname
+        if self.color:
+            # Colorize a copy of the levelname, other handlers of the record keep the plain one
+            record.levelname = self.LEVEL_COLORS.get(record.levelno, self.grey) + levelname + self.reset
+        try:
+            return super(CustomFormatter, self).format(record)
+        finally:
+            record.levelname = levelname
+
+
+class JsonFormatter(logging.Formatter):
+    """Logging Formatter writing one JSON object per record, for log aggregators"""
+
+    # Attributes every record has, anything else was passed with `extra` and is added to the output
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
     def format(self, record):
-        # Dynamically find the name of the calling function
-        stack = inspect.stack()
-        func_name = "unknown"
-        for frame in stack:
-            if frame.function not in ["emit", "format"] and 'logging' not in frame.filename:
-                func_name = frame.function
-                break
-        record.func_name = func_name
-
-        # Colorize levelname
-        color = self.LEVEL_COLORS.get(record.levelno, self.grey)
-        record.levelname = color + record.levelname + self.reset
-
-        # Set the format and return the formatted record
-        self._style._fmt = "%(levelname)s: [%(func_name)s] %(asctime)s - %(message)s"
-        return super(CustomFormatter, self).format(record)
\ No newline at end of file
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in self.RESERVED and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Logging Filter limiting how often a single log statement is emitted, keeping warnings and errors
+
+    Every call site (file and line) gets a token bucket of `burst` messages refilled at `rate` messages per second.
+    The first message let through after others were dropped tells how many were suppressed.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 10, level: int = logging.INFO):
+        """
+        Args:
+            rate (float, optional): Messages per second and call site. Defaults to 10.0.
+            burst (int, optional): Messages let through at once before the rate applies. Defaults to 10.
+            level (int, optional): Highest level that is rate limited. Defaults to logging.INFO.
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.level = level
+        # Tokens, last refill and suppressed messages by call site
+        self._buckets: Dict[Tuple[str, int], List] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((record.pathname, record.lineno))
+            if bucket is None:
+                bucket = self._buckets[(record.pathname, record.lineno)] = [self.burst, now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+class BackgroundHandler(QueueHandler):
+    """Logging Handler passing records to handlers running on a background thread
+
+    Only the message is rendered by the logging thread, formatting and writing happen on the listener thread.
+    Forked worker processes have no listener thread and write to the handlers directly.
+    """
+
+    def __init__(self, handlers: List[logging.Handler]):
+        super().__init__(queue.SimpleQueue())
+        self.targets = handlers
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Arguments may change after the call returns, exc_info stays in-process and is formatted by the listener
+        message = record.getMessage()
+        if message is record.msg and not record.args:
+            return record
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = message, None
+        return record
+
+    def emit(self, record):
+        if os.getpid() != self._pid:
+            for handler in self.targets:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        super().emit(record)
+
+
+def setup_logging(logger: logging.Logger,
+                  level: str = "INFO",
+                  fmt: str = "text",
+                  rate_limit: float = 0) -> QueueListener:
+    """_summary_: Attaches a non-blocking handler to a logger, writing to stderr from a background thread.
+
+    Args:
+        logger (logging.Logger): Logger to set up.
+        level (str, optional): Log level. Defaults to "INFO".
+        fmt (str, optional): Either "text" for colored lines or "json" for one JSON object per line. Defaults to "text".
+        rate_limit (float, optional): Messages per second per log statement up to INFO, 0 for no limit. Defaults to 0.
+
+    Returns:
+        QueueListener: Started listener, stopped at interpreter exit after writing the queued records.
+    """
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Unsupported log format: {fmt}")
+    stream = logging.StreamHandler()
+    stream.setLevel(level)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else CustomFormatter())
+    handler = BackgroundHandler([stream])
+    if rate_limit:
+        handler.addFilter(RateLimitFilter(rate=rate_limit, burst=max(1, int(rate_limit))))
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    handler.listener.start()
+    atexit.register(handler.listener.stop)
+    return handler.listener
@@ -0,0 +1,194 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """_summary_: Base of metrics recorded without locks.
+
+    Every thread records into its own shard and only reads combine the shards, so concurrent updates are never lost
+    and the hot path costs a thread-local lookup and a dict update.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def _snapshots(self) -> List[Dict]:
+        with self._lock:
+            shards = list(self._shards)
+        # Copying a dict is atomic under the GIL, the owning thread may keep writing meanwhile
+        return [dict(shard) for shard in shards]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """_summary_: Monotonically increasing count, e.g. of requests or bytes."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """_summary_: Increases the counter of the given label values by `amount`."""
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """_summary_: Returns the current value of the counter of the given label values."""
+        key = self._key(labels)
+        return sum(shard.get(key, 0) for shard in self._snapshots())
+
+    def _samples(self) -> List[str]:
+        totals = {}
+        for shard in self._snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in sorted(totals.items())]
+
+
+class Histogram(_Metric):
+    """_summary_: Distribution of observed values, e.g. durations, counted in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        """_summary_: Records a value for the given label values."""
+        shard = self._shard()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            # One count per bucket and +Inf, then the sum
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _samples(self) -> List[str]:
+        totals = {}
+        for shard in self._snapshots():
+            for key, counts in shard.items():
+                counts = list(counts)
+                total = totals.setdefault(key, [0] * len(counts))
+                for i, count in enumerate(counts):
+                    total[i] += count
+        lines = []
+        for key, counts in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', _format_value(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """_summary_: Current value read from a callback at scrape time, e.g. a queue depth, costing nothing in between.
+
+    The callback returns a number, or a dict of numbers by tuple of label values.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable, labels: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help, labels)
+        self.callback = callback
+        self.kind = kind
+
+    def _samples(self) -> List[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in sorted(values.items())
+                if value is not None]
+
+
+class MetricsRegistry:
+    """_summary_: Collection of metrics rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Modules may be imported more than once (e.g. by tests), the first registration wins
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        """_summary_: Registers a counter, or returns the counter already registered under the name."""
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """_summary_: Registers a histogram, or returns the histogram already registered under the name."""
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, callback: Callable, labels: Sequence[str] = (), kind: str = "gauge") -> Gauge:
+        """_summary_: Registers a callback gauge, replacing one already registered under the name.
+
+        Args:
+            kind (str, optional): Exposed metric type, "counter" for totals kept elsewhere. Defaults to "gauge".
+        """
+        metric = Gauge(name, help, callback, labels, kind)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        """_summary_: Renders all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registry shared by the app and the utils modules
+REGISTRY = MetricsRegistry()
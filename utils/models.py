@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+from utils.metrics import REGISTRY
+
+model_loads = REGISTRY.counter("stt_model_loads_total", "Number of model loads.", ["model"])
+model_load_seconds = REGISTRY.histogram("stt_model_load_seconds", "Time taken to load a model.", ["model"])
+model_evictions = REGISTRY.counter("stt_model_evictions_total", "Number of models evicted from the registry.", ["model"])
+
+
+def model_memory(model) -> int:
+    """_summary_: Computes the resident memory of a model as the size of its parameters and buffers.
+
+    Args:
+        model (torch.nn.Module): Loaded model.
+
+    Returns:
+        int: Memory used by the model weights in bytes.
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in getattr(model, 'modules', list)():
+        # Dynamically quantized layers keep their int8 weights packed in a child module, outside of the parameters
+        packed = getattr(module, '_weight_bias', None)
+        if callable(packed) and next(module.children(), None) is None:
+            tensors.extend(tensor for tensor in packed() if tensor is not None)
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class ModelRegistry:
+    """_summary_: Process-wide registry of loaded models.
+
+    Models are loaded once and the resident instance is handed out to every caller. When the
+    total memory of resident models exceeds `memory_limit`, the least recently used models are
+    evicted. Load time, hit/miss counts and resident memory are tracked per model.
+    """
+
+    def __init__(self,
+                 loader: Callable[[str], object],
+                 default_model: str = "base",
+                 memory_limit: int = 0,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            loader (Callable[[str], object]): Function loading a model by its name, e.g. `whisper.load_model`.
+            default_model (str, optional): Model used when no name is given. Defaults to "base".
+            memory_limit (int, optional): Memory budget for resident models in bytes, 0 disables eviction. Defaults to 0.
+        """
+        self.loader = loader
+        self.default_model = default_model
+        self.memory_limit = memory_limit
+        self.logger = logger
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _stat(self, name: str) -> Dict:
+        if name not in self._stats:
+            self._stats[name] = {'loaded': False, 'loads': 0, 'hits': 0, 'misses': 0,
+                                 'evictions': 0, 'load_time': None, 'memory': 0}
+        return self._stats[name]
+
+    def get(self, name: Optional[str] = None):
+        """_summary_: Returns the resident instance of a model, loading it on first use.
+
+        Args:
+            name (str, optional): Name of the model. Defaults to the registry default model.
+
+        Returns:
+            object: Loaded model.
+        """
+        name = name or self.default_model
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                self._models.move_to_end(name)
+                self._stat(name)['hits'] += 1
+                return model
+            self._stat(name)['misses'] += 1
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only one thread loads a given model, the others wait for it and reuse the instance
+        with load_lock:
+            with self._lock:
+                model = self._models.get(name)
+                if model is not None:
+                    self._models.move_to_end(name)
+                    return model
+
+            start = time.perf_counter()
+            model = self.loader(name)
+            load_time = time.perf_counter() - start
+            model_loads.inc(model=name)
+            model_load_seconds.observe(load_time, model=name)
+            memory = model_memory(model)
+
+            with self._lock:
+                self._models[name] = model
+                stat = self._stat(name)
+                stat.update({'loaded': True, 'load_time': round(load_time, 3), 'memory': memory})
+                stat['loads'] += 1
+                self._evict(keep=name)
+        self.logger.info(f"Loaded model '{name}' in {load_time:.2f}s ({memory / 2**20:.1f} MiB)")
+        return model
+
+    def _evict(self, keep: str):
+        # Caller holds self._lock
+        if not self.memory_limit:
+            return
+        for name in list(self._models):
+            if self.resident_memory() <= self.memory_limit:
+                break
+            if name == keep:
+                continue
+            del self._models[name]
+            stat = self._stat(name)
+            stat['loaded'] = False
+            stat['memory'] = 0
+            stat['evictions'] += 1
+            model_evictions.inc(model=name)
+            self.logger.info(f"Evicted model '{name}' from the registry")
+
+    def peek(self, name: Optional[str] = None):
+        """_summary_: Returns the resident instance of a model without loading it or counting a hit.
+
+        Args:
+            name (str, optional): Name of the model. Defaults to the registry default model.
+
+        Returns:
+            object: Loaded model, None if it is not resident.
+        """
+        with self._lock:
+            return self._models.get(name or self.default_model)
+
+    def preload(self, names: Iterable[str]):
+        """_summary_: Loads the given models ahead of the first request.
+
+        Args:
+            names (Iterable[str]): Names of the models to load.
+        """
+        for name in names:
+            self.get(name)
+
+    def resident_memory(self) -> int:
+        """_summary_: Returns the total memory of resident models in bytes."""
+        return sum(self._stats[name]['memory'] for name in self._models)
+
+    def stats(self) -> Dict:
+        """_summary_: Returns a snapshot of the registry statistics.
+
+        Returns:
+            dict: Per-model statistics plus the resident memory and memory limit.
+        """
+        with self._lock:
+            return {
+                'default_model': self.default_model,
+                'memory_limit': self.memory_limit,
+                'resident_memory': self.resident_memory(),
+                'resident': list(self._models),
+                'models': {name: dict(stat) for name, stat in self._stats.items()},
+            }
@@ -0,0 +1,201 @@
+import asyncio
+import heapq
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Set
+
+TERMINAL_STATUSES = ('finished', 'failed')
+
+
+class TaskEvents:
+    """_summary_: Publishes task state changes to waiting requests and event stream subscribers.
+
+    Waiters of a task are woken up when it reaches a terminal status, subscribers receive every state change.
+    Must be used from the event loop.
+    """
+
+    def __init__(self, queue_size: int = 1000, logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            queue_size (int, optional): Number of events buffered per subscriber, older events are dropped beyond it. Defaults to 1000.
+        """
+        self.queue_size = queue_size
+        self.logger = logger
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, task_id: str, status: str, **data):
+        """_summary_: Publishes a state change of a task.
+
+        Args:
+            task_id (str): Unique ID of the task.
+            status (str): New status of the task.
+            **data: Further fields of the event, e.g. the result.
+        """
+        if status in TERMINAL_STATUSES:
+            for waiter in self._waiters.pop(task_id, []):
+                if not waiter.done():
+                    waiter.set_result(status)
+        event = {'task_id': task_id, 'status': status, **data}
+        for subscriber in self._subscribers:
+            if subscriber.full():
+                # A slow subscriber loses its oldest events rather than holding up the server
+                subscriber.get_nowait()
+            subscriber.put_nowait(event)
+
+    def watch(self, task_id: str) -> asyncio.Future:
+        """_summary_: Registers a waiter for the terminal status of a task, released with `unwatch`.
+
+        Watching before the status is checked, e.g. in a thread, means a task finishing in between is not missed.
+
+        Args:
+            task_id (str): Unique ID of the task.
+
+        Returns:
+            asyncio.Future: Future set to the terminal status of the task.
+        """
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(task_id, []).append(waiter)
+        return waiter
+
+    def unwatch(self, task_id: str, waiter: asyncio.Future):
+        """_summary_: Releases a waiter registered with `watch`."""
+        waiters = self._waiters.get(task_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._waiters[task_id]
+
+    async def wait(self, task_id: str, timeout: float, waiter: Optional[asyncio.Future] = None) -> Optional[str]:
+        """_summary_: Waits until a task reaches a terminal status. The caller checks the status beforehand.
+
+        Args:
+            task_id (str): Unique ID of the task.
+            timeout (float): Maximum number of seconds to wait.
+            waiter (asyncio.Future, optional): Waiter registered with `watch` before the status was checked. Defaults to a new one.
+
+        Returns:
+            str: Terminal status of the task, None on timeout.
+        """
+        waiter = waiter or self.watch(task_id)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.unwatch(task_id, waiter)
+
+    def subscribe(self) -> asyncio.Queue:
+        """_summary_: Registers a subscriber receiving every state change, released with `unsubscribe`.
+
+        Returns:
+            asyncio.Queue: Queue of events as dicts with 'task_id', 'status' and further fields.
+        """
+        subscriber = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: asyncio.Queue):
+        """_summary_: Releases a subscriber registered with `subscribe`."""
+        self._subscribers.discard(subscriber)
+
+
+class WebhookSender:
+    """_summary_: Delivers task completion callbacks as JSON POST requests from a background thread.
+
+    Failed deliveries (connection errors, timeouts and non-2xx responses) are retried with exponential backoff
+    up to `max_attempts` times, scheduled in a retry queue so that one slow endpoint does not delay other callbacks
+    longer than a single request timeout.
+    """
+
+    def __init__(self,
+                 max_attempts: int = 5,
+                 backoff: float = 1.0,
+                 timeout: float = 10.0,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            max_attempts (int, optional): Number of delivery attempts of a callback. Defaults to 5.
+            backoff (float, optional): Seconds before the first retry, doubled for every further retry. Defaults to 1.0.
+            timeout (float, optional): Timeout of a single request in seconds. Defaults to 10.0.
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.timeout = timeout
+        self.logger = logger
+        self.delivered = 0
+        self.failed = 0
+        # Retry queue of (due time, sequence, attempt, url, payload)
+        self._queue = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def send(self, url: str, payload: Dict):
+        """_summary_: Queues a callback for delivery without waiting for it.
+
+        Args:
+            url (str): URL the payload is POSTed to.
+            payload (dict): JSON body of the request.
+        """
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._deliver_loop, name="webhook-sender", daemon=True)
+                self._thread.start()
+            self._schedule(time.monotonic(), 1, url, payload)
+
+    def _schedule(self, due: float, attempt: int, url: str, payload: Dict):
+        # Caller holds self._condition
+        self._sequence += 1
+        heapq.heappush(self._queue, (due, self._sequence, attempt, url, payload))
+        self._condition.notify()
+
+    def _deliver_loop(self):
+        while True:
+            with self._condition:
+                while not self._closed and (not self._queue or self._queue[0][0] > time.monotonic()):
+                    self._condition.wait(self._queue[0][0] - time.monotonic() if self._queue else None)
+                if self._closed:
+                    return
+                _, _, attempt, url, payload = heapq.heappop(self._queue)
+            error = self._post(url, payload)
+            with self._condition:
+                if error is None:
+                    self.delivered += 1
+                elif attempt < self.max_attempts:
+                    delay = self.backoff * 2 ** (attempt - 1)
+                    self.logger.warning(f"Callback to {url} failed ({error}), retrying in {delay:g} s")
+                    self._schedule(time.monotonic() + delay, attempt + 1, url, payload)
+                else:
+                    self.failed += 1
+                    self.logger.error(f"Callback to {url} failed after {attempt} attempts: {error}")
+
+    def _post(self, url: str, payload: Dict) -> Optional[str]:
+        request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            return f"HTTP {e.code}"
+        except (urllib.error.URLError, OSError) as e:
+            return str(e)
+        return None
+
+    def stats(self) -> Dict:
+        """_summary_: Returns the number of delivered, failed and queued callbacks."""
+        with self._condition:
+            return {'delivered': self.delivered, 'failed': self.failed, 'queued': len(self._queue)}
+
+    def close(self):
+        """_summary_: Stops the delivery thread, callbacks still queued are dropped."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+preprocess_seconds = REGISTRY.histogram("stt_preprocess_seconds", "Time spent preparing tasks for inference on the preprocessing threads.")
+
+
+class Prefetcher:
+    """_summary_: Preprocessing stage taking tasks off a source ahead of the inference workers.
+
+    Up to `depth` tasks are taken from `source` and prepared by `prepare` on a pool of preprocessing threads while the
+    workers are busy with earlier tasks, so the CPU-bound preparation of the next tasks overlaps with inference instead of
+    running in front of it. Prepared tasks are handed out by `get` in the order they were taken. Must be used from the event loop.
+    """
+
+    def __init__(self,
+                 source: Callable[[], Awaitable[Optional[Tuple]]],
+                 prepare: Callable,
+                 depth: int = 2,
+                 workers: int = 1,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            source (Callable[[], Awaitable[Optional[Tuple]]]): Coroutine function returning the next (client, task), None once closed.
+            prepare (Callable): Function called with a task on a preprocessing thread, its return value is handed out with the task.
+            depth (int, optional): Maximum number of tasks taken off the source and not handed out yet. Defaults to 2.
+            workers (int, optional): Number of preprocessing threads. Defaults to 1.
+        """
+        self.source = source
+        self.prepare = prepare
+        self.depth = max(depth, 1)
+        self.workers = max(workers, 1)
+        self.logger = logger
+        self._buffer = deque()
+        self._space = asyncio.Semaphore(self.depth)
+        self._items = asyncio.Semaphore(0)
+        self._executor = None
+        self._filler = None
+
+    def _timed(self, job):
+        start = time.perf_counter()
+        try:
+            return self.prepare(job)
+        finally:
+            preprocess_seconds.observe(time.perf_counter() - start)
+
+    async def _fill(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._space.acquire()
+            dispatched = await self.source()
+            if dispatched is None:
+                self._buffer.append(None)
+                self._items.release()
+                return
+            client, job = dispatched
+            self._buffer.append((client, job, loop.run_in_executor(self._executor, self._timed, job)))
+            self._items.release()
+
+    async def get(self) -> Optional[Tuple[str, object, asyncio.Future]]:
+        """_summary_: Waits for the next prepared task, starting the stage on the first call.
+
+        Returns:
+            tuple: Client, task and the finished future of its preparation, whose `result()` raises if `prepare` failed.
+                None once the source is closed.
+        """
+        if self._filler is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="preprocess")
+            self._filler = asyncio.create_task(self._fill())
+        await self._items.acquire()
+        entry = self._buffer.popleft()
+        if entry is None:
+            self._buffer.appendleft(None)
+            self._items.release()
+            return None
+        self._space.release()
+        client, job, prepared = entry
+        await asyncio.wait([prepared])
+        return client, job, prepared
+
+    def buffered(self) -> int:
+        """_summary_: Returns the number of tasks taken off the source and not handed out yet."""
+        return sum(entry is not None for entry in self._buffer)
+
+    def close(self):
+        """_summary_: Stops taking tasks and shuts the preprocessing threads down. Tasks still buffered are dropped."""
+        if self._filler is not None:
+            self._filler.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
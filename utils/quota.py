@@ -0,0 +1,135 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
+
+
+class DiskQuota:
+    """_summary_: Keeps a directory within a file count and size limit by deleting its oldest files.
+
+    Files are tracked in an in-memory index ordered by modification time, built once by `rebuild` and updated by
+    `add` for every file written afterwards, so enforcing the limits never lists or stats the directory again.
+    Files written by other processes are picked up by the next `rebuild`. All methods are thread-safe and touch the
+    disk, they should be called off the event loop.
+    """
+
+    def __init__(self,
+                 dir_path: str,
+                 max_files: int = 10,
+                 max_bytes: int = 100000000,
+                 pinned: Optional[Callable[[], Set[str]]] = None,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            dir_path (str): Path to the directory.
+            max_files (int, optional): Number of files to keep, 0 for no limit. Defaults to 10.
+            max_bytes (int, optional): Maximum size of the directory in bytes, 0 for no limit. Defaults to 100000000.
+            pinned (Callable[[], Set[str]], optional): Returns the paths of files that must not be removed yet, called
+                when the limits are exceeded. Pinned files count towards the limits. Defaults to None.
+        """
+        self.dir_path = dir_path
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.pinned = pinned
+        self.logger = logger
+        self._files: Dict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def rebuild(self) -> List[str]:
+        """_summary_: Indexes the files of the directory from scratch and enforces the limits.
+
+        Returns:
+            List[str]: Paths of the removed files.
+        """
+        os.makedirs(self.dir_path, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.dir_path):
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        with self._lock:
+            self._files = OrderedDict((name, size) for _, name, size in entries)
+            self._bytes = sum(self._files.values())
+            evicted = self._evict()
+        return self._remove(evicted)
+
+    def add(self, file_path: str) -> List[str]:
+        """_summary_: Tracks a file that was just written to the directory as the newest one and enforces the limits.
+
+        Args:
+            file_path (str): Path to the file.
+
+        Returns:
+            List[str]: Paths of the removed files.
+        """
+        name = os.path.basename(file_path)
+        try:
+            size = os.path.getsize(file_path)
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            self._bytes += size - self._files.pop(name, 0)
+            self._files[name] = size
+            evicted = self._evict(keep=name)
+        return self._remove(evicted)
+
+    def touch(self, file_path: str):
+        """_summary_: Marks a tracked file as the most recently used one, so that it is removed last.
+
+        Args:
+            file_path (str): Path to the file.
+        """
+        name = os.path.basename(file_path)
+        try:
+            # The modification time keeps the order across a `rebuild`
+            os.utime(file_path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+
+    def _exceeded(self) -> bool:
+        return bool((self.max_files and len(self._files) > self.max_files) or (self.max_bytes and self._bytes > self.max_bytes))
+
+    def _evict(self, keep: str = None) -> List[str]:
+        # Caller holds self._lock, the file just written and pinned files are never removed
+        if not self._exceeded():
+            return []
+        kept = {keep} | {os.path.basename(path) for path in (self.pinned() if self.pinned else ())}
+        evicted = []
+        for name, size in list(self._files.items()):
+            if not self._exceeded():
+                break
+            if name in kept:
+                continue
+            del self._files[name]
+            self._bytes -= size
+            evicted.append(name)
+        return evicted
+
+    def _remove(self, names: List[str]) -> List[str]:
+        removed = []
+        for name in names:
+            path = os.path.join(self.dir_path, name)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self.logger.error(f"Failed to remove {path}: {e}")
+                continue
+            self.logger.info(f"Removed file {path}")
+            removed.append(path)
+        return removed
+
+    def stats(self) -> Dict:
+        """_summary_: Returns the number and total size of the tracked files."""
+        with self._lock:
+            return {'files': len(self._files), 'bytes': self._bytes}
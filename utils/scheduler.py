@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+queue_wait_seconds = REGISTRY.histogram("stt_queue_wait_seconds", "Time tasks spent queued before a worker took them.")
+
+
+class QueueFull(Exception):
+    """_summary_: Raised when a client or the server has no room for another task.
+
+    Attributes:
+        retry_after (int): Seconds after which a slot is expected to be free.
+        reason (str): 'client_queue' when the client's queue is full, 'server_queue' when the server's queue is.
+    """
+
+    def __init__(self, message: str, retry_after: int, reason: str = "server_queue"):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Client:
+    def __init__(self, name: str, weight: float):
+        self.name = name
+        self.weight = weight
+        # Queued tasks as (enqueue time, task, audio duration)
+        self.queue = deque()
+        self.reserved = 0
+        self.running = 0
+        self.current = 0.0
+
+
+class FairScheduler:
+    """_summary_: Admission control and fair dispatch of tasks across clients.
+
+    Every client has its own queue with a depth limit, and at most `max_running` tasks of a client run at a time.
+    Queued tasks are dispatched by smooth weighted round-robin among the clients that may run another task, so a client
+    uploading a batch only delays others by its weighted share. Rejections carry a Retry-After estimated from the
+    observed processing time, per second of queued audio when the durations of the tasks are known and per task otherwise.
+    Must be used from the event loop.
+    """
+
+    def __init__(self,
+                 workers: int = 1,
+                 max_queued: int = 10,
+                 max_total: int = 100,
+                 max_running: int = 0,
+                 weights: Optional[Dict[str, float]] = None,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            workers (int, optional): Number of tasks the server runs at a time, used to estimate waiting times. Defaults to 1.
+            max_queued (int, optional): Maximum number of queued tasks per client. Defaults to 10.
+            max_total (int, optional): Maximum number of queued tasks of all clients. Defaults to 100.
+            max_running (int, optional): Maximum number of running tasks per client, 0 for no limit. Defaults to 0.
+            weights (Dict[str, float], optional): Share of the workers per client relative to the default of 1. Defaults to None.
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_total = max_total
+        self.max_running = max_running
+        self.weights = weights or {}
+        self.logger = logger
+        self.seconds_per_task = None
+        self.seconds_per_audio_second = None
+        self.completed = 0
+        self._clients: Dict[str, _Client] = {}
+        self._queued = 0
+        # Audio seconds and number of the queued tasks with a known duration
+        self._queued_audio = 0.0
+        self._queued_timed = 0
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def _client(self, client: str) -> _Client:
+        state = self._clients.get(client)
+        if state is None:
+            state = self._clients[client] = _Client(client, self.weights.get(client, 1.0))
+        return state
+
+    def _release(self, client: str):
+        state = self._clients.get(client)
+        if state is not None and not (state.queue or state.reserved or state.running):
+            del self._clients[client]
+
+    def reserve(self, client: str):
+        """_summary_: Reserves a queue slot for a task of a client, to be filled with `put` or given back with `cancel`.
+
+        Args:
+            client (str): Identifier of the client, e.g. its API key or IP address.
+
+        Raises:
+            QueueFull: Raised when the client's queue or the server's queue is full.
+        """
+        state = self._client(client)
+        if len(state.queue) + state.reserved >= self.max_queued:
+            self._release(client)
+            raise QueueFull("Client queue limit reached", self.retry_after(client), "client_queue")
+        if self._queued >= self.max_total:
+            self._release(client)
+            raise QueueFull("Queue limit reached", self.retry_after())
+        state.reserved += 1
+        self._queued += 1
+
+    def cancel(self, client: str):
+        """_summary_: Gives back a slot reserved with `reserve`."""
+        state = self._clients[client]
+        state.reserved -= 1
+        self._queued -= 1
+        self._release(client)
+
+    def put(self, client: str, job, reserved: bool = True, duration: Optional[float] = None):
+        """_summary_: Queues a task of a client.
+
+        Args:
+            client (str): Identifier of the client.
+            job (Any): Task passed on by `next`.
+            reserved (bool, optional): Whether the task fills a slot reserved with `reserve`, otherwise it bypasses the limits. Defaults to True.
+            duration (float, optional): Seconds of audio of the task, refining the waiting time estimate. Defaults to None.
+        """
+        state = self._client(client)
+        if reserved:
+            state.reserved -= 1
+        else:
+            self._queued += 1
+        if duration is not None:
+            self._queued_audio += duration
+            self._queued_timed += 1
+        state.queue.append((time.monotonic(), job, duration))
+        self._ready.set()
+
+    async def next(self) -> Optional[Tuple[str, object]]:
+        """_summary_: Waits for the next task to run, chosen by weighted round-robin among the clients below their running limit.
+
+        Returns:
+            tuple: Client and task, None once the scheduler is closed. The caller reports the end of the task with `done`.
+        """
+        while not self._closed:
+            eligible = [state for state in self._clients.values()
+                        if state.queue and not (self.max_running and state.running >= self.max_running)]
+            if eligible:
+                total = sum(state.weight for state in eligible)
+                for state in eligible:
+                    state.current += state.weight
+                chosen = max(eligible, key=lambda state: state.current)
+                chosen.current -= total
+                chosen.running += 1
+                self._queued -= 1
+                queued_at, job, duration = chosen.queue.popleft()
+                if duration is not None:
+                    self._queued_audio -= duration
+                    self._queued_timed -= 1
+                queue_wait_seconds.observe(time.monotonic() - queued_at)
+                return chosen.name, job
+            self._ready.clear()
+            await self._ready.wait()
+        return None
+
+    def done(self, client: str, seconds: float, duration: Optional[float] = None):
+        """_summary_: Reports the end of a task returned by `next`.
+
+        Args:
+            client (str): Client of the task.
+            seconds (float): Time the task took, feeding the waiting time estimate.
+            duration (float, optional): Seconds of audio of the task. Defaults to None.
+        """
+        state = self._clients[client]
+        state.running -= 1
+        self._release(client)
+        self.completed += 1
+        # Exponential moving averages, recent tasks tell more about the current load
+        self.seconds_per_task = seconds if self.seconds_per_task is None else 0.9 * self.seconds_per_task + 0.1 * seconds
+        if duration:
+            rate = seconds / duration
+            self.seconds_per_audio_second = rate if self.seconds_per_audio_second is None else 0.9 * self.seconds_per_audio_second + 0.1 * rate
+        self._ready.set()
+
+    def retry_after(self, client: Optional[str] = None) -> int:
+        """_summary_: Estimates the seconds until a queue slot is free.
+
+        The server's queue frees a slot every time a worker takes a task, the queue of a client at its weighted share of that rate.
+
+        Args:
+            client (str, optional): Client whose queue is full, None for the server's queue. Defaults to None.
+
+        Returns:
+            int: Seconds, at least 1.
+        """
+        per_task = self.seconds_per_task or 1.0
+        if self.seconds_per_audio_second is not None and self._queued_timed:
+            # The tasks waiting now may be much longer or shorter than the ones that finished recently
+            per_task = self.seconds_per_audio_second * self._queued_audio / self._queued_timed
+        seconds = per_task / max(self.workers, 1)
+        if client is not None:
+            weights = [state.weight for state in self._clients.values() if state.queue or state.running]
+            weight = self.weights.get(client, 1.0)
+            seconds *= max(sum(weights), weight) / weight
+        return max(1, math.ceil(seconds))
+
+    def close(self):
+        """_summary_: Wakes up and ends a pending `next`."""
+        self._closed = True
+        self._ready.set()
+
+    def stats(self) -> Dict:
+        """_summary_: Returns the queued and running tasks per client and the observed time per task."""
+        return {'queued': self._queued,
+                'queued_audio_seconds': round(self._queued_audio, 3),
+                'seconds_per_task': self.seconds_per_task,
+                'seconds_per_audio_second': self.seconds_per_audio_second,
+                'completed': self.completed,
+                'clients': {client: {'queued': len(state.queue) + state.reserved, 'running': state.running, 'weight': state.weight}
+                            for client, state in self._clients.items()}}
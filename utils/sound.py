@@ -1,5 +1,12 @@
+import io
 import wave
+import struct
 import subprocess
+import threading
+import numpy as np
+
+# Sample rate expected by Whisper
+SAMPLE_RATE = 16000
 
 def is_chunk_ready(buffer: bytearray, 
                    sample_rate: int = 16000, 
@@ -46,7 +53,7 @@ def bytes_to_wav(byte_data, output_file, sample_rate=16000, num_channels=1, bit_
     Converts a bytes object to a .wav file.
     
     :param byte_data: Bytes object containing the audio data.
-    :param output_file: Path to the output .wav file.
+    :param output_file: Path to the output .wav file or a binary file-like object.
     :param sample_rate: Sample rate of the audio (default 44100 Hz).
     :param num_channels: Number of audio channels (default 1).
     :param bit_depth: Bit depth of the audio (default 16 bits).
@@ -74,4 +81,387 @@ def resample_audio(input_path, output_path, sample_rate=16000):
     try:
         subprocess.run(['ffmpeg', '-i', input_path, '-ar', str(sample_rate), output_path], check=True)
     except subprocess.CalledProcessError as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
+
+
+def _feed_pipe(source, pipe, chunk_size: int):
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            pipe.write(chunk)
+    except (BrokenPipeError, ValueError):
+        # ffmpeg stopped reading, its exit code tells what went wrong
+        pass
+    finally:
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
+
+
+def decode_audio(source, sample_rate: int = SAMPLE_RATE, chunk_size: int = 1 << 16) -> np.ndarray:
+    """
+    Decode audio to a mono float32 PCM array in memory, streaming it through an ffmpeg pipe.
+
+    No temporary files are written: the input is fed to ffmpeg's stdin and the decoded samples are
+    read back from its stdout.
+
+    Args:
+    source (bytes | file-like | str): Encoded audio as bytes, a binary file-like object or a path to an audio file.
+    sample_rate (int): The sample rate to resample the audio to (default 16000Hz as expected by Whisper).
+    chunk_size (int): Size of the chunks read from a file-like source (default 64 KiB).
+
+    Returns:
+    np.ndarray: Audio samples as float32 in the range [-1, 1].
+
+    Raises:
+    RuntimeError: If ffmpeg fails to decode the audio.
+    """
+    input_arg = source if isinstance(source, str) else "pipe:0"
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-threads", "0",
+           "-i", input_arg, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "pipe:1"]
+
+    if isinstance(source, str):
+        process = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True)
+        out, err, returncode = process.stdout, process.stderr, process.returncode
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        process = subprocess.run(cmd, input=bytes(source), capture_output=True)
+        out, err, returncode = process.stdout, process.stderr, process.returncode
+    else:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        feeder = threading.Thread(target=_feed_pipe, args=(source, process.stdin, chunk_size), daemon=True)
+        feeder.start()
+        errors = []
+        drainer = threading.Thread(target=lambda: errors.append(process.stderr.read()), daemon=True)
+        drainer.start()
+        out = process.stdout.read()
+        returncode = process.wait()
+        feeder.join()
+        drainer.join()
+        err = errors[0] if errors else b""
+
+    if returncode != 0:
+        raise RuntimeError(f"Failed to decode audio: {err.decode(errors='replace').strip()}")
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def parse_wav_header(header: bytes):
+    """
+    Parse the RIFF header of a WAV file.
+
+    Args:
+    header (bytes): The beginning of the file, must include the 'fmt ' chunk and the header of the 'data' chunk.
+
+    Returns:
+    dict: Format tag, channels, sample rate, bit depth and the offset and size of the data chunk, None if the header is not a valid WAV header.
+    """
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    info = {}
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id, chunk_size = struct.unpack_from("<4sI", header, offset)
+        offset += 8
+        if chunk_id == b"fmt ":
+            if offset + 16 > len(header):
+                return None
+            format_tag, channels, sample_rate, _, block_align, bit_depth = struct.unpack_from("<HHIIHH", header, offset)
+            if format_tag == 0xFFFE and chunk_size >= 40 and offset + 26 <= len(header):
+                # WAVE_FORMAT_EXTENSIBLE, the actual format is in the first two bytes of the sub-format GUID
+                format_tag = struct.unpack_from("<H", header, offset + 24)[0]
+            info.update({'format': format_tag, 'channels': channels, 'sample_rate': sample_rate,
+                         'bit_depth': bit_depth, 'block_align': block_align})
+        elif chunk_id == b"data":
+            if 'format' not in info:
+                return None
+            info.update({'data_offset': offset, 'data_size': chunk_size})
+            return info
+        # Chunks are padded to an even size
+        offset += chunk_size + (chunk_size & 1)
+    return None
+
+
+def sniff_audio_format(header: bytes):
+    """
+    Identify the container or codec of an audio file from its first bytes, without decoding it.
+
+    Args:
+    header (bytes): The beginning of the file, at least 12 bytes.
+
+    Returns:
+    str: Name of the format, None if the bytes do not start a known audio format.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"FORM" and header[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+    for magic, name in ((b"fLaC", "flac"), (b"OggS", "ogg"), (b"ID3", "mp3"), (b"\x1a\x45\xdf\xa3", "webm"),
+                        (b"#!AMR", "amr"), (b"caff", "caf"), (b"\x30\x26\xb2\x75", "asf")):
+        if header.startswith(magic):
+            return name
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        # MPEG audio or ADTS AAC frame sync without a tag
+        return "mpeg"
+    return None
+
+
+def probe_duration(header: bytes, total_size: int = None):
+    """
+    Read the duration of an audio file from its header, without decoding it. Only PCM WAV files carry it in a fixed place.
+
+    Args:
+    header (bytes): The beginning of the file, must include the header of the 'data' chunk.
+    total_size (int): Size of the whole file, used when the header carries a placeholder data size (default len(header)).
+
+    Returns:
+    float: Duration in seconds, None if it cannot be read from the header.
+    """
+    info = parse_wav_header(header)
+    if info is None or not info['block_align'] or not info['sample_rate']:
+        return None
+    total_size = len(header) if total_size is None else total_size
+    data_size = min(info['data_size'], max(total_size - info['data_offset'], 0))
+    return data_size // info['block_align'] / info['sample_rate']
+
+
+def pcm16_to_float32(samples: np.ndarray) -> np.ndarray:
+    """
+    Convert 16-bit PCM samples to float32 in the range [-1, 1] with a single vectorized operation.
+
+    Args:
+    samples (np.ndarray): int16 samples, may be a read-only view or a memory map.
+
+    Returns:
+    np.ndarray: float32 samples.
+    """
+    return np.multiply(samples, np.float32(1 / 32768), dtype=np.float32)
+
+
+def float32_to_wav(audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """
+    Encode float32 samples as a 16-bit mono PCM WAV file, which `load_audio` reads back without ffmpeg.
+
+    Args:
+    audio (np.ndarray): float32 samples in the range [-1, 1].
+    sample_rate (int): The sample rate of the audio (default 16000Hz).
+
+    Returns:
+    bytes: Content of the WAV file.
+    """
+    samples = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+    wav_buffer = io.BytesIO()
+    bytes_to_wav(samples.tobytes(), wav_buffer, sample_rate=sample_rate)
+    return wav_buffer.getvalue()
+
+
+def read_pcm_wav(source, sample_rate: int = SAMPLE_RATE, tolerance: float = 0.01, header_size: int = 4096):
+    """
+    Fast path for 16-bit PCM mono WAV audio already at (or within `tolerance` of) the target sample rate.
+
+    The samples are viewed in place (memory-mapped for files, a buffer view for bytes) and converted to
+    float32 without launching ffmpeg.
+
+    Args:
+    source (bytes | str): WAV file content or path to a WAV file.
+    sample_rate (int): The sample rate expected by the model (default 16000Hz).
+    tolerance (float): Maximum relative deviation from `sample_rate` accepted without resampling (default 1%).
+    header_size (int): Number of bytes searched for the WAV header (default 4096).
+
+    Returns:
+    np.ndarray: float32 samples, None if the audio does not qualify for the fast path.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            header = file.read(header_size)
+            file.seek(0, 2)
+            total_size = file.tell()
+    else:
+        header = bytes(source[:header_size])
+        total_size = len(source)
+
+    info = parse_wav_header(header)
+    if (info is None or info['format'] != 1 or info['channels'] != 1 or info['bit_depth'] != 16
+            or abs(info['sample_rate'] - sample_rate) > tolerance * sample_rate):
+        return None
+
+    # Streamed WAVs often carry a placeholder data size, trust the actual file size instead
+    data_size = min(info['data_size'], total_size - info['data_offset'])
+    count = max(data_size, 0) // 2
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    if isinstance(source, str):
+        samples = np.memmap(source, dtype="<i2", mode="r", offset=info['data_offset'], shape=(count,))
+    else:
+        samples = np.frombuffer(source, dtype="<i2", count=count, offset=info['data_offset'])
+    return pcm16_to_float32(samples)
+
+
+def load_audio(source, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Load audio as a mono float32 PCM array, using the WAV fast path when possible and ffmpeg otherwise.
+
+    Args:
+    source (bytes | str): Encoded audio or path to an audio file.
+    sample_rate (int): The sample rate expected by the model (default 16000Hz).
+
+    Returns:
+    np.ndarray: Audio samples as float32 in the range [-1, 1].
+    """
+    audio = read_pcm_wav(source, sample_rate=sample_rate)
+    if audio is not None:
+        return audio
+    return decode_audio(source, sample_rate=sample_rate)
+
+
+SUPPORTED_BIT_DEPTHS = (8, 16, 24, 32)
+
+
+def pcm_to_mono(data: bytes, bit_depth: int = 16, channels: int = 1) -> np.ndarray:
+    """
+    Convert raw little-endian PCM bytes to mono float32 samples, averaging the channels.
+
+    8-bit PCM is unsigned, 16, 24 and 32-bit PCM are signed integers, as in WAV files.
+
+    Args:
+    data (bytes): Raw PCM audio, whole frames only.
+    bit_depth (int): The bit depth of the audio, one of 8, 16, 24 or 32 (default 16 bits).
+    channels (int): The number of interleaved audio channels (default 1 for mono audio).
+
+    Returns:
+    np.ndarray: float32 samples in the range [-1, 1] at the sample rate of the input.
+    """
+    if bit_depth == 8:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif bit_depth == 16:
+        samples = pcm16_to_float32(np.frombuffer(data, dtype="<i2"))
+    elif bit_depth == 24:
+        triples = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        # Assemble the top 24 bits of an int32, so the sign comes for free
+        samples = ((triples[:, 0] << 8) | (triples[:, 1] << 16) | (triples[:, 2] << 24)).astype(np.float32) / 2**31
+    elif bit_depth == 32:
+        samples = np.frombuffer(data, dtype="<i4").astype(np.float32) / 2**31
+    else:
+        raise ValueError(f"Unsupported bit depth: {bit_depth}")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return samples
+
+
+class PolyphaseResampler:
+    """
+    Streaming polyphase resampler converting float32 audio between integer sample rates.
+
+    The rate ratio is reduced to up/down, and every output sample is the dot product of the input samples around
+    it with one phase of a Kaiser-windowed sinc low-pass filter, computed for whole blocks of output samples at once.
+    The last input samples are kept between calls, so audio resampled in pieces is identical to audio resampled at once.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int = SAMPLE_RATE, half_width: int = 16, beta: float = 8.0, block: int = 1 << 16):
+        """
+        Args:
+        src_rate (int): Sample rate of the input.
+        dst_rate (int): Sample rate of the output (default 16000Hz).
+        half_width (int): Number of input samples on each side of an output sample contributing to it (default 16).
+        beta (float): Kaiser window shape, higher values trade a wider transition band for less aliasing (default 8.0).
+        block (int): Number of output samples computed at once, bounding the memory used (default 65536).
+        """
+        gcd = np.gcd(src_rate, dst_rate)
+        self.up, self.down = dst_rate // gcd, src_rate // gcd
+        self.half_width = half_width
+        self.block = block
+        # Filter at the upsampled rate with the cutoff just below the lower of the two Nyquist frequencies
+        cutoff = 0.95 / max(self.up, self.down)
+        k = np.arange(-half_width * self.up, half_width * self.up + 1)
+        taps = cutoff * np.sinc(cutoff * k) * np.kaiser(len(k), beta) * self.up
+        # phases[p, j]: weight of input sample base + j - half_width + 1 for an output sample with phase p
+        j = np.arange(2 * half_width) - half_width + 1
+        self.phases = taps[np.arange(self.up)[:, None] - j[None, :] * self.up + half_width * self.up].astype(np.float32)
+        self._offsets = j
+        # Input received so far, starting at absolute index _start, with zeros before the first sample
+        self._buffer = np.zeros(half_width, dtype=np.float32)
+        self._start = -half_width
+        self._received = 0
+        self._produced = 0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Resample the next piece of input.
+
+        Args:
+        samples (np.ndarray): float32 samples at the input sample rate.
+
+        Returns:
+        np.ndarray: float32 samples at the output sample rate, every output sample whose input is complete.
+        """
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+        self._received += len(samples)
+        # An output sample is complete once the input sample half_width after it arrived
+        last = self._start + len(self._buffer) - 1 - self.half_width
+        end = ((last + 1) * self.up - 1) // self.down + 1 if last >= 0 else 0
+        return self._produce(end)
+
+    def flush(self) -> np.ndarray:
+        """
+        Resample the rest of the input, assuming silence after it.
+
+        Returns:
+        np.ndarray: The remaining float32 samples at the output sample rate.
+        """
+        end = -(-self._received * self.up // self.down)
+        self._buffer = np.concatenate([self._buffer, np.zeros(self.half_width + 1, dtype=np.float32)])
+        return self._produce(end)
+
+    def _produce(self, end: int) -> np.ndarray:
+        outputs = []
+        for first in range(self._produced, end, self.block):
+            n = np.arange(first, min(first + self.block, end), dtype=np.int64)
+            base, phase = np.divmod(n * self.down, self.up)
+            window = self._buffer[base[:, None] + self._offsets[None, :] - self._start]
+            outputs.append(np.einsum('ij,ij->i', window, self.phases[phase]))
+        self._produced = max(self._produced, end)
+        # Keep only the input still needed by the next output sample
+        drop = (self._produced * self.down) // self.up - self.half_width + 1 - self._start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._start += drop
+        return np.concatenate(outputs) if outputs else np.zeros(0, dtype=np.float32)
+
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample float32 audio in-process with a polyphase filter.
+
+    Args:
+    audio (np.ndarray): float32 samples at the input sample rate.
+    src_rate (int): Sample rate of the input.
+    dst_rate (int): Sample rate of the output (default 16000Hz).
+
+    Returns:
+    np.ndarray: float32 samples at the output sample rate.
+    """
+    if src_rate == dst_rate:
+        return audio
+    resampler = PolyphaseResampler(src_rate, dst_rate)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
+
+
+def pcm_to_float32(data: bytes, sample_rate: int = SAMPLE_RATE, bit_depth: int = 16, channels: int = 1) -> np.ndarray:
+    """
+    Convert raw PCM bytes to mono float32 samples at the sample rate expected by Whisper.
+
+    Channels are downmixed and other sample rates resampled in-process, without spawning ffmpeg.
+
+    Args:
+    data (bytes): Raw PCM audio, whole frames only.
+    sample_rate (int): The sample rate of the audio (default 16000Hz).
+    bit_depth (int): The bit depth of the audio, one of 8, 16, 24 or 32 (default 16 bits).
+    channels (int): The number of audio channels (default 1 for mono audio).
+
+    Returns:
+    np.ndarray: float32 samples at 16000Hz.
+    """
+    return resample(pcm_to_mono(data, bit_depth, channels), sample_rate)
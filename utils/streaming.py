@@ -0,0 +1,118 @@
+import re
+from typing import Dict, List, Tuple
+import numpy as np
+from utils.sound import SAMPLE_RATE
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", "", text).lower().split())
+
+
+class StreamingTranscriber:
+    """_summary_: Rolling audio buffer of a streaming connection turning overlapping window decodes into partial and final text.
+
+    Every decode covers the audio received since the last final segment, so consecutive windows overlap.
+    A segment becomes final once two consecutive decodes agree on it and it ends at least `margin` seconds
+    before the end of the window, or when the window grows beyond `max_window` seconds, then at least the first
+    segment is finalized. Final segments are cut off the buffer and never decoded again.
+    """
+
+    def __init__(self,
+                 step: float = 2.0,
+                 margin: float = 1.0,
+                 max_window: float = 25.0,
+                 sample_rate: int = SAMPLE_RATE):
+        """
+        Args:
+            step (float, optional): Seconds of new audio needed before the window is decoded again. Defaults to 2.0.
+            margin (float, optional): Segments ending closer than this to the end of the window stay partial. Defaults to 1.0.
+            max_window (float, optional): Window length in seconds after which segments are finalized without agreement. Defaults to 25.0.
+            sample_rate (int, optional): Sample rate of the buffered audio. Defaults to 16000.
+        """
+        self.step = step
+        self.margin = margin
+        self.max_window = max_window
+        self.sample_rate = sample_rate
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0
+        self.committed: List[Dict] = []
+        self._decoded = 0
+        self._previous: List[str] = []
+
+    def append(self, samples: np.ndarray):
+        """_summary_: Appends newly received audio to the rolling buffer.
+
+        Args:
+            samples (np.ndarray): float32 samples at the buffer sample rate.
+        """
+        self.buffer = np.concatenate([self.buffer, samples.astype(np.float32, copy=False)])
+
+    def ready(self) -> bool:
+        """_summary_: Tells whether enough new audio arrived since the last decode to decode the window again."""
+        return len(self.buffer) - self._decoded >= self.step * self.sample_rate
+
+    def snapshot(self) -> np.ndarray:
+        """_summary_: Returns the current window to be decoded and marks it as decoded.
+
+        Returns:
+            np.ndarray: Audio received since the last final segment.
+        """
+        self._decoded = len(self.buffer)
+        return self.buffer[:self._decoded]
+
+    def prompt(self, max_chars: int = 200) -> str:
+        """_summary_: Returns the tail of the final text, used to condition the next decode on what was already said."""
+        return " ".join(segment['text'] for segment in self.committed)[-max_chars:]
+
+    def update(self, result: Dict, final: bool = False) -> Tuple[List[Dict], str]:
+        """_summary_: Processes the decode of the last snapshot.
+
+        Args:
+            result (dict): Whisper transcription result of the snapshot, with segment times relative to its start.
+            final (bool, optional): Whether the stream ended, which makes every remaining segment final. Defaults to False.
+
+        Returns:
+            tuple: List of new final segments with absolute start/end times and the current partial text.
+        """
+        segments = [segment for segment in result.get('segments', []) if segment['text'].strip()]
+        duration = self._decoded / self.sample_rate
+        texts = [_normalize(segment['text']) for segment in segments]
+
+        if final:
+            stable = len(segments)
+        else:
+            stable = 0
+            forced = duration >= self.max_window
+            # The last segment may still be cut in the middle of a word, it never becomes final before the stream ends
+            for i, segment in enumerate(segments[:-1]):
+                agreed = i < len(self._previous) and self._previous[i] == texts[i]
+                if segment['end'] > duration - self.margin or not (agreed or forced):
+                    break
+                stable = i + 1
+            if forced and not stable and segments:
+                # A full window decoded as a single segment, or whose first one runs into the margin, is committed
+                # anyway, the buffer would grow without bound otherwise
+                stable = 1
+
+        finals = [{'start': round(self.offset + segment['start'], 2),
+                   'end': round(self.offset + segment['end'], 2),
+                   'text': segment['text'].strip()} for segment in segments[:stable]]
+        self.committed.extend(finals)
+
+        if final:
+            cut = self._decoded
+        elif stable:
+            cut = min(int(segments[stable - 1]['end'] * self.sample_rate), self._decoded)
+        elif not segments and duration >= self.max_window:
+            # Nothing but silence in a full window, keep only the margin in case speech starts right there
+            cut = self._decoded - int(self.margin * self.sample_rate)
+        else:
+            cut = 0
+        if cut > 0:
+            self.buffer = self.buffer[cut:]
+            self._decoded -= cut
+            self.offset += cut / self.sample_rate
+
+        self._previous = texts[stable:]
+        partial = " ".join(segment['text'].strip() for segment in segments[stable:])
+        return finals, partial
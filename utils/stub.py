@@ -0,0 +1,64 @@
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Dict, List
+
+import numpy as np
+
+from utils.sound import SAMPLE_RATE
+
+
+class StubModel:
+    """_summary_: Deterministic stand-in for a Whisper model, for benchmarks and tests without model weights.
+
+    Transcribing sleeps for a fixed overhead plus a time proportional to the audio duration, releasing the GIL like
+    real inference does, and returns a text derived from a checksum of the audio, so equal audio gives equal results.
+    """
+
+    def __init__(self, name: str = "stub", seconds_per_second: float = 0.05, overhead: float = 0.05):
+        """
+        Args:
+            name (str, optional): Name of the model. Defaults to "stub".
+            seconds_per_second (float, optional): Simulated compute time per second of audio (real-time factor). Defaults to 0.05.
+            overhead (float, optional): Simulated compute time per call in seconds. Defaults to 0.05.
+        """
+        self.name = name
+        self.seconds_per_second = seconds_per_second
+        self.overhead = overhead
+        self.device = SimpleNamespace(type="cpu")
+
+    def parameters(self) -> List:
+        return []
+
+    def buffers(self) -> List:
+        return []
+
+    def _text(self, audio: np.ndarray) -> str:
+        checksum = zlib.crc32(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        return f"stub {self.name} {len(audio) / SAMPLE_RATE:.2f}s {checksum:08x}"
+
+    def transcribe(self, audio: np.ndarray, **options) -> Dict:
+        """_summary_: Simulates the transcription of 16 kHz mono audio, options are accepted and ignored.
+
+        Returns:
+            dict: Whisper-like result with a single segment spanning the audio.
+        """
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(self.overhead + duration * self.seconds_per_second)
+        text = self._text(audio)
+        return {'text': text, 'segments': [{'id': 0, 'start': 0.0, 'end': round(duration, 3), 'text': text}], 'language': 'en'}
+
+    def transcribe_batch(self, clips: List[np.ndarray]) -> List[Dict]:
+        """_summary_: Simulates a batched pass over clips, paying the overhead once for the whole batch.
+
+        Returns:
+            List[dict]: Whisper-like results, in the order of the clips.
+        """
+        duration = sum(len(clip) for clip in clips) / SAMPLE_RATE
+        time.sleep(self.overhead + duration * self.seconds_per_second)
+        results = []
+        for clip in clips:
+            text = self._text(clip)
+            results.append({'text': text, 'segments': [{'id': 0, 'start': 0.0, 'end': round(len(clip) / SAMPLE_RATE, 3), 'text': text}],
+                            'language': 'en'})
+        return results
@@ -0,0 +1,475 @@
+import datetime
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class TaskStore:
+    """_summary_: Bounded store of tasks with constant-time insert, lookup and eviction of the oldest task.
+
+    Tasks are kept in creation order. Once `capacity` tasks are stored the oldest one is evicted by every insert,
+    and tasks older than `ttl` seconds expire. Every task has a sequence number that serves as a cursor for paging
+    through the store without copying its keys. All methods are thread-safe and return copies of the tasks.
+    """
+
+    def __init__(self,
+                 capacity: int = 10000,
+                 ttl: float = 0,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            capacity (int, optional): Maximum number of stored tasks. Defaults to 10000.
+            ttl (float, optional): Seconds after creation a task expires, 0 keeps tasks until evicted. Defaults to 0.
+        """
+        self.capacity = capacity
+        self.ttl = ttl
+        self.logger = logger
+        self._tasks: Dict[str, Dict] = {}
+        # Task IDs in creation order, the sequence number of _order[i] is _offset + i and _order[:_head] are gone
+        self._order: List[str] = []
+        self._head = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tasks)
+
+    def __contains__(self, task_id) -> bool:
+        return self.get(task_id) is not None
+
+    def add(self, **fields) -> str:
+        """_summary_: Creates a new task, evicting the oldest task when the store is full.
+
+        Args:
+            **fields: Initial fields of the task, e.g. status and result.
+
+        Returns:
+            str: Unique ID of the task.
+        """
+        task_id = str(uuid.uuid4())
+        now = datetime.datetime.now().timestamp()
+        with self._lock:
+            self._expire(now)
+            while len(self._tasks) >= self.capacity:
+                self._pop_oldest()
+            self._tasks[task_id] = {'timestamp': now, **fields}
+            self._order.append(task_id)
+        return task_id
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """_summary_: Looks up a task.
+
+        Args:
+            task_id (str): Unique ID of the task.
+
+        Returns:
+            dict: Copy of the task, None if it does not exist or expired.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or self._expired(task, datetime.datetime.now().timestamp()):
+                return None
+            return dict(task)
+
+    def update(self, task_id: str, **fields) -> bool:
+        """_summary_: Updates fields of a task, ignoring tasks that were already removed.
+
+        Args:
+            task_id (str): Unique ID of the task.
+            **fields: Fields to set.
+
+        Returns:
+            bool: Whether the task exists.
+        """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return False
+            task.update(fields)
+            return True
+
+    def page(self,
+             cursor: int = 0,
+             limit: int = 10,
+             fields: Optional[List[str]] = None,
+             status: Optional[str] = None,
+             since: Optional[float] = None) -> Tuple[Dict[str, Dict], Optional[int]]:
+        """_summary_: Returns tasks in creation order, starting at a cursor.
+
+        Args:
+            cursor (int, optional): Cursor returned by the previous page, 0 starts at the oldest task. Defaults to 0.
+            limit (int, optional): Maximum number of tasks returned. Defaults to 10.
+            fields (List[str], optional): Fields of the tasks to return, all fields when None. Defaults to None.
+            status (str, optional): Only return tasks with this status. Defaults to None.
+            since (float, optional): Only return tasks created at or after this UNIX timestamp. Defaults to None.
+
+        Returns:
+            tuple: Tasks by ID and the cursor of the next page, None when there are no more tasks.
+        """
+        output = {}
+        with self._lock:
+            self._expire(datetime.datetime.now().timestamp())
+            index = max(cursor - self._offset, self._head)
+            while index < len(self._order) and len(output) < limit:
+                task_id = self._order[index]
+                index += 1
+                task = self._tasks.get(task_id)
+                if task is None or (status and task.get('status') != status) or (since and task['timestamp'] < since):
+                    continue
+                output[task_id] = {field: task.get(field) for field in fields} if fields else dict(task)
+            next_cursor = self._offset + index if index < len(self._order) else None
+        return output, next_cursor
+
+    def claim_orphans(self) -> List[Dict]:
+        """_summary_: Returns unfinished tasks of stopped server processes, which an in-memory store never has."""
+        return []
+
+    def unfinished_uploads(self) -> Set[str]:
+        """_summary_: Returns the saved uploads needed to recover unfinished tasks, none as in-memory tasks are not recovered."""
+        return set()
+
+    def close(self):
+        """_summary_: Releases the store, a no-op for the in-memory store."""
+
+    def _expired(self, task: Dict, now: float) -> bool:
+        return bool(self.ttl) and now - task['timestamp'] > self.ttl
+
+    def _expire(self, now: float):
+        # Caller holds self._lock, tasks are in creation order so expired tasks are all at the front
+        while self._head < len(self._order) and self._expired(self._tasks[self._order[self._head]], now):
+            self._pop_oldest()
+
+    def _pop_oldest(self):
+        # Caller holds self._lock
+        task_id = self._order[self._head]
+        self._head += 1
+        del self._tasks[task_id]
+        self.logger.debug(f"Removed task {task_id}")
+        # Drop the consumed prefix once it dominates the list, keeping eviction amortized O(1)
+        if self._head > 1024 and self._head * 2 > len(self._order):
+            del self._order[:self._head]
+            self._offset += self._head
+            self._head = 0
+
+
+class SqliteTaskStore:
+    """_summary_: Task store persisted in an embedded SQLite database, shared by all server processes of a node.
+
+    Writes are buffered and committed in batches by a background thread, so the event loop never waits for the disk.
+    Reads see the buffered writes of their own process immediately and those of other processes once committed.
+    Tasks are evicted by capacity and TTL like in `TaskStore`. Every store instance has a random ID, renews a lease
+    in the database while it is open and records its ID on the tasks it creates. Tasks left unfinished by an instance
+    whose lease expired can be taken over with `claim_orphans`. Process IDs are not used, containers reuse them on
+    every restart.
+    """
+
+    COLUMNS = {'timestamp': 'REAL', 'status': 'TEXT', 'result': 'TEXT', 'name': 'TEXT', 'model': 'TEXT',
+               'vad': 'INTEGER', 'cache_key': 'TEXT', 'upload': 'TEXT', 'callback': 'TEXT',
+               'instance': 'TEXT'}
+
+    def __init__(self,
+                 path: str = os.path.join("cache", "tasks.sqlite3"),
+                 capacity: int = 10000,
+                 ttl: float = 0,
+                 flush_interval: float = 0.05,
+                 batch_size: int = 500,
+                 lease: float = 30,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            path (str, optional): Path of the database file. Defaults to "cache/tasks.sqlite3".
+            capacity (int, optional): Maximum number of stored tasks. Defaults to 10000.
+            ttl (float, optional): Seconds after creation a task expires, 0 keeps tasks until evicted. Defaults to 0.
+            flush_interval (float, optional): Seconds buffered writes wait for more writes to commit with. Defaults to 0.05.
+            batch_size (int, optional): Number of buffered tasks that triggers a commit right away. Defaults to 500.
+            lease (float, optional): Seconds without a renewal after which the tasks of an instance are orphaned. Defaults to 30.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.lease = lease
+        self.logger = logger
+        self.instance = uuid.uuid4().hex
+        self._renewed = 0.0
+        # Buffered writes by task ID, new tasks carry all their fields and a '_new' marker
+        self._dirty: Dict[str, Dict] = {}
+        self._flushing: Dict[str, Dict] = {}
+        # Tasks created or claimed by this instance, updated without a lookup in the database
+        self._owned: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._closed = False
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS tasks (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL)")
+            existing = {row[1] for row in connection.execute("PRAGMA table_info(tasks)")}
+            for column, kind in self.COLUMNS.items():
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE tasks ADD COLUMN {column} {kind}")
+            connection.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, seq)")
+            connection.execute("CREATE INDEX IF NOT EXISTS tasks_timestamp ON tasks (timestamp)")
+            connection.execute("CREATE TABLE IF NOT EXISTS instances (id TEXT PRIMARY KEY, heartbeat REAL NOT NULL)")
+        self._renew()
+        self._writer = threading.Thread(target=self._write_loop, name="task-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, every thread gets its own
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def __len__(self) -> int:
+        self.flush()
+        query, params = "SELECT COUNT(*) FROM tasks", ()
+        if self.ttl:
+            query, params = query + " WHERE timestamp >= ?", (self._cutoff(),)
+        return self._connection().execute(query, params).fetchone()[0]
+
+    def __contains__(self, task_id) -> bool:
+        return self.get(task_id) is not None
+
+    def add(self, **fields) -> str:
+        """_summary_: Creates a new task, the write is committed in the background.
+
+        Args:
+            **fields: Initial fields of the task, e.g. status and result.
+
+        Returns:
+            str: Unique ID of the task.
+        """
+        self._check(fields)
+        task_id = str(uuid.uuid4())
+        with self._lock:
+            self._dirty[task_id] = {'_new': True, 'timestamp': datetime.datetime.now().timestamp(), 'instance': self.instance, **fields}
+            self._own(task_id, self._dirty[task_id]['timestamp'])
+            if len(self._dirty) >= self.batch_size:
+                self._wake.set()
+        return task_id
+
+    def get(self, task_id: str) -> Optional[Dict]:
+        """_summary_: Looks up a task, including writes that are not committed yet.
+
+        Args:
+            task_id (str): Unique ID of the task.
+
+        Returns:
+            dict: Copy of the task, None if it does not exist or expired.
+        """
+        with self._lock:
+            overlays = [overlay for overlay in (self._flushing.get(task_id), self._dirty.get(task_id)) if overlay]
+        if overlays and overlays[0].get('_new'):
+            task = {}
+        else:
+            row = self._connection().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return None
+            task = self._row(row)
+        for overlay in overlays:
+            task.update(overlay)
+        task.pop('_new', None)
+        if self.ttl and task['timestamp'] < self._cutoff():
+            return None
+        task.pop('instance', None)
+        return task
+
+    def update(self, task_id: str, **fields) -> bool:
+        """_summary_: Updates fields of a task, ignoring tasks that were already removed. The write is committed in the background.
+
+        Args:
+            task_id (str): Unique ID of the task.
+            **fields: Fields to set.
+
+        Tasks of this instance are assumed to exist, so updating them never waits for the database.
+
+        Returns:
+            bool: Whether the task exists.
+        """
+        self._check(fields)
+        with self._lock:
+            created = self._owned.get(task_id)
+            buffered = task_id in self._dirty or task_id in self._flushing or created is not None
+        if created is not None and self.ttl and created < self._cutoff():
+            return False
+        if not buffered and self._connection().execute("SELECT 1 FROM tasks WHERE id = ?", (task_id,)).fetchone() is None:
+            return False
+        with self._lock:
+            self._dirty.setdefault(task_id, {}).update(fields)
+        return True
+
+    def page(self,
+             cursor: int = 0,
+             limit: int = 10,
+             fields: Optional[List[str]] = None,
+             status: Optional[str] = None,
+             since: Optional[float] = None) -> Tuple[Dict[str, Dict], Optional[int]]:
+        """_summary_: Returns tasks in creation order, starting at a cursor. Commits buffered writes first.
+
+        Args:
+            cursor (int, optional): Cursor returned by the previous page, 0 starts at the oldest task. Defaults to 0.
+            limit (int, optional): Maximum number of tasks returned. Defaults to 10.
+            fields (List[str], optional): Fields of the tasks to return, all fields when None. Defaults to None.
+            status (str, optional): Only return tasks with this status. Defaults to None.
+            since (float, optional): Only return tasks created at or after this UNIX timestamp. Defaults to None.
+
+        Returns:
+            tuple: Tasks by ID and the cursor of the next page, None when there are no more tasks.
+        """
+        self.flush()
+        conditions, params = ["seq >= ?"], [cursor]
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if since or self.ttl:
+            conditions.append("timestamp >= ?")
+            params.append(max(since or 0, self._cutoff() if self.ttl else 0))
+        rows = self._connection().execute(f"SELECT * FROM tasks WHERE {' AND '.join(conditions)} ORDER BY seq LIMIT ?",
+                                          params + [limit + 1]).fetchall()
+        output = {}
+        for row in rows[:limit]:
+            task = self._row(row)
+            output[row['id']] = {field: task.get(field) for field in fields} if fields else task
+        next_cursor = rows[limit]['seq'] if len(rows) > limit else None
+        return output, next_cursor
+
+    def claim_orphans(self) -> List[Dict]:
+        """_summary_: Takes over pending and running tasks of store instances whose lease expired, i.e. of server
+        processes that stopped. A restarted process claims the tasks of its previous run once their lease expires.
+
+        Every task is claimed atomically, so when several processes start at once each task is claimed by only one of them.
+
+        Returns:
+            List[dict]: Claimed tasks with their 'id', set back to pending.
+        """
+        self.flush()
+        connection = self._connection()
+        cutoff = datetime.datetime.now().timestamp() - self.lease
+        rows = connection.execute("SELECT * FROM tasks WHERE status IN ('pending', 'running') AND instance IS NOT ? "
+                                  "AND (instance IS NULL OR instance NOT IN (SELECT id FROM instances WHERE heartbeat >= ?)) ORDER BY seq",
+                                  (self.instance, cutoff)).fetchall()
+        claimed = []
+        for row in rows:
+            with connection:
+                updated = connection.execute("UPDATE tasks SET instance = ?, status = 'pending' WHERE id = ? AND instance IS ?",
+                                             (self.instance, row['id'], row['instance'])).rowcount
+            if updated:
+                task = self._row(row)
+                task.update(id=row['id'], status='pending')
+                claimed.append(task)
+                with self._lock:
+                    self._own(row['id'], row['timestamp'])
+        if claimed:
+            self.logger.info(f"Claimed {len(claimed)} unfinished task(s) of stopped server processes")
+        return claimed
+
+    def unfinished_uploads(self) -> Set[str]:
+        """_summary_: Returns the saved uploads of pending and running tasks of all processes, needed to recover them.
+        Commits buffered writes first."""
+        self.flush()
+        rows = self._connection().execute("SELECT upload FROM tasks WHERE status IN ('pending', 'running') AND upload IS NOT NULL")
+        return {row[0] for row in rows}
+
+    def flush(self):
+        """_summary_: Commits buffered writes in a single transaction and evicts expired and excess tasks."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._flushing, self._dirty = self._dirty, {}
+            batch = self._flushing
+            try:
+                connection = self._connection()
+                with connection:
+                    for task_id, fields in batch.items():
+                        columns = [column for column in fields if column != '_new']
+                        if fields.get('_new'):
+                            connection.execute(f"INSERT INTO tasks (id, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                                               [task_id] + [fields[column] for column in columns])
+                        elif columns:
+                            connection.execute(f"UPDATE tasks SET {', '.join(column + ' = ?' for column in columns)} WHERE id = ?",
+                                               [fields[column] for column in columns] + [task_id])
+                    self._evict(connection)
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to write {len(batch)} task(s), retrying: {e}")
+                with self._lock:
+                    # Keep newer buffered writes on top of the failed ones
+                    for task_id, fields in batch.items():
+                        self._dirty[task_id] = {**fields, **self._dirty.get(task_id, {})}
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def close(self):
+        """_summary_: Stops the background writer after committing buffered writes, and gives up the lease, so that
+        unfinished tasks can be claimed right away."""
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("DELETE FROM instances WHERE id = ?", (self.instance,))
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to release the lease of the task store: {e}")
+
+    def _own(self, task_id: str, timestamp: float):
+        # Caller holds self._lock, evicted tasks are forgotten with the oldest ones
+        self._owned[task_id] = timestamp
+        while len(self._owned) > self.capacity:
+            self._owned.popitem(last=False)
+
+    def _renew(self):
+        now = datetime.datetime.now().timestamp()
+        try:
+            connection = self._connection()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO instances (id, heartbeat) VALUES (?, ?)", (self.instance, now))
+                connection.execute("DELETE FROM instances WHERE heartbeat < ?", (now - 10 * self.lease,))
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to renew the lease of the task store: {e}")
+            return
+        self._renewed = now
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if datetime.datetime.now().timestamp() - self._renewed > self.lease / 3:
+                self._renew()
+
+    def _evict(self, connection: sqlite3.Connection):
+        if self.ttl:
+            connection.execute("DELETE FROM tasks WHERE timestamp < ?", (self._cutoff(),))
+        connection.execute("DELETE FROM tasks WHERE seq <= (SELECT seq FROM tasks ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                           (self.capacity,))
+
+    def _cutoff(self) -> float:
+        return datetime.datetime.now().timestamp() - self.ttl
+
+    def _check(self, fields: Dict):
+        unknown = set(fields) - set(self.COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown task field(s): {', '.join(sorted(unknown))}")
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict:
+        return {key: row[key] for key in row.keys() if key not in ('seq', 'id')}
@@ -0,0 +1,148 @@
+import json
+import logging
+from typing import Callable, Iterable, Optional
+
+from utils.sound import sniff_audio_format
+
+
+def _multipart_boundary(content_type: bytes) -> Optional[bytes]:
+    media_type, _, params = content_type.partition(b";")
+    if media_type.strip().lower() != b"multipart/form-data":
+        return None
+    for param in params.split(b";"):
+        name, _, value = param.strip().partition(b"=")
+        if name.lower() == b"boundary" and value:
+            return value.strip(b'"')
+    return None
+
+
+def file_prefix(body: bytes, boundary: bytes, size: int = 16) -> Optional[bytes]:
+    """_summary_: Finds the first bytes of the first file of a multipart/form-data body prefix.
+
+    Args:
+        body (bytes): Beginning of the request body.
+        boundary (bytes): Multipart boundary from the Content-Type header.
+        size (int, optional): Number of bytes of the file wanted. Defaults to 16.
+
+    Returns:
+        bytes: Up to `size` bytes of the file, None if the body prefix does not reach that far yet.
+    """
+    delimiter = b"--" + boundary
+    offset = body.find(delimiter)
+    while offset != -1:
+        headers_end = body.find(b"\r\n\r\n", offset)
+        if headers_end == -1:
+            return None
+        content = headers_end + 4
+        if b"filename=" in body[offset:headers_end].lower():
+            end = body.find(b"\r\n" + delimiter, content)
+            if end == -1:
+                return body[content:content + size] if len(body) - content >= size else None
+            return body[content:min(end, content + size)]
+        offset = body.find(delimiter, content)
+    return None
+
+
+class UploadGuard:
+    """_summary_: ASGI middleware rejecting oversized and non-audio uploads before the body is read.
+
+    A Content-Length above the limit is answered with 413 right away, bodies sent without one are counted while
+    they stream in. Multipart bodies are held back until the first bytes of the file are in, and answered with 415
+    unless they start an audio format, so the endpoint never spools a rejected upload.
+    """
+
+    def __init__(self,
+                 app,
+                 paths: Iterable[str] = ("/translate",),
+                 max_bytes: int = 0,
+                 sniff: bool = True,
+                 sniff_bytes: int = 65536,
+                 on_reject: Optional[Callable[[str], None]] = None,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            app (ASGIApp): Wrapped application.
+            paths (Iterable[str], optional): Paths of the upload endpoints. Defaults to ("/translate",).
+            max_bytes (int, optional): Maximum size of a request body, 0 for no limit. Defaults to 0.
+            sniff (bool, optional): Whether to check the magic bytes of uploaded files. Defaults to True.
+            sniff_bytes (int, optional): Body bytes held back at most to find the start of the file. Defaults to 65536.
+            on_reject (Callable[[str], None], optional): Called with the reason of every rejection. Defaults to None.
+        """
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+        self.sniff = sniff
+        self.sniff_bytes = sniff_bytes
+        self.on_reject = on_reject
+        self.logger = logger
+
+    async def _reject(self, send, status: int, reason: str, detail: str):
+        if self.on_reject is not None:
+            self.on_reject(reason)
+        self.logger.warning(f"Rejected upload: {detail}")
+        body = json.dumps({"detail": detail}).encode()
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                                (b"connection", b"close")]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        too_large = f"Upload larger than {self.max_bytes} bytes"
+        try:
+            length = int(headers.get(b"content-length", b"-1"))
+        except ValueError:
+            length = -1
+        if self.max_bytes and length > self.max_bytes:
+            return await self._reject(send, 413, 'too_large', too_large)
+
+        # Hold back the beginning of the body until the start of the file is known
+        buffered = []
+        received = 0
+        boundary = _multipart_boundary(headers.get(b"content-type", b"")) if self.sniff else None
+        if boundary is not None:
+            prefix = bytearray()
+            while True:
+                message = await receive()
+                buffered.append(message)
+                if message['type'] != 'http.request':
+                    break
+                prefix += message.get('body', b"")
+                received = len(prefix)
+                if self.max_bytes and received > self.max_bytes:
+                    return await self._reject(send, 413, 'too_large', too_large)
+                head = file_prefix(bytes(prefix), boundary)
+                more = message.get('more_body', False)
+                if head is not None or not more or received >= self.sniff_bytes:
+                    if head is not None and sniff_audio_format(head) is None:
+                        return await self._reject(send, 415, 'unsupported_format', "Unsupported audio format")
+                    break
+
+        responded = False
+
+        async def guarded_receive():
+            nonlocal received, responded
+            if buffered:
+                return buffered.pop(0)
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b""))
+                if self.max_bytes and received > self.max_bytes and not responded:
+                    # Answer ourselves and make the endpoint stop reading, as if the client went away
+                    responded = True
+                    await self._reject(send, 413, 'too_large', too_large)
+                    return {'type': 'http.disconnect'}
+            return message
+
+        async def guarded_send(message):
+            if not responded:
+                await send(message)
+
+        try:
+            await self.app(scope, guarded_receive, guarded_send)
+        except Exception:
+            if not responded:
+                raise
@@ -0,0 +1,161 @@
+import bisect
+from typing import Dict, List, Tuple
+import numpy as np
+from utils.sound import SAMPLE_RATE
+
+
+def frame_energy(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30) -> np.ndarray:
+    """_summary_: Computes the energy of consecutive non-overlapping frames in dBFS.
+
+    Args:
+        audio (np.ndarray): float32 samples in the range [-1, 1].
+        sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+        frame_ms (int, optional): Length of a frame in milliseconds. Defaults to 30.
+
+    Returns:
+        np.ndarray: Energy of every frame in dB, the last incomplete frame is zero-padded.
+    """
+    frame = sample_rate * frame_ms // 1000
+    count = -(-len(audio) // frame)
+    padded = np.zeros(count * frame, dtype=np.float32)
+    padded[:len(audio)] = audio
+    power = np.mean(np.square(padded.reshape(count, frame), dtype=np.float32), axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+
+def detect_speech(audio: np.ndarray,
+                  sample_rate: int = SAMPLE_RATE,
+                  frame_ms: int = 30,
+                  threshold_db: float = 12.0,
+                  floor_db: float = -55.0,
+                  ceiling_db: float = -40.0,
+                  min_speech: float = 0.15,
+                  min_silence: float = 0.5,
+                  padding: float = 0.2) -> List[Tuple[int, int]]:
+    """_summary_: Finds speech regions with an energy-based voice activity detector.
+
+    A frame is speech when its energy is `threshold_db` above the noise floor, estimated as the 10th percentile
+    of frame energies, clamped between the absolute `floor_db` and `ceiling_db`, so that recordings without any
+    pause are not mistaken for noise. Pauses shorter than `min_silence` are bridged, bursts
+    shorter than `min_speech` are dropped and every region is extended by `padding` on both sides.
+
+    Args:
+        audio (np.ndarray): float32 samples in the range [-1, 1].
+        sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+        frame_ms (int, optional): Length of an analysis frame in milliseconds. Defaults to 30.
+        threshold_db (float, optional): Energy above the noise floor for a frame to count as speech. Defaults to 12.0.
+        floor_db (float, optional): Lowest speech threshold in dBFS. Defaults to -55.0.
+        ceiling_db (float, optional): Highest speech threshold in dBFS. Defaults to -40.0.
+        min_speech (float, optional): Minimum length of a speech region in seconds. Defaults to 0.15.
+        min_silence (float, optional): Minimum length of a pause between speech regions in seconds. Defaults to 0.5.
+        padding (float, optional): Seconds of context kept around every speech region. Defaults to 0.2.
+
+    Returns:
+        List[Tuple[int, int]]: Sorted, non-overlapping (start, end) sample ranges of speech.
+    """
+    if len(audio) == 0:
+        return []
+    frame = sample_rate * frame_ms // 1000
+    energy = frame_energy(audio, sample_rate, frame_ms)
+    threshold = min(max(np.percentile(energy, 10) + threshold_db, floor_db), ceiling_db)
+    speech = energy > threshold
+
+    # Edges of runs of speech frames
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], speech.astype(np.int8), [0]])))
+    runs = edges.reshape(-1, 2)
+
+    regions = []
+    for start, end in runs:
+        if regions and (start - regions[-1][1]) * frame < min_silence * sample_rate:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    pad = int(padding * sample_rate)
+    result = []
+    for start, end in regions:
+        if (end - start) * frame < min_speech * sample_rate:
+            continue
+        start = max(start * frame - pad, 0)
+        end = min(end * frame + pad, len(audio))
+        if result and start <= result[-1][1]:
+            result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+
+class TimestampMap:
+    """_summary_: Maps timestamps of audio with silence removed back to the original audio.
+    """
+
+    def __init__(self, pieces: List[Tuple[int, int]], sample_rate: int = SAMPLE_RATE):
+        """
+        Args:
+            pieces (List[Tuple[int, int]]): (compressed start, original start) sample offsets of every kept region, sorted.
+            sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+        """
+        self.sample_rate = sample_rate
+        self._compressed = [compressed / sample_rate for compressed, _ in pieces]
+        self._original = [original / sample_rate for _, original in pieces]
+
+    def to_original(self, seconds: float) -> float:
+        """_summary_: Converts a time in the compressed audio to the corresponding time in the original audio.
+
+        Args:
+            seconds (float): Time in the compressed audio.
+
+        Returns:
+            float: Time in the original audio.
+        """
+        if not self._compressed:
+            return seconds
+        i = max(bisect.bisect_right(self._compressed, seconds) - 1, 0)
+        return round(self._original[i] + seconds - self._compressed[i], 3)
+
+    def remap(self, result: Dict) -> Dict:
+        """_summary_: Rewrites segment and word timestamps of a Whisper result to refer to the original audio.
+
+        Args:
+            result (dict): Whisper transcription result of the compressed audio.
+
+        Returns:
+            dict: The same result, modified in place.
+        """
+        for segment in result.get('segments', []):
+            segment['start'] = self.to_original(segment['start'])
+            segment['end'] = self.to_original(segment['end'])
+            for word in segment.get('words', []):
+                word['start'] = self.to_original(word['start'])
+                word['end'] = self.to_original(word['end'])
+        return result
+
+
+def remove_silence(audio: np.ndarray,
+                   sample_rate: int = SAMPLE_RATE,
+                   gap: float = 0.1,
+                   **vad_options) -> Tuple[np.ndarray, TimestampMap]:
+    """_summary_: Drops non-speech regions from audio, keeping a short pause between the remaining speech regions.
+
+    Args:
+        audio (np.ndarray): float32 samples in the range [-1, 1].
+        sample_rate (int, optional): Sample rate of the audio. Defaults to 16000.
+        gap (float, optional): Seconds of silence inserted between speech regions, so words do not run together. Defaults to 0.1.
+        **vad_options: Options passed to `detect_speech`.
+
+    Returns:
+        tuple: Audio with silence removed (empty if there is no speech) and the map of its timestamps to the original audio.
+    """
+    regions = detect_speech(audio, sample_rate=sample_rate, **vad_options)
+    silence = np.zeros(int(gap * sample_rate), dtype=np.float32)
+    parts, pieces = [], []
+    position = 0
+    for start, end in regions:
+        if parts:
+            parts.append(silence)
+            position += len(silence)
+        pieces.append((position, start))
+        parts.append(audio[start:end])
+        position += end - start
+    compressed = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    return compressed, TimestampMap(pieces, sample_rate=sample_rate)
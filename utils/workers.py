@@ -0,0 +1,162 @@
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from utils.metrics import REGISTRY
+
+worker_busy_seconds = REGISTRY.counter("stt_worker_busy_seconds_total", "Time the transcription workers spent running tasks.")
+
+
+def _timed(fn: Callable, *args):
+    # Runs on the worker, so the time excludes waiting for a free worker and pickling
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def set_torch_threads(num_threads: int):
+    """_summary_: Limits the number of intra-op threads torch uses in the current process.
+
+    Args:
+        num_threads (int): Number of threads.
+    """
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+
+def memory_usage(pid: int) -> Optional[Dict]:
+    """_summary_: Reads the memory usage of a process from /proc (Linux only).
+
+    The unique set size (USS) is the memory private to the process, i.e. what would be freed if it exited.
+    Weights inherited copy-on-write from the parent count towards RSS and PSS, but not towards USS.
+
+    Args:
+        pid (int): ID of the process.
+
+    Returns:
+        dict: RSS, PSS and USS of the process in bytes, None if unavailable on this platform.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            for line in file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'uss': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+class TranscriptionPool:
+    """_summary_: Pool of transcription workers that keeps inference off the asyncio event loop.
+
+    Workers are either threads of the server process or forked worker processes. Each worker limits
+    torch to `torch_threads` intra-op threads, so that the workers together do not oversubscribe the CPU.
+    """
+
+    def __init__(self,
+                 workers: int = 1,
+                 mode: str = "thread",
+                 torch_threads: Optional[int] = None,
+                 logger: logging.Logger = logging.getLogger(__name__)):
+        """
+        Args:
+            workers (int, optional): Number of concurrent transcription workers. Defaults to 1.
+            mode (str, optional): Either "thread" or "process". Defaults to "thread".
+            torch_threads (int, optional): Torch threads per worker. Defaults to the CPU count divided by the number of workers.
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unsupported worker mode: {mode}")
+        if mode == "process" and platform.system() == "Windows":
+            logger.warning("Process workers require fork, falling back to thread workers")
+            mode = "thread"
+        self.workers = max(1, workers)
+        self.mode = mode
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.logger = logger
+        self.executor: Optional[Executor] = None
+        # Calls submitted and not finished yet, possibly more than workers
+        self.active = 0
+
+    def start(self):
+        """_summary_: Starts the workers.
+
+        In process mode, the workers are forked right away, so models loaded before this call are shared
+        copy-on-write with every worker instead of being loaded again in each of them.
+        """
+        if self.mode == "process":
+            # Move everything allocated so far out of the reach of the garbage collector while forking, so that
+            # collections in the workers do not write to (and thereby copy) the inherited pages
+            gc.freeze()
+            try:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context("fork"),
+                                                    initializer=set_torch_threads,
+                                                    initargs=(self.torch_threads,))
+                # Forking executors launch all workers on the first submission
+                self.executor.submit(os.getpid).result()
+            finally:
+                # The workers keep their frozen copy, the server itself goes on collecting everything
+                gc.unfreeze()
+        else:
+            # Torch uses one intra-op thread pool per process, shared by all worker threads
+            set_torch_threads(self.torch_threads)
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcriber")
+        self.logger.info(f"Started {self.workers} {self.mode} transcription worker(s) with {self.torch_threads} torch thread(s) each")
+
+    async def run(self, fn: Callable, *args):
+        """_summary_: Runs `fn(*args)` on a worker and waits for the result without blocking the event loop.
+
+        Args:
+            fn (Callable): Function to run, must be picklable in process mode.
+
+        Returns:
+            Any: Return value of the function.
+        """
+        loop = asyncio.get_running_loop()
+        self.active += 1
+        try:
+            result, seconds = await loop.run_in_executor(self.executor, _timed, fn, *args)
+        finally:
+            self.active -= 1
+        worker_busy_seconds.inc(seconds)
+        return result
+
+    def stats(self) -> Dict:
+        """_summary_: Returns the pool configuration and memory usage of the workers.
+
+        Returns:
+            dict: Pool configuration, memory of the server process and, in process mode, of every worker.
+        """
+        workers = []
+        if self.mode == "process" and self.executor is not None:
+            for pid in list(self.executor._processes):
+                workers.append({'pid': pid, 'memory': memory_usage(pid)})
+        return {
+            'mode': self.mode,
+            'workers': self.workers,
+            'torch_threads': self.torch_threads,
+            'server': {'pid': os.getpid(), 'memory': memory_usage(os.getpid())},
+            'worker_processes': workers,
+        }
+
+    def shutdown(self):
+        """_summary_: Stops the workers, waiting for running transcriptions to finish.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None